@@ -1,18 +1,24 @@
 import os
-import tarfile
-import json
-import xml.etree.ElementTree as ET
+import io
+import zipfile
 from docx import Document
 from odf import text, teletype
-import shutil
 from odf.opendocument import load
 from docx.opc.exceptions import PackageNotFoundError
 from lxml.etree import XMLSyntaxError  # Import XMLSyntaxError
+from dila import parsers as ET
+from dila.archive import iter_tar_members, AttachmentBuffer, ATTACHMENT_BUFFER_SIZE
+from dila.cache import TextCache, content_digest, extractor_key
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.schemas import ACCO
+from dila.parallel import run_parallel
+from dila.manifest import Manifest
 
-def extract_text_from_docx(docx_path):
+def extract_text_from_docx(docx_path, docx_file=None):
     """Extracts text from a DOCX file with error handling for missing packages and other issues."""
     try:
-        doc = Document(docx_path)
+        doc = Document(docx_file if docx_file is not None else docx_path)
         text_content = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
         word_count = len(text_content.split())
         return text_content, word_count
@@ -20,90 +26,133 @@ def extract_text_from_docx(docx_path):
         print(f"Error reading {docx_path}: {e}")
         return "ERROR in reading text", 0  # Return error message and 0 word count on specific errors
 
-def extract_tar_gz(tar_path, extract_path):
-    """Extracts a .tar.gz file to a specified directory."""
+def extract_text_from_odt(odt_path, odt_file=None):
+    """Extracts text from an ODT file directly, one line per paragraph, without converting it to DOCX."""
     try:
-        with tarfile.open(tar_path, 'r:gz') as tar:
-            tar.extractall(path=extract_path)
-        print(f'Extracted {tar_path}')
-    except Exception as e:
-        print(f'Error extracting {tar_path}: {e}')
-
-def find_files(directory, extension):
-    """Finds all files in directory and its subdirectories with the given extension."""
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith(extension):
-                yield os.path.join(root, file)
-
-def convert_odt_to_docx(odt_path, docx_path):
-    """Converts an ODT file to DOCX format."""
-    textdoc = load(odt_path)
-    alltext = ""
-    for paragraph in textdoc.getElementsByType(text.P):
-        alltext += teletype.extractText(paragraph) + "\n"
-    
-    doc = Document()
-    doc.add_paragraph(alltext)
-    doc.save(docx_path)
-    print("\033[94m" + f"Converted {odt_path} to DOCX" + "\033[0m")
+        textdoc = load(odt_file if odt_file is not None else odt_path)
+        text_content = ''.join(teletype.extractText(paragraph) + "\n" for paragraph in textdoc.getElementsByType(text.P))
+        word_count = len(text_content.split())
+        return text_content, word_count
+    except (KeyError, zipfile.BadZipFile) as e:
+        print(f"Error reading {odt_path}: {e}")
+        return "ERROR in reading text", 0
+
+# Keys of the attachments in the text cache, with the versions of the libraries extracting their text
+docx_extractor = extractor_key('docx paragraphs', 'python-docx')
+odt_extractor = extractor_key('odt paragraphs', 'odfpy')
+
+def extract_text_from_document(file_path, content, cache):
+    """Extracts text from the bytes of a DOCX or ODT attachment, or reads it from the cache if they were already extracted."""
+    extractor = odt_extractor if file_path.endswith('.odt') else docx_extractor
+    digest = content_digest(content)
+    text_content = cache.get(digest, extractor)
+    if text_content is not None:
+        return text_content, len(text_content.split())
+
+    if file_path.endswith('.odt'):
+        text_content, word_count = extract_text_from_odt(file_path, io.BytesIO(content))
+    else:
+        text_content, word_count = extract_text_from_docx(file_path, io.BytesIO(content))
+    if text_content != "ERROR in reading text":  # Unreadable attachments are tried again on the next run
+        cache.put(digest, extractor, text_content)
+    return text_content, word_count
+
+def theme_fields(theme):
+    """Returns the code, label and group of a THEME element."""
+    return {"Code": theme.findtext("CODE"), "Libelle": theme.findtext("LIBELLE"), "Groupe": theme.findtext("GROUPE")}
+
+# Fields of an agreement, filled in one walk of its XML file; Document is the name of its attachment
+fields = FieldSpec({
+    "ID": ".//ID",
+    "Date_effet": ".//DATE_EFFET",
+    "Date_fin": ".//DATE_FIN",
+    "SIRET": ".//SIRET",
+    "Raison_sociale": ".//RAISON_SOCIALE",
+    "Themes": Field(".//THEME", many=True, element=True, transform=theme_fields),
+    "Document": Field(".//DOCUMENT_BUREAUTIQUE", transform=lambda path: path.split('/')[-1]),
+})
 
 root_directory = 'ACCO'
 limit_to_first_folder = False  # Set this to False to process all folders
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+workers = None  # Number of parallel processes, defaults to the number of cores
+max_in_flight = None  # Archives submitted to the pool at once, defaults to twice the number of workers
+manifest_path = os.path.join(root_directory, 'manifest.sqlite')  # Records the archives already parsed
+force = False  # Set this to True to reparse the archives that did not change since the last run
+text_cache_path = os.path.join(root_directory, 'text_cache.sqlite')  # Texts of the attachments already extracted, shared by the workers
+document_buffer_size = ATTACHMENT_BUFFER_SIZE  # Bytes of attachments held until their XML file is read; beyond, they are read again
 
-for index, folder in enumerate(os.listdir(root_directory)):
-    if limit_to_first_folder and index > 0:
-        break
-
-    if folder.endswith('.tar.gz'):
-        folder_path = os.path.join(root_directory, folder[:-7])  # Remove '.tar.gz'
-        extract_tar_gz(os.path.join(root_directory, folder), folder_path)
-
-        xml_files = list(find_files(folder_path, '.xml'))  # Convert generator to list to count files
-        total_xml_files = len(xml_files)
-        print(f"Found {total_xml_files} XML files in {folder_path}.")
-        
-        json_data = []
-        for processed_count, xml_file in enumerate(xml_files, start=1):
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            # The rest of the XML processing code remains unchanged...
-            
-            # After processing an XML file, update progress
-            progress = (processed_count / total_xml_files) * 100
-            print(f"Processed {processed_count}/{total_xml_files} XML files. Progress: {progress:.2f}%")
+def process_archive(tar_path):
+    """Parses one archive and its attached documents into a JSON Lines file saved next to it, returning its path and entry count."""
+    pending_documents = {}  # Attachment file name -> entries waiting for its text
+    unclaimed_documents = AttachmentBuffer(document_buffer_size)  # Attachments read before their XML file
+    document_texts = {}  # Attachment file name -> (text, word count) of attachments already read
+
+    def fill_document(file_name, file_path, content):
+        text_content, word_count = document_texts[file_name] = extract_text_from_document(file_path, content, cache)
+        for entry in pending_documents.pop(file_name):
+            entry["Text"] = text_content
+            entry["Word_count"] = word_count
+            writer.write(entry)
 
-            if processed_count >= total_xml_files:
-                print("\033[92m" + f"All XML files processed. Saving data to JSON..." + "\033[0m")
+    with open_output(tar_path[:-7], compression, output_format, ACCO) as writer, TextCache(text_cache_path) as cache:
+        # Single sequential pass: attachments are matched to their XML file by name, whichever comes first in the archive.
+        # Entries are written as soon as their text is known
+        processed_count = 0
+        for file_path, content in iter_tar_members(tar_path, ('.xml', '.docx', '.odt')):
+            file_name = os.path.basename(file_path)
+            if not file_path.endswith('.xml'):
+                if file_name in pending_documents:
+                    fill_document(file_name, file_path, content)
+                elif file_name not in document_texts:
+                    unclaimed_documents.add(file_name, tar_path, file_path, content)
+                continue
+
+            root = ET.fromstring(content)
+
+            # After processing an XML file, update progress
+            processed_count += 1
+            print(f"Processed {processed_count} XML files from {tar_path}.")
 
             # Extract relevant information
-            entry = {
-                "ID": root.find(".//ID").text if root.find(".//ID") is not None else "",
-                "Date_effet": root.find(".//DATE_EFFET").text if root.find(".//DATE_EFFET") is not None else "",
-                "Date_fin": root.find(".//DATE_FIN").text if root.find(".//DATE_FIN") is not None else "",
-                "SIRET": root.find(".//SIRET").text if root.find(".//SIRET") is not None else "",
-                "Raison_sociale": root.find(".//RAISON_SOCIALE").text if root.find(".//RAISON_SOCIALE") is not None else "",
-                "Themes": [{"Code": theme.find("CODE").text, "Libelle": theme.find("LIBELLE").text, "Groupe": theme.find("GROUPE").text} for theme in root.findall(".//THEME")],
-                "Text": ""
-            }
-            document_name = root.find(".//DOCUMENT_BUREAUTIQUE").text.split('/')[-1] if root.find(".//DOCUMENT_BUREAUTIQUE") is not None else ""
-            for file_path in find_files(folder_path, document_name):
-                if file_path.endswith('.docx') or file_path.endswith('.odt'):
-                    if file_path.endswith('.odt'):
-                        temp_docx_path = file_path + '.docx'
-                        convert_odt_to_docx(file_path, temp_docx_path)
-                        file_path = temp_docx_path  # Update file_path to point to the converted DOCX
-                        
-                    text_content, word_count = extract_text_from_docx(file_path)
-                    entry["Text"] = text_content
-                    entry["Word_count"] = word_count
-
-                    if file_path.endswith('.odt'):  # Clean up temporary DOCX file if it was an ODT conversion
-                        os.remove(temp_docx_path)
-
-            json_data.append(entry)
-        # Save to JSON file
-        json_path = os.path.join(folder_path, folder[:-7] + '.json')
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=4)
-        print("\033[92m" + f"Successfully saved data to {json_path}" + "\033[0m")
+            entry = fields.extract(root)
+            document_name = entry.pop("Document")
+            entry["Text"] = ""
+            if document_name in unclaimed_documents:
+                document_texts[document_name] = extract_text_from_document(*unclaimed_documents.pop(document_name), cache)
+            if document_name in document_texts:
+                entry["Text"], entry["Word_count"] = document_texts[document_name]
+            elif document_name:
+                pending_documents.setdefault(document_name, []).append(entry)
+                continue
+
+            writer.write(entry)
+
+        unclaimed_documents.clear()
+
+        # Attachments read before their XML file while the buffer was full are read again, in a pass that stops at the last one
+        for file_name, file_path, content in unclaimed_documents.reread(list(pending_documents)):
+            fill_document(file_name, file_path, content)
+
+        # Entries whose attachment is missing from the archive are saved without text
+        for entries in pending_documents.values():
+            writer.write_all(entries)
+
+    print("\033[92m" + f"All XML files and attached documents processed." + "\033[0m")
+
+    return writer.path, writer.count
+
+if __name__ == "__main__":
+    tar_paths = [os.path.join(root_directory, folder) for folder in sorted(os.listdir(root_directory)) if folder.endswith('.tar.gz')]
+    if limit_to_first_folder:
+        tar_paths = tar_paths[:1]
+
+    # Only the archives that are new or changed since the last run are parsed
+    with Manifest(manifest_path) as manifest:
+        if not force:
+            tar_paths = manifest.pending(tar_paths)
+
+        for tar_path, (json_path, count) in run_parallel(process_archive, tar_paths, workers, max_in_flight):
+            manifest.record(tar_path, [json_path])
+            print("\033[92m" + f"Successfully saved {count} entries to {json_path}" + "\033[0m")
@@ -1,120 +1,165 @@
 import os
-import tarfile
-import json
-import xml.etree.ElementTree as ET
-from PyPDF2 import PdfReader
+from itertools import chain
+from dila import parsers as ET
+from dila.archive import iter_tar_members, AttachmentBuffer, ATTACHMENT_BUFFER_SIZE
+from dila.cache import TextCache
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.schemas import AMF
+from dila.pdf import PdfPool, PDF_TIMEOUT, PDF_MEMORY_LIMIT, PDF_SPLIT_PAGES
 
-def extract_and_process_tar_files(root_directory):
-    tar_files = [f for f in os.listdir(root_directory) if f.endswith('.tar.gz')]
-    
-    print(f"Found {len(tar_files)} .tar.gz files.")
-    i = 0
+# Fields of a filing, filled in one walk of its XML file; Content_file is the name of its PDF
+fields = FieldSpec({
+    "ID_Diffuseur": Field(".//identificationDiffuseur", attribute="IDI_COD_DIF"),
+    "ID_Societe_country": Field(".//identificationSociete", attribute="ISO_PAY_SS"),
+    "ID_Societe_name": Field(".//identificationSociete", attribute="ISO_NOM_SOC"),
+    "ID_societe": Field(".//identificationSociete", attribute="ISO_CD_ISI"),
+    "InformationDeposee": Field(".//InformationDeposee", attribute="INF_DAT_EMT"),
+    "Title": Field(".//InformationDeposee", attribute="INF_TIT_INF"),
+    "Content_file": Field(".//FichierDeContenu", attribute="INF_FIC_NOM", transform=lambda path: path.split('/')[-1]),
+})
 
-    for tar_file in tar_files:
-        folder_name = tar_file[:-7]  # Remove .tar.gz extension
-        folder_path = os.path.join(root_directory, folder_name)
-        tar_path = os.path.join(root_directory, tar_file)
-        
-        # Extract tar file
-        with tarfile.open(tar_path, "r:gz") as tar:
-            tar.extractall(path=folder_path)
-        
-        print(f"Uncompressed {tar_file} successfully.")
-        
-        # Process XML files
-        xml_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith('.xml'):
-                    xml_files.append(os.path.join(root, file))
+def read_tar_file(tar_path, pdfs):
+    """Parses the XML files of one archive and queues the PDFs they reference, returning its entries and PDF count.
+
+    The archive is read in a single sequential pass, matching PDFs to their XML files by name whichever comes
+    first: PDFs read before an XML file references them are held until one does, and each PDF is queued once.
+    Beyond pdf_buffer_size bytes of held PDFs, those still referenced at the end are read in a second pass.
+    """
+    root_directory = os.path.dirname(tar_path)
+    folder_name = os.path.basename(tar_path)[:-7]  # Remove .tar.gz extension
+    folder_path = os.path.join(root_directory, folder_name)
+
+    # Parse XML and create JSON, reading the archive as a stream instead of extracting it
+    data_list = []
+    pending_pdfs = {}  # PDF file name -> entries waiting for the PDF
+    unclaimed_pdfs = AttachmentBuffer(pdf_buffer_size)  # PDFs read before their XML file
+    queued_pdfs = {}  # PDF file name -> entries of the PDFs queued, filled once the archive is read
+
+    def queue(pdf_name, pdf_member, pdf_content):
+        queued_pdfs[pdf_name] = pending_pdfs.pop(pdf_name)
+        pdfs.submit((tar_path, os.path.join(folder_path, pdf_member), queued_pdfs[pdf_name]), pdf_content)
+
+    for member_name, content in iter_tar_members(tar_path, ('.xml', '.pdf')):
+        if member_name.endswith('.pdf'):
+            pdf_name = os.path.basename(member_name)
+            if pdf_name in pending_pdfs:
+                queue(pdf_name, member_name, content)
+            elif pdf_name not in queued_pdfs:
+                unclaimed_pdfs.add(pdf_name, tar_path, member_name, content)
+            continue
+
+        root = ET.fromstring(content)
         
-        print(f"Found {len(xml_files)} xml files in {folder_name}.")
+        data = fields.extract(root)
+        content_file_name = data.pop("Content_file")
+        data.update({
+            "Text": "",
+            "Word_count": 0,
+            "Pages": [],
+            "PDF_file_name": "",
+            "PDF_folder_path": "",
+            "XML_file_name": os.path.basename(member_name)
+        })
         
-        # Parse XML and create JSON
-        data_list = []
-        for xml_file in xml_files:
-            tree = ET.parse(xml_file)
-            root = tree.getroot()
-            
-            data = {
-                "ID_Diffuseur": root.find(".//identificationDiffuseur").attrib.get("IDI_COD_DIF", ""),
-                "ID_Societe_country": root.find(".//identificationSociete").attrib.get("ISO_PAY_SS", ""),
-                "ID_Societe_name": root.find(".//identificationSociete").attrib.get("ISO_NOM_SOC", ""),
-                "ID_societe": root.find(".//identificationSociete").attrib.get("ISO_CD_ISI", ""),
-                "InformationDeposee": root.find(".//InformationDeposee").attrib.get("INF_DAT_EMT", ""),
-                "Title": root.find(".//InformationDeposee").attrib.get("INF_TIT_INF", ""),
-                "Text": "",
-                "Word_count": 0,
-                "PDF_file_name": "",
-                "PDF_folder_path": "",
-                "XML_file_name": os.path.basename(xml_file)
-            }
-            
-            content_file_name = root.find(".//FichierDeContenu").attrib.get("INF_FIC_NOM", "").split('/')[-1]
-            content_file_path = find_file_in_folder(folder_path, content_file_name)
-            
-            if content_file_path and content_file_path.endswith('.pdf'):
-                text, success = extract_text_from_pdf(content_file_path, root_directory)
-                if success:
-                    data['Text'] = text
-                    data['Word_count'] = len(text.split())
-                    data['PDF_file_name'] = os.path.basename(content_file_path)
-                    data['PDF_folder_path'] = os.path.dirname(content_file_path)
-                else:
-                    log_error(content_file_path, root_directory)
-            
-            data_list.append(data)
+        if content_file_name.endswith('.pdf'):
+            if content_file_name in queued_pdfs:
+                # The results of the pool are only read once the archive is, so the entry is filled with the others
+                queued_pdfs[content_file_name].append(data)
+            else:
+                pending_pdfs.setdefault(content_file_name, []).append(data)
+                if content_file_name in unclaimed_pdfs:
+                    queue(content_file_name, *unclaimed_pdfs.pop(content_file_name))
         
-        # Save JSON file
-        json_file_path = os.path.join(root_directory, f"{folder_name}.json")
-        with open(json_file_path, 'w') as json_file:
-            json.dump(data_list, json_file, ensure_ascii=False, indent=4)
+        data_list.append(data)
+    unclaimed_pdfs.clear()
 
-        i += 1
+    # PDFs read before their XML file while the buffer was full are read again, in a pass that stops at the last one
+    for pdf_name, pdf_member, pdf_content in unclaimed_pdfs.reread(list(pending_pdfs)):
+        queue(pdf_name, pdf_member, pdf_content)
+    
+    print(f"Found {len(data_list)} xml files in {folder_name}.")
+    return data_list, len(queued_pdfs)
 
-        print(f'\033[94mProcessed {i} folders out of {len(tar_files)}\033[0m')
 
-        print(f"\033[92mSaved {json_file_path} successfully.\033[0m")
-        
-        # Clean up: delete uncompressed folder
-        delete_folder(folder_path)
+def save_tar_file(tar_path, data_list):
+    """Saves the entries of one archive into a JSON Lines file next to it, returning the path of that file."""
+    with open_output(os.path.join(os.path.dirname(tar_path), os.path.basename(tar_path)[:-7]), compression, output_format, AMF) as writer:
+        writer.write_all(data_list)
+    return writer.path
+
+
+def release(archives, tar_path):
+    """Counts one pending task of an archive as done, and saves the archive when it was the last one."""
+    archives[tar_path][1] -= 1
+    if archives[tar_path][1] == 0:
+        yield save_tar_file(tar_path, archives.pop(tar_path)[0])
+
+
+def fill_pdf_text(archives, results, root_directory):
+    """Fills the entries of the extracted PDFs with their text, or logs their error, yielding the paths of the archives saved."""
+    for (tar_path, content_file_path, entries), text, pages, error in results:
+        if error is None:
+            for data in entries:
+                data['Text'] = text
+                data['Word_count'] = len(text.split())
+                data['Pages'] = pages
+                data['PDF_file_name'] = os.path.basename(content_file_path)
+                data['PDF_folder_path'] = os.path.dirname(content_file_path)
+        else:
+            print(f"\033[91mError processing {content_file_path}: {error}\033[0m")
+            log_error(content_file_path, root_directory, error)
+        yield from release(archives, tar_path)
+
+
+def extract_and_process_tar_files(root_directory, pdf_workers=None, pdf_timeout=PDF_TIMEOUT, pdf_memory_limit=PDF_MEMORY_LIMIT):
+    tar_files = [f for f in os.listdir(root_directory) if f.endswith('.tar.gz')]
+    
+    print(f"Found {len(tar_files)} .tar.gz files.")
+    i = 0
+
+    archives = {}  # Archive path -> [entries, pending tasks]: its PDFs, and its reading until it is done
+
+    # The XML of the next archives is parsed while the pool extracts the PDFs of the previous ones
+    with TextCache(text_cache_path) as cache, \
+            PdfPool(pdf_workers, pdf_timeout, pdf_memory_limit, cache=cache, split_pages=pdf_split_pages,
+                    max_pages=pdf_max_pages, max_chars=pdf_max_chars, backend=pdf_backend) as pdfs:
+        for tar_file in tar_files:
+            tar_path = os.path.join(root_directory, tar_file)
+            data_list, queued = read_tar_file(tar_path, pdfs)
+            archives[tar_path] = [data_list, queued + 1]
+            finished = chain(release(archives, tar_path), fill_pdf_text(archives, pdfs.results(), root_directory))
+            for json_file_path in finished:
+                i += 1
+                print(f'\033[94mProcessed {i} folders out of {len(tar_files)}\033[0m')
+                print(f"\033[92mSaved {json_file_path} successfully.\033[0m")
+
+        for json_file_path in fill_pdf_text(archives, pdfs.drain(), root_directory):
+            i += 1
+            print(f'\033[94mProcessed {i} folders out of {len(tar_files)}\033[0m')
+            print(f"\033[92mSaved {json_file_path} successfully.\033[0m")
     
     print('\033[92mFinished Task\033[0m')
         
 
-def log_error(file_path, root_directory):
-    error_message = f"Error parsing {file_path}\n"
+def log_error(file_path, root_directory, error):
+    error_message = f"Error parsing {file_path}: {error}\n"
     with open(os.path.join(root_directory, "ERROR_parsing_PDFs.txt"), "a") as error_log:
         error_log.write(error_message)
 
-def find_file_in_folder(folder_path, file_name):
-    for root, dirs, files in os.walk(folder_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return ""
-
-def extract_text_from_pdf(pdf_path, root_directory):
-    try:
-        text = ""
-        with open(pdf_path, 'rb') as f:
-            pdf = PdfReader(f)
-            for page_num in range(len(pdf.pages)):  # Correct loop usage
-                page = pdf.pages[page_num]  # Access the page correctly for PyPDF2 >= 3.0.0
-                text += page.extract_text()  # Correct method to extract text
-        return text, True
-    except Exception as e:
-        print(f"\033[91mError processing {pdf_path}: {str(e)}\033[0m")
-        return "", False
-
-def delete_folder(folder_path):
-    for root, dirs, files in os.walk(folder_path, topdown=False):
-        for name in files:
-            os.remove(os.path.join(root, name))
-        for name in dirs:
-            os.rmdir(os.path.join(root, name))
-    os.rmdir(folder_path)
-    print(f"Deleted {folder_path} successfully.")
-
 # List of folders to test the script on, replace with your actual root directory
 root_directory = "AMF"
-extract_and_process_tar_files(root_directory)
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+pdf_workers = None  # PDF extraction processes, defaults to the number of cores
+pdf_timeout = PDF_TIMEOUT  # Seconds before a PDF extraction is killed and logged
+pdf_memory_limit = PDF_MEMORY_LIMIT  # Bytes of memory of each PDF extraction process
+pdf_backend = None  # PDF engine: 'pypdfium2', 'pdftotext', 'PyPDF2' or 'pdfminer', None for the fastest installed
+pdf_split_pages = PDF_SPLIT_PAGES  # Pages of the ranges a long PDF is split into for several workers, None to read it whole
+pdf_max_pages = None  # Pages read at most from each PDF, None for all
+pdf_max_chars = None  # Characters after which the reading of a PDF stops at the end of the page, None for no limit
+pdf_buffer_size = ATTACHMENT_BUFFER_SIZE  # Bytes of PDFs held until their XML file is read; beyond, they are read again
+text_cache_path = os.path.join(root_directory, 'text_cache.sqlite')  # Texts already extracted, reused on reruns and for identical PDFs
+
+if __name__ == "__main__":
+    extract_and_process_tar_files(root_directory, pdf_workers, pdf_timeout, pdf_memory_limit)
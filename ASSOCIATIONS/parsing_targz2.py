@@ -1,77 +1,54 @@
 import os
-import tarfile
-import json
-import xml.etree.ElementTree as ET
-import shutil
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import iter_archive
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.schemas import ASSOCIATIONS
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
 
 def get_text(element):
     if element is not None:
         return ' '.join(''.join(element.itertext()).split())
     return ""
 
+# Fields of an announcement, filled in one walk of its <annonce> element
+fields = FieldSpec({
+    "ID": ".//identifiant",
+    "Date": ".//dateDeclaration",
+    "Type": Field(".//type", attribute="code"),
+    "Themes": Field(".//theme", many=True, transform=str.strip),
+    "Titre": ".//titre",
+    "SiegeSocial": Field(".//siegeSocial", element=True, transform=get_text),
+    "Text": ".//objet",
+})
+
 def process_tar_files(file_names):
     for file_name in file_names:
         base_name = file_name.replace('.tar.gz', '')
         print(f"Working on folder: {base_name}")
 
-        # Uncompress tar.gz file
-        with tarfile.open(file_name, 'r:gz') as tar:
-            tar.extractall(path=base_name)
-
-        # Uncompress all .taz files before proceeding to XML processing
-        for root, dirs, files in os.walk(base_name):
-            for file in files:
-                if file.endswith('.taz'):
-                    taz_path = os.path.join(root, file)
-                    with tarfile.open(taz_path, 'r:gz') as taz:
-                        taz.extractall(path=root)
-                        os.remove(taz_path)  # Optionally remove the .taz file after extraction
-
-        # Create JSON file
-        json_data = []
         xml_files_count = 0
+        # Create JSON Lines file
+        with open_output(base_name, compression, output_format, ASSOCIATIONS) as writer:
+            # Process XML files of the tar.gz and of its inner .taz files, read in memory
+            for xml_file, xml_content in iter_archive(file_name, '.xml'):
+                xml_files_count += 1
+                # Parse XML files
+                root_xml = ET.fromstring(xml_content)
 
-        # Process XML files after all .taz files have been uncompressed
-        for root, dirs, files in os.walk(base_name):
-            for file in files:
-                if file.endswith('.xml'):
-                    xml_files_count += 1
-                    # Parse XML files
-                    xml_path = os.path.join(root, file)
-                    tree = ET.parse(xml_path)
-                    root_xml = tree.getroot()
+                for annonce in root_xml.findall('.//annonce'):
+                    entry = fields.extract(annonce)
+                    entry["Word_count"] = len(entry["Text"].split())
 
-                    for annonce in root_xml.findall('.//annonce'):
-                        identifiant = annonce.findtext('.//identifiant', '')
-                        date_declaration = annonce.findtext('.//dateDeclaration', '')
-                        type_code = annonce.find('.//type').get('code', '') if annonce.find('.//type') is not None else ''
-                        themes = [theme.text.strip() for theme in annonce.findall('.//theme')]
-                        titre = annonce.findtext('.//titre', '')
-                        siege_social = get_text(annonce.find('.//siegeSocial'))  # Fixed this line
-                        text = annonce.findtext('.//objet', '')
-                        word_count = len(text.split())
-
-                        entry = {
-                            "ID": identifiant,
-                            "Date": date_declaration,
-                            "Type": type_code,
-                            "Themes": themes,
-                            "Titre": titre,
-                            "SiegeSocial": siege_social,
-                            "Text": text,
-                            "Word_count": word_count
-                        }
-
-                        json_data.append(entry)
-
-        with open(f"{base_name}.json", 'w', encoding='utf-8') as json_file:
-            json.dump(json_data, json_file, ensure_ascii=False, indent=4)
+                    writer.write(entry)
 
         print(f"Found {xml_files_count} XML files in {base_name}")
-        print(f"Processed {len(json_data)} annonces out of {xml_files_count} XML files")
-
-        # Delete the uncompressed folder to save space
-        shutil.rmtree(base_name)
+        print(f"Processed {writer.count} annonces out of {xml_files_count} XML files")
 
 # Example usage
 file_names = ["ASS_2020.tar.gz", "ASS_2021.tar.gz", "ASS_2022.tar.gz", "ASS_2023.tar.gz"]
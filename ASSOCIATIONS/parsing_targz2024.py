@@ -1,8 +1,15 @@
 import os
-import tarfile
-import json
-import xml.etree.ElementTree as ET
-import shutil
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import iter_archive
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.schemas import ASSOCIATIONS
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
 
 def get_text(element):
     """ Extracts and cleans text from an XML element. """
@@ -10,60 +17,46 @@ def get_text(element):
         return ' '.join(''.join(element.itertext()).split())
     return ""
 
-def process_directories(directory):
-    # Traverse the given directory for all .taz files and extract them
+# Fields of an announcement, filled in one walk of its <annonce> element
+fields = FieldSpec({
+    "ID": ".//identifiant",
+    "Date": ".//dateDeclaration",
+    "Type": Field(".//type", attribute="code"),
+    "Themes": Field(".//theme", many=True, transform=str.strip),
+    "Titre": ".//titre",
+    "SiegeSocial": Field(".//siegeSocial", element=True, transform=get_text),
+    "Text": ".//objet",
+})
+
+def iter_xml_contents(directory):
+    """ Yields the content of XML files found in the directory and inside its .taz archives, without extracting them. """
     for root, dirs, files in os.walk(directory):
         for file in files:
             if file.endswith('.taz'):
-                taz_path = os.path.join(root, file)
-                with tarfile.open(taz_path, 'r:gz') as taz:
-                    taz.extractall(path=root)
-                    os.remove(taz_path)  # Remove the .taz file after extraction
+                for member_name, content in iter_archive(os.path.join(root, file), '.xml'):
+                    yield content
+            elif file.endswith('.xml'):
+                with open(os.path.join(root, file), 'rb') as xml_file:
+                    yield xml_file.read()
 
-    # Create JSON file
-    json_data = []
+def process_directories(directory):
     xml_files_count = 0
+    # Create JSON Lines file
+    with open_output(os.path.join(directory, 'processed_data'), compression, output_format, ASSOCIATIONS) as writer:
+        # Process XML files straight from the .taz archives
+        for xml_content in iter_xml_contents(directory):
+            xml_files_count += 1
+            # Parse XML files
+            root_xml = ET.fromstring(xml_content)
 
-    # Process XML files after all .taz files have been uncompressed
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.xml'):
-                xml_files_count += 1
-                # Parse XML files
-                xml_path = os.path.join(root, file)
-                tree = ET.parse(xml_path)
-                root_xml = tree.getroot()
-
-                for annonce in root_xml.findall('.//annonce'):
-                    identifiant = annonce.findtext('.//identifiant', '')
-                    date_declaration = annonce.findtext('.//dateDeclaration', '')
-                    type_code = annonce.find('.//type').get('code', '') if annonce.find('.//type') is not None else ''
-                    themes = [theme.text.strip() for theme in annonce.findall('.//theme')]
-                    titre = annonce.findtext('.//titre', '')
-                    siege_social = get_text(annonce.find('.//siegeSocial'))
-                    text = annonce.findtext('.//objet', '')
-                    word_count = len(text.split())
-
-                    entry = {
-                        "ID": identifiant,
-                        "Date": date_declaration,
-                        "Type": type_code,
-                        "Themes": themes,
-                        "Titre": titre,
-                        "SiegeSocial": siege_social,
-                        "Text": text,
-                        "Word_count": word_count
-                    }
-
-                    json_data.append(entry)
+            for annonce in root_xml.findall('.//annonce'):
+                entry = fields.extract(annonce)
+                entry["Word_count"] = len(entry["Text"].split())
 
-    # Save the processed data into a JSON file
-    json_file_path = os.path.join(directory, 'processed_data.json')
-    with open(json_file_path, 'w', encoding='utf-8') as json_file:
-        json.dump(json_data, json_file, ensure_ascii=False, indent=4)
+                writer.write(entry)
 
     print(f"Found {xml_files_count} XML files in the directory.")
-    print(f"Processed {len(json_data)} annonces out of {xml_files_count} XML files.")
+    print(f"Processed {writer.count} annonces out of {xml_files_count} XML files.")
 
 # Example usage, replace 'current_directory' with the actual directory you want to process
 current_directory = 'ASS_2024'
@@ -1,8 +1,15 @@
 import os
-import zipfile
-import xml.etree.ElementTree as ET
-import json
-import shutil
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import iter_archive
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.schemas import ASSOCIATIONS
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
 
 # Helper function to extract and clean text from an XML element
 def get_text(element):
@@ -10,51 +17,35 @@ def get_text(element):
         return ' '.join(''.join(element.itertext()).split())
     return ""
 
+# Fields of an announcement, filled in one walk of its <annonce> element
+fields = FieldSpec({
+    "ID": ".//identifiant",
+    "Date": Field(".//dateDeclaration", element=True, transform=get_text),
+    "Type": Field(".//type", element=True, transform=get_text),
+    "themes": Field(".//theme", many=True, element=True, transform=get_text),
+    "Titre": Field(".//titre", element=True, transform=get_text),
+    "SiegeSocial": Field(".//siegeSocial", element=True, transform=get_text),
+    "Text": Field(".//objet", element=True, transform=get_text),
+})
+
 # Navigate through each file in the current directory
 for filename in os.listdir('.'):
     if filename.endswith('.zip'):
         base_name = filename[:-4]
         print(f"Working on folder: {base_name}")
 
-        # Extract the ZIP file
-        with zipfile.ZipFile(filename, 'r') as zip_ref:
-            zip_ref.extractall(base_name)
-
-        # Prepare JSON data structure
-        json_data = {}
-
-        # Count XML files
-        xml_files = [f for f in os.listdir(base_name) if f.endswith('.xml')]
-        print(f"Found {len(xml_files)} XML files in {base_name}")
-
-        json_data = []
-
-        # Process each XML file
-        for xml_file in xml_files:
-            tree = ET.parse(os.path.join(base_name, xml_file))
-            root = tree.getroot()
-
-            for annonce in root.findall('.//annonce'):
-                identifiant = annonce.find('.//identifiant').text if annonce.find('.//identifiant') is not None else ""
-                if identifiant:
-                    entry = {
-                        "ID": identifiant,
-                        "Date": get_text(annonce.find('.//dateDeclaration')),
-                        "Type": get_text(annonce.find('.//type')),
-                        "themes": [get_text(theme) for theme in annonce.findall('.//theme')],
-                        "Titre": get_text(annonce.find('.//titre')),
-                        "SiegeSocial": get_text(annonce.find('.//siegeSocial')),
-                        "Text": get_text(annonce.find('.//objet')),
-                        "Word_count": len(get_text(annonce.find('.//objet')).split())
-                    }
-
-                    json_data.append(entry)
-
-        # Write to JSON file
-        with open(f"{base_name}.json", 'w', encoding='utf-8') as json_file:
-            json.dump(json_data, json_file, ensure_ascii=False, indent=4)
-
-        # Remove the extracted folder
-        shutil.rmtree(base_name)
-
-        print(f"Completed processing and cleaning up for folder: {base_name}")
+        xml_files_count = 0
+        with open_output(base_name, compression, output_format, ASSOCIATIONS) as writer:
+            # Process each XML file of the ZIP file, read in memory one at a time
+            for xml_file, xml_content in iter_archive(filename, '.xml'):
+                xml_files_count += 1
+                root = ET.fromstring(xml_content)
+
+                for annonce in root.findall('.//annonce'):
+                    entry = fields.extract(annonce)
+                    if entry["ID"]:
+                        entry["Word_count"] = len(entry["Text"].split())
+                        writer.write(entry)
+
+        print(f"Found {xml_files_count} XML files in {base_name}")
+        print(f"Completed processing for folder: {base_name}")
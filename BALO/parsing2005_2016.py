@@ -1,11 +1,32 @@
 import os
+import sys
 import zipfile
 import glob
-import json
-import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.encoding import sniff_encoding
+from dila.fields import Field, FieldSpec
+from dila.index import build_file_index
+from dila.output import open_output
+from dila.schemas import BALO
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+
+# Fields of an announcement, filled in one walk of its ANNONCE_REF element; Fichier_html is its HTML file
+fields = FieldSpec({
+    'Societe_nom': 'NOMS_SOCIETE/NOM_SOCIETE',
+    'Societe_siege': Field('NOMS_SOCIETE/NOM_SOCIETE', attribute='siege'),
+    'Numero_affaire': 'NUMERO_AFFAIRE',
+    'Fichier_html': 'FICHIERS_JOINTS/FICHIER_HTML',
+    'Categorie': Field('CATEGORIE', attribute='name'),
+    'Categorie_1': Field('CATEGORIE/CATEGORIE_N1', attribute='name'),
+    'Categorie_2': Field('CATEGORIE/CATEGORIE_N1/CATEGORIE_N2', attribute='name'),
+})
+
 def unzip_files(year):
     directories = ['xml unitaire.zip', 'html.zip']
     year_str = str(year)  # Convert year to string
@@ -23,58 +44,36 @@ def count_xml_files(year):
 
 def parse_xml_and_generate_json(year, xml_files):
     year_str = str(year)  # Convert year to string
-    data = []
-    i = 0
-    for xml_file in xml_files:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-
-        # Convert date format
-        date = root.attrib['date']
-        formatted_date = datetime.datetime.strptime(date, '%Y%m%d').strftime('%Y/%m/%d')
+    with open_output(f"BALO_{year_str}", compression, output_format, BALO) as writer:
+        i = 0
+        html_index = build_file_index(f"{year_str}/html")  # Walk the HTML folder once for all the lookups
+        for xml_file in xml_files:
+            tree = ET.parse(xml_file)
+            root = tree.getroot()
 
-        for annonce in root.findall('ANNONCE_REF'):
-            societe_nom = annonce.find('NOMS_SOCIETE/NOM_SOCIETE').text
-            societe_siege = annonce.find('NOMS_SOCIETE/NOM_SOCIETE').attrib['siege']
-            affaire_number = annonce.find('NUMERO_AFFAIRE').text
-            fichier_html_path = annonce.find('FICHIERS_JOINTS/FICHIER_HTML').text
-            categorie = annonce.find('CATEGORIE').attrib.get('name', '')
-            categorie_1_element = annonce.find('CATEGORIE/CATEGORIE_N1')
-            categorie_1 = categorie_1_element.attrib.get('name', '') if categorie_1_element is not None else ""
-            categorie_2_element = annonce.find('CATEGORIE/CATEGORIE_N1/CATEGORIE_N2')
-            categorie_2 = categorie_2_element.attrib.get('name', '') if categorie_2_element is not None else "" 
-            html_filename = fichier_html_path.split('/')[-1]
-            html_file_path = glob.glob(f"{year_str}/html/**/{html_filename}", recursive=True)
-            text_content = ''
-            word_count = 0
-            if html_file_path:
-                for encoding in ['utf-8', 'iso-8859-1', 'windows-1252']:
-                    try:
-                        with open(html_file_path[0], 'r', encoding=encoding) as f:
-                            html_content = f.read()
-                            soup = BeautifulSoup(html_content, 'html.parser')
-                            text_content = soup.get_text(separator=' ', strip=True)
-                            word_count = len(text_content.split())
-                            break  # Exit the loop if file is successfully read
-                    except UnicodeDecodeError:
-                        continue  # Try the next encoding if an error occurs
+            # Convert date format
+            date = root.attrib['date']
+            formatted_date = datetime.datetime.strptime(date, '%Y%m%d').strftime('%Y/%m/%d')
 
-            data.append({
-                'Date': formatted_date,
-                'Societe_nom': societe_nom,
-                'Societe_siege': societe_siege,
-                'Numero_affaire': affaire_number,
-                "Categorie" : categorie,
-                "Categorie_1" : categorie_1,
-                "Categorie_2": categorie_2,
-                'Text': text_content,
-                'Word_count': word_count
-            })
-            i += 1
-            print(f'Processed {i} files out of {len(xml_files)}')
+            for annonce in root.findall('ANNONCE_REF'):
+                entry = {'Date': formatted_date, **fields.extract(annonce)}
+                html_filename = entry.pop('Fichier_html').split('/')[-1]
+                html_file_path = html_index.find(html_filename)
+                text_content = ''
+                word_count = 0
+                if html_file_path:
+                    # The charset is sniffed from the bytes (BOM or <meta>), so the file is read and decoded once
+                    with open(html_file_path, 'rb') as f:
+                        html_content = f.read()
+                    soup = BeautifulSoup(html_content, 'html.parser', from_encoding=sniff_encoding(html_content))
+                    text_content = soup.get_text(separator=' ', strip=True)
+                    word_count = len(text_content.split())
 
-    with open(f"BALO_{year_str}.json", 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+                entry['Text'] = text_content
+                entry['Word_count'] = word_count
+                writer.write(entry)
+                i += 1
+                print(f'Processed {i} files out of {len(xml_files)}')
 
 
 def clean_up_folders(year):
@@ -1,124 +1,105 @@
 import os
-import json
-import tarfile
-import xml.etree.ElementTree as ET
+import io
+import sys
 from datetime import datetime
-from PyPDF2 import PdfReader
-
-def extract_text_from_pdf(pdf_path):
-    """
-    Extracts text from a PDF file using PyPDF2.
-
-    Args:
-        pdf_path (str): The file path to the PDF document.
-
-    Returns:
-        str: The extracted text from the PDF.
-    """
-    text = ""
-    try:
-        with open(pdf_path, 'rb') as file:
-            reader = PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"  # Extract text from each page
-    except Exception as e:
-        raise Exception(f"Failed to extract PDF text: {e}")
-    return text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.archive import iter_tar_members
+from dila.cache import TextCache
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.pdf import PdfPool, PDF_TIMEOUT, PDF_MEMORY_LIMIT
+from dila.records import iter_records
+from dila.schemas import BALO
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+pdf_workers = None  # PDF extraction processes, defaults to the number of cores
+pdf_timeout = PDF_TIMEOUT  # Seconds before a PDF extraction is killed and logged
+pdf_memory_limit = PDF_MEMORY_LIMIT  # Bytes of memory of each PDF extraction process
+pdf_backend = None  # PDF engine: 'pypdfium2', 'pdftotext', 'PyPDF2' or 'pdfminer', None for the fastest installed
+text_cache_path = 'text_cache.sqlite'  # Texts already extracted, reused on reruns and for identical PDFs
+
+def fill_pdf_text(results, error_log_path):
+    """Yields the announcements of the extracted PDFs with their text; those whose PDF failed are logged and dropped."""
+    for (entry, pdf_path), text, _, error in results:
+        if error is not None:
+            with open(error_log_path, 'a') as error_file:
+                error_file.write(f'Error processing PDF {pdf_path}: {error}\n')
+            continue
+        entry['Text'] = text
+        entry['Word_count'] = len(text.split())
+        yield entry
+
+# Fields of an announcement, filled in one walk of its ANNONCE_REF element; the attached TXT or PDF file holds its text
+fields = FieldSpec({
+    'Societe_nom': 'NOMS_SOCIETE/NOM_SOCIETE',
+    'Societe_siege': Field('NOMS_SOCIETE/NOM_SOCIETE', attribute='siege'),
+    'Numero_affaire': 'NUMERO_AFFAIRE',
+    'Categorie': Field('CATEGORIE', attribute='name'),
+    'Categorie_1': Field('CATEGORIE/CATEGORIE_N1', attribute='name'),
+    'Categorie_2': Field('CATEGORIE/CATEGORIE_N1/CATEGORIE_N2', attribute='name'),
+    'Fichier_txt': Field('FICHIERS_JOINTS/FICHIER_TXT', default=None),
+    'Fichier_pdf': Field('FICHIERS_JOINTS/FICHIER_PDF', default=None),
+})
 
 def extract_and_process_data(start_year=2018, end_year=2022):
     for year in range(start_year, end_year + 1):
         year_folder = str(year)
-        json_file_path = f'BALO_{year}.json'
         error_log_path = f'Error_{year}.txt'
-        data = []
 
         print(f'Processing year: {year}')
 
-        taz_files = [f for f in os.listdir(year_folder) if f.endswith('.taz')]
-        total_files = len(taz_files)
-
-        for i, tar_file in enumerate(taz_files, start=1):
-            print(f'Processing file: {tar_file}, {i} out of {total_files}')
-            tar_file_path = os.path.join(year_folder, tar_file)
-            extract_folder_path = os.path.join(year_folder, tar_file.replace('.taz', ''))
-            if not os.path.exists(extract_folder_path):
-                os.makedirs(extract_folder_path)
-
-            with tarfile.open(tar_file_path) as tar:
-                tar.extractall(path=extract_folder_path)
-
-            for member in os.listdir(extract_folder_path):
-                if member.endswith('.xml'):
-                    try:
-                        xml_path = os.path.join(extract_folder_path, member)
-                        tree = ET.parse(xml_path)
-                        root = tree.getroot()
-                        date = datetime.strptime(root.attrib['date'], '%Y%m%d').strftime('%Y/%m/%d')
-
-                        for annonce_ref in root.findall('ANNONCE_REF'):
-                            fichier_txt_element = annonce_ref.find('FICHIERS_JOINTS/FICHIER_TXT')
-                            text, word_count = "", 0
-                            if fichier_txt_element is not None:
-                                txt_path = os.path.join(extract_folder_path, fichier_txt_element.text)
-                                if os.path.exists(txt_path):
-                                    with open(txt_path, 'r', encoding='utf-8') as txt_file:
-                                        text = txt_file.read()
+        # Announcements with a PDF are written once the pool has extracted its text, while the next ones are parsed
+        with open_output(f'BALO_{year}', compression, output_format, BALO) as writer, \
+                TextCache(text_cache_path) as cache, \
+                PdfPool(pdf_workers, pdf_timeout, pdf_memory_limit, page_end='\n', cache=cache, backend=pdf_backend) as pdfs:
+            taz_files = [f for f in os.listdir(year_folder) if f.endswith('.taz')]
+            total_files = len(taz_files)
+
+            for i, tar_file in enumerate(taz_files, start=1):
+                print(f'Processing file: {tar_file}, {i} out of {total_files}')
+                tar_file_path = os.path.join(year_folder, tar_file)
+                extract_folder_path = os.path.join(year_folder, tar_file.replace('.taz', ''))
+
+                # Daily archives are small: keep their members in memory instead of extracting them to disk
+                members = {os.path.normpath(name): content for name, content in iter_tar_members(tar_file_path)}
+
+                for member in members:
+                    if member.endswith('.xml'):
+                        try:
+                            date = None
+                            # Announcements are parsed one at a time instead of building the tree of the whole bulletin
+                            for root, annonce_ref in iter_records(io.BytesIO(members[member]), 'ANNONCE_REF'):
+                                if date is None:
+                                    date = datetime.strptime(root.attrib['date'], '%Y%m%d').strftime('%Y/%m/%d')
+                                entry = {'Date': date, **fields.extract(annonce_ref)}
+                                fichier_txt, fichier_pdf = entry.pop('Fichier_txt'), entry.pop('Fichier_pdf')
+                                text, word_count = "", 0
+                                if fichier_txt is not None:
+                                    txt_name = os.path.normpath(fichier_txt)
+                                    if txt_name in members:
+                                        text = members[txt_name].decode('utf-8')
                                         word_count = len(text.split())
-                            else:
-                                fichier_pdf_element = annonce_ref.find('FICHIERS_JOINTS/FICHIER_PDF')
-                                if fichier_pdf_element is not None:
-                                    pdf_path = os.path.join(extract_folder_path, fichier_pdf_element.text)
-                                    if os.path.exists(pdf_path):
-                                        try:
-                                            text = extract_text_from_pdf(pdf_path)
-                                            word_count = len(text.split())
-                                        except Exception as e:
-                                            with open(error_log_path, 'a') as error_file:
-                                                error_file.write(f'Error processing PDF {pdf_path}: {e}\n')
-                                            continue
-
-                            entry = {
-                                'Date': date,
-                                'Societe_nom': annonce_ref.find('NOMS_SOCIETE/NOM_SOCIETE').text if annonce_ref.find('NOMS_SOCIETE/NOM_SOCIETE') is not None else "",
-                                'Societe_siege': '',
-                                'Numero_affaire': annonce_ref.find('NUMERO_AFFAIRE').text,
-                                'Categorie': annonce_ref.find('CATEGORIE').attrib.get('name', ''),
-                                'Categorie_1': "",
-                                'Categorie_2': "",
-                                'Text': text,
-                                'Word_count': word_count
-                            }
-
-                            societe_siege_element = annonce_ref.find('NOMS_SOCIETE/NOM_SOCIETE')
-                            if societe_siege_element is not None:
-                                entry['Societe_siege'] = societe_siege_element.attrib.get('siege', '')
-
-                            categorie_1_element = annonce_ref.find('CATEGORIE/CATEGORIE_N1')
-                            if categorie_1_element is not None:
-                                entry['Categorie_1'] = categorie_1_element.attrib.get('name', '')
-
-                            categorie_2_element = annonce_ref.find('CATEGORIE/CATEGORIE_N1/CATEGORIE_N2')
-                            if categorie_2_element is not None:
-                                entry['Categorie_2'] = categorie_2_element.attrib.get('name', '')
-
-                            data.append(entry)
-
-                    except Exception as e:
-                        with open(error_log_path, 'a') as error_file:
-                            error_file.write(f'Error processing XML {member}: {e}\n')
-                        continue
-
-            # Cleanup
-            for root, dirs, files in os.walk(extract_folder_path, topdown=False):
-                for name in files:
-                    os.remove(os.path.join(root, name))
-                for name in dirs:
-                    os.rmdir(os.path.join(root, name))
-            os.rmdir(extract_folder_path)
-
-        # Write updated data to JSON file
-        with open(json_file_path, 'w') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
+                                elif fichier_pdf is not None:
+                                    pdf_name = os.path.normpath(fichier_pdf)
+                                    pdf_path = os.path.join(extract_folder_path, pdf_name)
+                                    if pdf_name in members:
+                                        pdfs.submit((entry, pdf_path), members[pdf_name])
+                                        continue
+
+                                entry['Text'] = text
+                                entry['Word_count'] = word_count
+                                writer.write(entry)
+
+                        except Exception as e:
+                            with open(error_log_path, 'a') as error_file:
+                                error_file.write(f'Error processing XML {member}: {e}\n')
+                            continue
+
+                writer.write_all(fill_pdf_text(pdfs.results(), error_log_path))
+
+            writer.write_all(fill_pdf_text(pdfs.drain(), error_log_path))
 
         print(f"\033[92mCompleted year: {year}\033[0m")
 
@@ -1,10 +1,22 @@
 import os
-import json
-import zipfile
-import xml.etree.ElementTree as ET
+import sys
 from bs4 import BeautifulSoup
 import shutil
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import extract_archive, ARCHIVE_ERRORS
+from dila.cache import TextCache, extractor_key
+from dila.encoding import parse_xml_bytes, sniff_encoding
+from dila.fields import Field, FieldSpec
+from dila.index import build_file_index
+from dila.output import open_output
+from dila.schemas import BOAMP
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+text_cache_path = 'text_cache.sqlite'  # Texts of the HTML notices already extracted, reused on reruns and for republished notices
+
 # Define the root directory where to start the search
 root_directory = 'FluxHistorique/Boamp_v230'
 
@@ -34,33 +46,31 @@ def find_and_process_year_folders(root_dir, years):
                 dirs.remove(year)  # To avoid re-traversing the directory
 
 def process_year_folder(year_path, year):
-    json_data = []
     for subdir, dirs, files in os.walk(year_path):
         for file in files:
             if file.endswith('.zip'):
                 zip_path = os.path.join(subdir, file)
-                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                    zip_ref.extractall(subdir)
+                try:
+                    extract_archive(zip_path, subdir)
+                except ARCHIVE_ERRORS as e:
+                    print(f"Failed to extract {zip_path}: {e}")
 
     xml_files = find_files(year_path, '.xml')
     print(f"Found {len(xml_files)} XML files for year {year}.")
+    file_index = build_file_index(year_path)  # Walk the year folder once for all the HTML lookups
     
-    for index, xml_file in enumerate(xml_files):
-        print(f"Processing XML file {index + 1}/{len(xml_files)} for year {year}.")
-        json_entry = parse_xml(xml_file, year_path)  # Pass year_path as an argument here
-        json_data.append(json_entry)
-    
-    # Save the JSON data to a file
-    json_file_path = os.path.join(year_path, f"{year}.json")
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump(json_data, f, ensure_ascii=False, indent=4)
+    # Save the entries to a JSON Lines file as they are parsed
+    with open_output(os.path.join(year_path, str(year)), compression, output_format, BOAMP) as writer, TextCache(text_cache_path) as cache:
+        for index, xml_file in enumerate(xml_files):
+            print(f"Processing XML file {index + 1}/{len(xml_files)} for year {year}.")
+            writer.write(parse_xml(xml_file, file_index, cache))
     
     # Cleanup: Delete all uncompressed files except the .zip and .json files
     for file in find_files(year_path, '.xml') + find_files(year_path, '.htm'):
         os.remove(file)
 
     remove_specific_directories(year_path, ['html', 'xml'])
-    print(f'\033[92mSaved {json_file_path} successfully\033[0m')
+    print(f'\033[92mSaved {writer.path} successfully\033[0m')
 
 def find_files(directory, extension):
     files_found = []
@@ -70,64 +80,62 @@ def find_files(directory, extension):
                 files_found.append(os.path.join(subdir, file))
     return files_found
 
-def parse_xml(xml_file_path, year_path):
-    try:
-        with open(xml_file_path, 'r', encoding='utf-8') as file:
-            xml_content = file.read()
-    except UnicodeDecodeError:
-        with open(xml_file_path, 'r', encoding='iso-8859-1') as file:
-            xml_content = file.read()
-
-    xml_content = xml_content.replace('&deg;', '°')
+# Entities used by the XML files without a DTD declaring them
+entities = {'deg': '°'}
+
+# Key of the HTML notices in the text cache, with the versions of the libraries extracting their text
+html_extractor = extractor_key('html get_text', 'beautifulsoup4', 'lxml')
+
+def html_text(html_content):
+    """Returns the text of an HTML notice, cleaned from its tags and formatting."""
+    soup = BeautifulSoup(html_content, 'lxml', from_encoding=sniff_encoding(html_content))
+    return soup.get_text(separator=' ', strip=True)
+
+# Fields of a notice, filled in one walk of its XML file; Nom_html names its HTML file
+fields = FieldSpec({
+    "ID": ".//IDWEB",
+    "Acheteur": ".//IDENT/NOM",
+    "Acheteur_detail": ".//IDENT/PRM",
+    "Acheteur_adresse": ".//IDENT/ADRESSE",
+    "Acheteur_CP": ".//IDENT/CP",
+    "Acheteur_Ville": ".//IDENT/VILLE",
+    "Object": ".//OBJET/OBJET_COMPLET",
+    "Date": Field(".//DATE", transform=lambda date: date.replace('\n', '')),
+    "Nom_html": ".//NOM_HTML",
+})
+
+def parse_xml(xml_file_path, file_index, cache):
+    # The encoding is sniffed from the bytes and &deg; is declared to the parser, so the file is read and decoded once
+    with open(xml_file_path, 'rb') as file:
+        xml_bytes = file.read()
 
     try:
-        root = ET.fromstring(xml_content)
+        root = parse_xml_bytes(xml_bytes, entities)
     except ET.ParseError as e:
         print(f"Error parsing {xml_file_path}: {e}")
         return {}
 
-    json_entry = {
-        "ID": root.findtext('.//IDWEB', ''),
-        "Acheteur": root.findtext('.//IDENT/NOM', ''),
-        "Acheteur_detail": root.findtext('.//IDENT/PRM', ''),
-        "Acheteur_adresse": root.findtext('.//IDENT/ADRESSE', ''),
-        "Acheteur_CP": root.findtext('.//IDENT/CP', ''),
-        "Acheteur_Ville": root.findtext('.//IDENT/VILLE', ''),
-        "Object": root.findtext('.//OBJET/OBJET_COMPLET', ''),
-        "Date": root.findtext('.//DATE', '').replace('\n', ''),
-        "Text": "",
-        "Word_count": 0  # Initialize word count
-    }
-
-    html_file_name = root.findtext('.//NOM_HTML', '')
-
-    # Change file extension to .HTM only if it ends with .htm
-    if html_file_name.lower().endswith('.HTM'):
-        html_file_name = html_file_name[:-4] + '.htm'
+    # Extract relevant information from XML
+    json_entry = fields.extract(root)
+    html_file_name = json_entry.pop("Nom_html")
+    json_entry["Text"] = ""
+    json_entry["Word_count"] = 0  # Initialize word count
+
+    # The file index falls back to a case-insensitive match, for .htm/.HTM mismatches
 
     if html_file_name:
-        html_file_path = find_file_in_directory(year_path, html_file_name)
+        html_file_path = file_index.find(html_file_name)
         if html_file_path:
-            try:
-                with open(html_file_path, 'r', encoding='utf-8') as html_file:
-                    html_content = html_file.read()
-            except UnicodeDecodeError:
-                with open(html_file_path, 'r', encoding='iso-8859-1') as html_file:
-                    html_content = html_file.read()
-
-            soup = BeautifulSoup(html_content, 'lxml')
-            text = soup.get_text(separator=' ', strip=True)
+            with open(html_file_path, 'rb') as html_file:
+                html_content = html_file.read()
+
+            # Notices already extracted, in an earlier run or another archive, are read from the cache
+            text = cache.extract(html_content, html_extractor, html_text)
             json_entry["Text"] = text
             # Calculate and store the word count
             json_entry["Word_count"] = len(text.split())
 
     return json_entry
 
-def find_file_in_directory(directory, file_name):
-    for subdir, dirs, files in os.walk(directory):
-        if file_name in files:
-            return os.path.join(subdir, file_name)
-    return None
-
 # Start the process
 find_and_process_year_folders(root_directory, years)
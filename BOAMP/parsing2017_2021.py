@@ -1,18 +1,21 @@
 import os
-import json
-import zipfile
-import xml.etree.ElementTree as ET
+import sys
 from bs4 import BeautifulSoup
-import subprocess
 import shutil
-import os
-import shutil
-import zipfile
-import json
-import xml.etree.ElementTree as ET
-import tarfile
-import subprocess
-import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import extract_archive, ARCHIVE_ERRORS
+from dila.cache import TextCache, extractor_key
+from dila.encoding import parse_xml_bytes, sniff_encoding
+from dila.fields import Field, FieldSpec
+from dila.index import build_file_index
+from dila.output import open_output
+from dila.schemas import BOAMP
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+text_cache_path = 'text_cache.sqlite'  # Texts of the HTML notices already extracted, reused on reruns and for republished notices
 
 # Define the root directory where to start the search
 root_directory = '2024'
@@ -56,7 +59,6 @@ def find_and_process_year_folders(root_dir, years):
 #                    print(f"An error occurred while extracting {original_file_path}: {e}")
 
 def process_year_folder(year_path, year):
-    json_data = []
     created_dirs = []  # List to store directories created during extraction
 
     for subdir, dirs, files in os.walk(year_path):
@@ -67,67 +69,29 @@ def process_year_folder(year_path, year):
                 os.makedirs(output_dir, exist_ok=True)
                 created_dirs.append(output_dir)
 
-                # Extract using tarfile module
+                # Extract the archive and the .taz files it contains, whatever their real format
                 try:
-                    with tarfile.open(original_file_path, 'r:gz') as tar_ref:
-                        tar_ref.extractall(output_dir)
-                        print(f"Extraction of {original_file_path} successful.")
-                        # After extracting .tar.gz, now check for .taz files in the output directory
-                        extract_taz_files(output_dir)
-                except tarfile.TarError as e:
+                    extract_archive(original_file_path, output_dir)
+                    print(f"Extraction of {original_file_path} successful.")
+                except ARCHIVE_ERRORS as e:
                     print(f"An error occurred while extracting {original_file_path}: {e}") 
 
     # Function to find XML files
     xml_files = find_files(year_path, '.xml')
     print(f"Found {len(xml_files)} XML files for year {year}.")
+    file_index = build_file_index(year_path)  # Walk the year folder once for all the HTML lookups
 
-    # Process each XML file
-    for index, xml_file in enumerate(xml_files):
-        print(f"Processing XML file {index + 1}/{len(xml_files)} for year {year}.")
-        json_entry = parse_xml(xml_file, year_path)
-        json_data.append(json_entry)
-
-    # Save the JSON data to a file
-    json_file_path = os.path.join(year_path, f"{year}.json")
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump(json_data, f, ensure_ascii=False, indent=4)
+    # Save the entries to a JSON Lines file as they are parsed
+    with open_output(os.path.join(year_path, str(year)), compression, output_format, BOAMP) as writer, TextCache(text_cache_path) as cache:
+        for index, xml_file in enumerate(xml_files):
+            print(f"Processing XML file {index + 1}/{len(xml_files)} for year {year}.")
+            writer.write(parse_xml(xml_file, file_index, cache))
 
     # Cleanup: Delete all created directories to free up space
     for dir_path in created_dirs:
         shutil.rmtree(dir_path)
     
-    print(f'\033[92mSaved {json_file_path} successfully\033[0m')
-
-def extract_tar_files(directory):
-    """Recursively extract tar files found in directory."""
-    for subdir, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.tar'):
-                tar_path = os.path.join(subdir, file)
-                try:
-                    with tarfile.open(tar_path, 'r:') as tar:
-                        tar.extractall(path=subdir)
-                        print(f"Tar file {tar_path} extracted.")
-                except tarfile.TarError:
-                    print(f"Failed to extract tar file {tar_path}")
-
-
-def extract_taz_files(directory):
-    """Recursively extract taz files found in directory using the tar command."""
-    for subdir, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.taz'):
-                taz_path = os.path.join(subdir, file)
-                extract_dir = taz_path[:-4]
-                os.makedirs(extract_dir, exist_ok=True)
-                try:
-                    # Using the tar command to extract the files
-                    subprocess.run(['tar', '-xzf', taz_path, '-C', extract_dir], check=True)
-                    print(f"taz file {taz_path} extracted.")
-                except subprocess.CalledProcessError as e:
-                    print(f"Failed to extract taz file {taz_path}: {e}")
-
-
+    print(f'\033[92mSaved {writer.path} successfully\033[0m')
 
 def find_files(directory, extension):
     files_found = []
@@ -137,53 +101,56 @@ def find_files(directory, extension):
                 files_found.append(os.path.join(subdir, file))
     return files_found
 
-def parse_xml(xml_file_path, year_path):
-    try:
-        with open(xml_file_path, 'r', encoding='utf-8') as file:
-            xml_content = file.read()
-    except UnicodeDecodeError:
-        with open(xml_file_path, 'r', encoding='iso-8859-1') as file:
-            xml_content = file.read()
-
-    xml_content = xml_content.replace('&deg;', '°')
+# Entities used by the XML files without a DTD declaring them
+entities = {'deg': '°'}
+
+# Key of the HTML notices in the text cache, with the versions of the libraries extracting their text
+html_extractor = extractor_key('html get_text', 'beautifulsoup4', 'lxml')
+
+def html_text(html_content):
+    """Returns the text of an HTML notice, cleaned from its tags and formatting."""
+    soup = BeautifulSoup(html_content, 'lxml', from_encoding=sniff_encoding(html_content))
+    return soup.get_text(separator=' ', strip=True)
+
+# Fields of a notice, filled in one walk of its XML file; Nom_html names its HTML file
+fields = FieldSpec({
+    "ID": ".//IDWEB",
+    "Acheteur": ".//DONNEES/IDENTITE/DENOMINATION",
+    "Acheteur_detail": ".//DONNEES/IDENTITE/CORRESPONDANT",
+    "Acheteur_adresse": ".//DONNEES/IDENTITE/ADRESSE",
+    "Acheteur_CP": ".//DONNEES/IDENTITE/CP",
+    "Acheteur_Ville": ".//DONNEES/IDENTITE/VILLE",
+    "Object": ".//OBJET/OBJET_COMPLET",
+    "Date": Field(".//DATE_PUBLICATION", transform=lambda date: date.replace('\n', '')),
+    "Nom_html": ".//NOM_HTML",
+})
+
+def parse_xml(xml_file_path, file_index, cache):
+    # The encoding is sniffed from the bytes and &deg; is declared to the parser, so the file is read and decoded once
+    with open(xml_file_path, 'rb') as file:
+        xml_bytes = file.read()
 
     try:
-        root = ET.fromstring(xml_content)
+        root = parse_xml_bytes(xml_bytes, entities)
     except ET.ParseError as e:
         print(f"Error parsing {xml_file_path}: {e}")
         return {}
 
-    json_entry = {
-        "ID": root.findtext('.//IDWEB', ''),
-        "Acheteur": root.findtext('.//DONNEES/IDENTITE/DENOMINATION', ''),
-        "Acheteur_detail": root.findtext('.//DONNEES/IDENTITE/CORRESPONDANT', ''),
-        "Acheteur_adresse": root.findtext('.//DONNEES/IDENTITE/ADRESSE', ''),
-        "Acheteur_CP": root.findtext('.//DONNEES/IDENTITE/CP', ''),
-        "Acheteur_Ville": root.findtext('.//DONNEES/IDENTITE/VILLE', ''),
-        "Object": root.findtext('.//OBJET/OBJET_COMPLET', ''),
-        "Date": root.findtext('.//DATE_PUBLICATION', '').replace('\n', ''),
-        "Text": "",
-        "Word_count": 0  # Initialize word count
-    }
-    html_file_name = root.findtext('.//NOM_HTML', '')
-    if html_file_name.endswith('.HTM'):
-        html_file_name = html_file_name.replace('.htm', '.HTM')   
-    
+    # Extract relevant information from XML
+    json_entry = fields.extract(root)
+    html_file_name = json_entry.pop("Nom_html")
+    json_entry["Text"] = ""
+    json_entry["Word_count"] = 0  # Initialize word count
+    # The file index falls back to a case-insensitive match, for .htm/.HTM mismatches
+
     if html_file_name:
-        html_file_path = find_file_in_directory(year_path, html_file_name)
+        html_file_path = file_index.find(html_file_name)
         if html_file_path:
-            try:
-                with open(html_file_path, 'r', encoding='utf-8') as html_file:
-                    html_content = html_file.read()
-            except UnicodeDecodeError:
-                # Fallback encoding for files that aren't UTF-8
-                with open(html_file_path, 'r', encoding='iso-8859-1') as html_file:
-                    html_content = html_file.read()
-            
-            # Parse the HTML content using BeautifulSoup
-            soup = BeautifulSoup(html_content, 'lxml')
-            # Extract text, cleaning it from any HTML tags and formatting
-            text = soup.get_text(separator=' ', strip=True)
+            with open(html_file_path, 'rb') as html_file:
+                html_content = html_file.read()
+
+            # Notices already extracted, in an earlier run or another archive, are read from the cache
+            text = cache.extract(html_content, html_extractor, html_text)
             # Store the clean text in the JSON entry
             json_entry["Text"] = text
             # Calculate and store the word count
@@ -191,11 +158,5 @@ def parse_xml(xml_file_path, year_path):
 
     return json_entry
 
-def find_file_in_directory(directory, file_name):
-    for subdir, dirs, files in os.walk(directory):
-        if file_name in files:
-            return os.path.join(subdir, file_name)
-    return None
-
 # Start the process
 find_and_process_year_folders(root_directory, years)
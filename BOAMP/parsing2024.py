@@ -1,112 +1,113 @@
 import os
-import json
-import subprocess
-import xml.etree.ElementTree as ET
+import sys
+import shutil
 from bs4 import BeautifulSoup
 
-# Function to parse XML files
-def parse_xml(xml_file_path, year_path):
-    # Try to open the XML file
-    try:
-        with open(xml_file_path, 'r', encoding='utf-8') as file:
-            xml_content = file.read()
-    except UnicodeDecodeError:
-        # If UnicodeDecodeError occurs, try opening with a different encoding
-        with open(xml_file_path, 'r', encoding='iso-8859-1') as file:
-            xml_content = file.read()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import extract_archive, ARCHIVE_ERRORS
+from dila.cache import TextCache, extractor_key
+from dila.encoding import parse_xml_bytes, sniff_encoding
+from dila.fields import Field, FieldSpec
+from dila.index import build_file_index
+from dila.output import open_output
+from dila.schemas import BOAMP
+
+# Entities used by the XML files without a DTD declaring them
+entities = {'deg': '°'}
+
+# Key of the HTML notices in the text cache, with the versions of the libraries extracting their text
+html_extractor = extractor_key('html get_text', 'beautifulsoup4', 'lxml')
+
+def html_text(html_content):
+    """Returns the text of an HTML notice, cleaned from its tags and formatting."""
+    soup = BeautifulSoup(html_content, 'lxml', from_encoding=sniff_encoding(html_content))
+    return soup.get_text(separator=' ', strip=True)
+
+# Fields of a notice, filled in one walk of its XML file; Nom_html names its HTML file
+fields = FieldSpec({
+    "ID": ".//IDWEB",
+    "Acheteur": ".//DONNEES/IDENTITE/DENOMINATION",
+    "Acheteur_detail": ".//DONNEES/IDENTITE/CORRESPONDANT",
+    "Acheteur_adresse": ".//DONNEES/IDENTITE/ADRESSE",
+    "Acheteur_CP": ".//DONNEES/IDENTITE/CP",
+    "Acheteur_Ville": ".//DONNEES/IDENTITE/VILLE",
+    "Object": ".//OBJET/OBJET_COMPLET",
+    "Date": Field(".//DATE_PUBLICATION", transform=lambda date: date.replace('\n', '')),
+    "Nom_html": ".//NOM_HTML",
+})
 
-    # Replace special characters
-    xml_content = xml_content.replace('&deg;', '°')
+# Function to parse XML files
+def parse_xml(xml_file_path, file_index, cache):
+    # The encoding is sniffed from the bytes and &deg; is declared to the parser, so the file is read and decoded once
+    with open(xml_file_path, 'rb') as file:
+        xml_bytes = file.read()
 
-    # Parse XML content
     try:
-        root = ET.fromstring(xml_content)
+        root = parse_xml_bytes(xml_bytes, entities)
     except ET.ParseError as e:
         print(f"Error parsing {xml_file_path}: {e}")
         return {}
 
     # Extract relevant information from XML
-    json_entry = {
-        "ID": root.findtext('.//IDWEB', ''),
-        "Acheteur": root.findtext('.//DONNEES/IDENTITE/DENOMINATION', ''),
-        "Acheteur_detail": root.findtext('.//DONNEES/IDENTITE/CORRESPONDANT', ''),
-        "Acheteur_adresse": root.findtext('.//DONNEES/IDENTITE/ADRESSE', ''),
-        "Acheteur_CP": root.findtext('.//DONNEES/IDENTITE/CP', ''),
-        "Acheteur_Ville": root.findtext('.//DONNEES/IDENTITE/VILLE', ''),
-        "Object": root.findtext('.//OBJET/OBJET_COMPLET', ''),
-        "Date": root.findtext('.//DATE_PUBLICATION', '').replace('\n', ''),
-        "Text": "",
-        "Word_count": 0,  # Initialize word count
-    }
-    
+    json_entry = fields.extract(root)
+    html_file_name = json_entry.pop("Nom_html")
+    json_entry["Text"] = ""
+    json_entry["Word_count"] = 0  # Initialize word count
+
     # Find corresponding HTML file
-    html_file_name = root.findtext('.//NOM_HTML', '')
-    if html_file_name.endswith('.HTM'):
-        html_file_name = html_file_name.replace('.htm', '.HTM')
+    # The file index falls back to a case-insensitive match, for .htm/.HTM mismatches
 
     # If HTML file found, extract text
     if html_file_name:
-        html_file_path = find_file_in_directory(year_path, html_file_name)
+        html_file_path = file_index.find(html_file_name)
         if html_file_path:
-            try:
-                with open(html_file_path, 'r', encoding='utf-8') as html_file:
-                    html_content = html_file.read()
-            except UnicodeDecodeError:
-                # Fallback encoding for files that aren't UTF-8
-                with open(html_file_path, 'r', encoding='iso-8859-1') as html_file:
-                    html_content = html_file.read()
-
-            # Parse HTML content
-            soup = BeautifulSoup(html_content, 'lxml')
-            # Extract text, clean it, and store in JSON entry
-            text = soup.get_text(separator=' ', strip=True)
+            with open(html_file_path, 'rb') as html_file:
+                html_content = html_file.read()
+
+            # Notices already extracted, in an earlier run or another archive, are read from the cache
+            text = cache.extract(html_content, html_extractor, html_text)
             json_entry["Text"] = text
             # Calculate word count
             json_entry["Word_count"] = len(text.split())
 
     return json_entry
 
-# Function to find a file in a directory
-def find_file_in_directory(directory, filename):
-    for root, dirs, files in os.walk(directory):
-        if filename in files:
-            return os.path.join(root, filename)
-    return None
-
 # Main script
 root_directory = "2024"
-json_filename = "2024.json"
-year_path = os.path.join(root_directory, json_filename.split('.')[0])
-
-# Step 1: Save parsed information in a JSON file
-data = []
+json_filename = "2024"
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+text_cache_path = 'text_cache.sqlite'  # Texts of the HTML notices already extracted, reused on reruns and for republished notices
+year_path = os.path.join(root_directory, json_filename)
 
-# Step 2: Collect all .taz files and uncompress them
+# Step 1: Collect all .taz files and uncompress them
 print("Collecting and uncompressing .taz files...")
 taz_files = [file for file in os.listdir(root_directory) if file.endswith('.taz')]
 for taz_file in taz_files:
-    subprocess.run(['tar', '-xf', os.path.join(root_directory, taz_file)])
+    try:
+        extract_archive(os.path.join(root_directory, taz_file), os.path.join(root_directory, taz_file[:-4]))
+    except ARCHIVE_ERRORS as e:
+        print(f"Failed to extract {taz_file}: {e}")
 
-# Step 3: Collect all XML files
+# Step 2: Collect all XML files
 print("Collecting XML files...")
 xml_files = [os.path.join(root, file) for root, _, files in os.walk(root_directory) for file in files if file.endswith('.xml')]
 
-# Step 4: Parse XML files and save information in the JSON file
+# Step 3: Parse XML files and save information in the JSON Lines file as they are parsed
 print("Parsing XML files...")
-for xml_file in xml_files:
-    entry = parse_xml(xml_file, year_path)
-    if entry:
-        data.append(entry)
-
-# Step 5: Save all information in the JSON file
-print("Saving data to JSON file...")
-with open(json_filename, 'w') as json_file:
-    json.dump(data, json_file, indent=4)
-
-# Step 6: Delete uncompressed folders
+file_index = build_file_index(year_path)  # Walk the folder once for all the HTML lookups
+with open_output(json_filename, compression, output_format, BOAMP) as writer, TextCache(text_cache_path) as cache:
+    for xml_file in xml_files:
+        entry = parse_xml(xml_file, file_index, cache)
+        if entry:
+            writer.write(entry)
+print(f"Saved {writer.count} entries to {writer.path}")
+
+# Step 4: Delete uncompressed folders
 print("Cleaning up uncompressed folders...")
 for folder in os.listdir(root_directory):
     if os.path.isdir(os.path.join(root_directory, folder)):
-        subprocess.run(['rm', '-rf', os.path.join(root_directory, folder)])
+        shutil.rmtree(os.path.join(root_directory, folder))
 
 print("Process completed successfully.")
@@ -1,106 +1,97 @@
 import os
-import subprocess
-import json
-import xml.etree.ElementTree as ET
-from PyPDF2 import PdfReader
+from dila import parsers as ET
+from dila.archive import iter_archive, ARCHIVE_ERRORS
+from dila.cache import TextCache
+from dila.fields import FieldSpec
+from dila.output import open_output
+from dila.pdf import PdfPool, PDF_TIMEOUT, PDF_MEMORY_LIMIT
+from dila.schemas import BOCC
 
-def extract_and_process_folders(root_directory):
-    for folder_name in os.listdir(root_directory):
-        folder_path = os.path.join(root_directory, folder_name)
-        if os.path.isdir(folder_path):
-            process_folder(folder_path, folder_name)
-
-def process_folder(folder_path, folder_name):
-    data_list = []
-    for file_name in os.listdir(folder_path):
-        if file_name.endswith('.taz'):
-            original_file_path = os.path.join(folder_path, file_name)
-            output_dir = os.path.join(folder_path, file_name[:-12])
-            os.makedirs(output_dir, exist_ok=True)
+# Fields of an announcement, filled in one walk of its ANNONCE_REF element; NOM_HTML names its PDF
+fields = FieldSpec({
+    "ID": ".//NOJO",
+    "Texte_Nature": ".//TEXTE_NATURE",
+    "Date": ".//TEXTE_DATE",
+    "Titre": ".//TEXTE_TITRE",
+    "Nom_html": ".//NOM_HTML",
+})
 
-            new_file_path = original_file_path[:-4] + '.tar'
-            os.rename(original_file_path, new_file_path)
+def extract_and_process_folders(root_directory):
+    # PDFs are extracted in a pool of processes while the next bulletins are parsed
+    with TextCache(text_cache_path) as cache, \
+            PdfPool(pdf_workers, pdf_timeout, pdf_memory_limit, cache=cache, backend=pdf_backend) as pdfs:
+        for folder_name in os.listdir(root_directory):
+            folder_path = os.path.join(root_directory, folder_name)
+            if os.path.isdir(folder_path):
+                process_folder(folder_path, folder_name, pdfs)
 
-            command = ['tar', '-xvf', new_file_path, '-C', output_dir]
-            try:
-                subprocess.run(command, check=True)
-                print(f"Extraction of {new_file_path} successful.")
-            except subprocess.CalledProcessError as e:
-                print(f"An error occurred while extracting {new_file_path}: {e}")
-            
-            os.rename(new_file_path, original_file_path)
+def process_folder(folder_path, folder_name, pdfs):
+    # Entries are written to the JSON Lines file bulletin by bulletin, those with a PDF once its text is extracted
+    with open_output(os.path.join(folder_path, folder_name), compression, output_format, BOCC) as writer:
+        for file_name in os.listdir(folder_path):
+            if file_name.endswith('.taz'):
+                taz_path = os.path.join(folder_path, file_name)
 
-            for root, _, files in os.walk(output_dir):
-                for xml_file in files:
-                    if xml_file.endswith('.xml'):
-                        xml_path = os.path.join(root, xml_file)
-                        data_list.extend(process_xml_file(xml_path, folder_path))
+                # Bulletins are small: decode the .taz in-process, whatever its real format, and keep its members in memory
+                try:
+                    members = dict(iter_archive(taz_path))
+                    print(f"Reading of {taz_path} successful.")
+                except ARCHIVE_ERRORS as e:
+                    print(f"An error occurred while reading {taz_path}: {e}")
+                    continue
 
-            delete_folder(output_dir)
+                attachments = {os.path.basename(name): content for name, content in members.items()}
+                for member_name, content in members.items():
+                    if member_name.endswith('.xml'):
+                        writer.write_all(process_xml_file(content, attachments, pdfs))
+                writer.write_all(fill_pdf_text(pdfs.results()))
 
-    json_file_path = os.path.join(folder_path, f"{folder_name}.json")
-    with open(json_file_path, 'w', encoding='utf-8') as json_file:
-        json.dump(data_list, json_file, ensure_ascii=False, indent=4)
-    print(f"Saved {json_file_path} successfully.")
+        writer.write_all(fill_pdf_text(pdfs.drain()))
 
-    json_file_path = os.path.join(folder_path, f"{folder_name}.json")
-    with open(json_file_path, 'w', encoding='utf-8') as json_file:
-        json.dump(data_list, json_file, ensure_ascii=False, indent=4)
-    print(f"Saved {json_file_path} successfully.")
+    print(f"Saved {writer.path} successfully.")
 
 
-def process_xml_file(xml_path, root_directory):
+def process_xml_file(xml_content, attachments, pdfs):
+    """Returns the entries of a bulletin without a PDF, and queues the others for the extraction of their PDF."""
     entries = []
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    root = ET.fromstring(xml_content)
     for annonce_ref in root.findall(".//ANNONCE_REF"):
-        data = {
-            "ID": annonce_ref.find(".//NOJO").text if annonce_ref.find(".//NOJO") is not None else "",
-            "Texte_Nature": annonce_ref.find(".//TEXTE_NATURE").text if annonce_ref.find(".//TEXTE_NATURE") is not None else "",
-            "Date": annonce_ref.find(".//TEXTE_DATE").text if annonce_ref.find(".//TEXTE_DATE") is not None else "",
-            "Titre": annonce_ref.find(".//TEXTE_TITRE").text if annonce_ref.find(".//TEXTE_TITRE") is not None else "",
-            "Text": "",
-            "Word_Count": 0
-        }
+        data = fields.extract(annonce_ref)
+        nom_html = data.pop("Nom_html")
+        data["Text"] = ""
+        data["Word_Count"] = 0
         
-        nom_html = annonce_ref.find(".//NOM_HTML").text if annonce_ref.find(".//NOM_HTML") is not None else ""
-        if nom_html:
-            pdf_path = find_file_in_folder(root_directory, nom_html)
-            if pdf_path:
-                text, success = extract_text_from_pdf(pdf_path)
-                if success:
-                    data['Text'] = text
-                    data['Word_Count'] = len(text.split())
-        entries.append(data)
+        pdf_content = attachments.get(nom_html) if nom_html else None
+        if pdf_content is not None:
+            pdfs.submit((data, nom_html), pdf_content)
+        else:
+            entries.append(data)
     return entries
 
-def find_file_in_folder(folder_path, file_name):
-    for root, _, files in os.walk(folder_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
+def fill_pdf_text(results):
+    """Yields the entries of the extracted PDFs with their text; those whose PDF failed keep an empty text."""
+    for (data, nom_html), text, _, error in results:
+        if error is None:
+            data['Text'] = text
+            data['Word_Count'] = len(text.split())
+        else:
+            print(f"Error processing {nom_html}: {error}")
+            log_error(nom_html, error)
+        yield data
 
-def extract_text_from_pdf(pdf_path):
-    try:
-        text = ""
-        with open(pdf_path, 'rb') as f:
-            pdf = PdfReader(f)
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return text, True
-    except Exception as e:
-        print(f"Error processing {pdf_path}: {e}")
-        return "", False
-
-def delete_folder(folder_path):
-    for root, dirs, files in os.walk(folder_path, topdown=False):
-        for name in files:
-            os.remove(os.path.join(root, name))
-        for name in dirs:
-            os.rmdir(os.path.join(root, name))
-    os.rmdir(folder_path)
-    print(f"Deleted {folder_path} successfully.")
+def log_error(file_name, error):
+    with open(os.path.join(root_directory, "ERROR_parsing_PDFs.txt"), "a") as error_log:
+        error_log.write(f"Error parsing {file_name}: {error}\n")
 
 # Replace 'root_directory' with the path to your actual root directory
 root_directory = "BOCC"
-extract_and_process_folders(root_directory)
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+pdf_workers = None  # PDF extraction processes, defaults to the number of cores
+pdf_timeout = PDF_TIMEOUT  # Seconds before a PDF extraction is killed and logged
+pdf_memory_limit = PDF_MEMORY_LIMIT  # Bytes of memory of each PDF extraction process
+pdf_backend = None  # PDF engine: 'pypdfium2', 'pdftotext', 'PyPDF2' or 'pdfminer', None for the fastest installed
+text_cache_path = os.path.join(root_directory, 'text_cache.sqlite')  # Texts already extracted, reused on reruns and for identical PDFs
+
+if __name__ == "__main__":
+    extract_and_process_folders(root_directory)
@@ -1,41 +1,60 @@
 import os
+import sys
 import glob
-import json
-import tarfile
-import xml.etree.ElementTree as ET
-from PyPDF2 import PdfReader
 import re
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import iter_tar_members, AttachmentBuffer, ATTACHMENT_BUFFER_SIZE
+from dila.cache import TextCache
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.pdf import PdfPool, PDF_TIMEOUT, PDF_MEMORY_LIMIT, PDF_SPLIT_PAGES
+from dila.schemas import CIRCULAIRES
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+pdf_workers = None  # PDF extraction processes, defaults to the number of cores
+pdf_timeout = PDF_TIMEOUT  # Seconds before a PDF extraction is killed and logged
+pdf_memory_limit = PDF_MEMORY_LIMIT  # Bytes of memory of each PDF extraction process
+pdf_backend = None  # PDF engine: 'pypdfium2', 'pdftotext', 'PyPDF2' or 'pdfminer', None for the fastest installed
+pdf_split_pages = PDF_SPLIT_PAGES  # Pages of the ranges a long PDF is split into for several workers, None to read it whole
+pdf_max_pages = None  # Pages read at most from each PDF, None for all
+pdf_max_chars = None  # Characters after which the reading of a PDF stops at the end of the page, None for no limit
+text_cache_path = os.path.join(os.getcwd(), 'text_cache.sqlite')  # Texts already extracted, reused on reruns and for identical PDFs
+pdf_buffer_size = ATTACHMENT_BUFFER_SIZE  # Bytes of PDFs held until their XML file is read; beyond, they are read again
+
 def clean_text(text):
     # Replace any surrogate pairs with a replacement character or remove them
     # This version directly uses the replacement character method
     return text.encode('utf-8', 'replace').decode('utf-8')
 
-def extract_text_from_pdf(pdf_path):
-    try:
-        text = ""
-        with open(pdf_path, 'rb') as f:
-            pdf = PdfReader(f)
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return clean_text(text), True
-    except Exception as e:
-        error_message = f"Error extracting text from PDF {pdf_path}: {e}\n"
-        log_error(error_message)
-        return "", False
+def fill_pdf_text(results):
+    """Yields the circulars of the extracted PDFs with their text; those whose PDF failed keep an empty text."""
+    for (pdf_path, entries), text, _, error in results:
+        if error is None:
+            text = clean_text(text)
+        else:
+            log_error(f"Error extracting text from PDF {pdf_path}: {error}\n")
+        for xml_data in entries:
+            if error is None:
+                xml_data['Text'] = text
+                xml_data['Word_count'] = len(text.split())
+            yield xml_data
 
-def parse_xml(xml_file):
+# Fields of a circular, filled in one walk of its XML file; nom_fichier_pdf is the name of its PDF
+fields = FieldSpec({
+    'Id_circulaire': 'ID_CIRCULAIRE',
+    'Etat': 'ETAT',
+    'Date_signature': 'DATE_SIGNATURE',
+    'Auteur': 'AUTEUR',
+    'Destinataire': 'DESTINATAIRE',
+    'nom_fichier_pdf': Field('NOM_FICHIER_PDF', transform=os.path.basename),
+})
+
+def parse_xml(xml_file, xml_content):
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        return {
-            'Id_circulaire': root.findtext('ID_CIRCULAIRE', ""),
-            'Etat': root.findtext('ETAT', ""),
-            'Date_signature': root.findtext('DATE_SIGNATURE', ""),
-            'Auteur': root.findtext('AUTEUR', ""),
-            'Destinataire': root.findtext('DESTINATAIRE', ""),
-            'nom_fichier_pdf': os.path.basename(root.findtext('NOM_FICHIER_PDF', ""))
-        }
+        return fields.extract(ET.fromstring(xml_content))
     except ET.ParseError as e:
         error_message = f"XML parse error in file {xml_file}: {e}\n"
         log_error(error_message)
@@ -47,40 +66,67 @@ def log_error(error_message):
         log_file.write(error_message)
 
 def process_year(year):
-    data = []
-    for folder_name in ['xml', 'pdf']:
-        directory = os.path.join(os.getcwd(), folder_name)
-        tar_files = glob.glob(f'{directory}/{year}*.tar.gz')
-        
+    """Parses the circulars of a year in one sequential pass over its XML archives, then over its PDF archives.
+
+    Circulars are matched to their PDF by file name, ignoring case, across the archives of the year: PDFs
+    read before their XML file are held until it is read, and each PDF is queued once for its circulars.
+    Beyond pdf_buffer_size bytes of held PDFs, those still referenced at the end are read in a second pass.
+    """
+    tar_files = [tar_file for folder_name in ['xml', 'pdf'] for tar_file in glob.glob(f'{os.path.join(os.getcwd(), folder_name)}/{year}*.tar.gz')]
+    waiting = {}  # PDF file name -> circulars whose PDF is not read yet
+    unclaimed = AttachmentBuffer(pdf_buffer_size)  # PDFs read before their XML file
+    queued = {}  # PDF file name -> circulars of the PDFs queued, which more circulars may join until the drain
+
+    def queue(file_name, member_name, content):
+        queued[file_name] = waiting.pop(file_name)
+        pdfs.submit((member_name, queued[file_name]), content)
+
+    os.makedirs(os.path.join(os.getcwd(), str(year)), exist_ok=True)
+    # Circulars with a PDF are written once the pool has extracted its text, at the end of the year
+    with open_output(os.path.join(os.getcwd(), str(year), str(year)), compression, output_format, CIRCULAIRES) as writer, \
+            TextCache(text_cache_path) as cache, \
+            PdfPool(pdf_workers, pdf_timeout, pdf_memory_limit, cache=cache, split_pages=pdf_split_pages,
+                    max_pages=pdf_max_pages, max_chars=pdf_max_chars, backend=pdf_backend) as pdfs:
         for tar_file in tar_files:
             print(f'Processing {tar_file}')
-            with tarfile.open(tar_file, "r:gz") as tar:
-                extract_folder = os.path.join(os.getcwd(), str(year), "extracted")
-                os.makedirs(extract_folder, exist_ok=True)
-                tar.extractall(path=extract_folder)
-
-    xml_files = glob.glob(f'{os.path.join(os.getcwd(), str(year), "extracted")}/**/*.xml', recursive=True)
-    for i, xml_file in enumerate(xml_files, start=1):
-        print(f'Processing {xml_file}, {i} out of {len(xml_files)}')
-        xml_data = parse_xml(xml_file)
-        if xml_data:
-            pdf_file_path = os.path.join(extract_folder, '**', xml_data['nom_fichier_pdf'])
-            pdf_file_paths = glob.glob(pdf_file_path, recursive=True)
-            if pdf_file_paths:
-                text, success = extract_text_from_pdf(pdf_file_paths[0])
-                if success:
-                    xml_data['Text'] = text
-                    xml_data['Word_count'] = len(text.split())
-            data.append(xml_data)
-
-    json_file_path = os.path.join(os.getcwd(), str(year), f"{year}.json")
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
-    print(f"\u001b[42mCompleted processing for {year}. Found and processed {len(data)} XML files.\u001b[0m")
-    os.system(f'rm -rf {os.path.join(os.getcwd(), str(year), "extracted")}')
-
-# Loop to process each year from 2009 to 2014
-years = ['2011', '2012', '2013', '2014']
-for year in years:
-    process_year(year)
+            for member_name, content in iter_tar_members(tar_file):
+                file_name = os.path.basename(member_name).casefold()
+                if file_name.endswith('.pdf'):
+                    if file_name in waiting:
+                        queue(file_name, member_name, content)
+                    elif file_name not in queued:
+                        unclaimed.add(file_name, tar_file, member_name, content)
+                    continue
+                if not file_name.endswith('.xml'):
+                    continue
+
+                xml_data = parse_xml(member_name, content)
+                if not xml_data:
+                    continue
+                pdf_name = (xml_data['nom_fichier_pdf'] or '').casefold()
+                if pdf_name in queued:
+                    queued[pdf_name].append(xml_data)
+                elif pdf_name:
+                    waiting.setdefault(pdf_name, []).append(xml_data)
+                    if pdf_name in unclaimed:
+                        queue(pdf_name, *unclaimed.pop(pdf_name))
+                else:
+                    writer.write(xml_data)
+        unclaimed.clear()
+
+        # PDFs read before their XML file while the buffer was full are read again, in a pass that stops at the last one
+        for file_name, member_name, content in unclaimed.reread(list(waiting)):
+            queue(file_name, member_name, content)
+
+        writer.write_all(fill_pdf_text(pdfs.drain()))
+        # Circulars whose PDF is missing from the archives of the year are saved without text
+        for entries in waiting.values():
+            writer.write_all(entries)
+
+    print(f"\u001b[42mCompleted processing for {year}. Found and processed {writer.count} XML files.\u001b[0m")
+
+if __name__ == "__main__":
+    # Loop to process each year from 2009 to 2014
+    years = ['2011', '2012', '2013', '2014']
+    for year in years:
+        process_year(year)
@@ -1,49 +1,60 @@
 import os
+import sys
 import glob
-import json
-import tarfile
-import xml.etree.ElementTree as ET
-from PyPDF2 import PdfReader
 import re
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.archive import iter_tar_members, AttachmentBuffer, ATTACHMENT_BUFFER_SIZE
+from dila.cache import TextCache
+from dila.fields import Field, FieldSpec
+from dila.output import open_output
+from dila.pdf import PdfPool, PDF_TIMEOUT, PDF_MEMORY_LIMIT, PDF_SPLIT_PAGES
+from dila.schemas import CIRCULAIRES
+
 root_dir = 'FLUX'
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+pdf_workers = None  # PDF extraction processes, defaults to the number of cores
+pdf_timeout = PDF_TIMEOUT  # Seconds before a PDF extraction is killed and logged
+pdf_memory_limit = PDF_MEMORY_LIMIT  # Bytes of memory of each PDF extraction process
+pdf_backend = None  # PDF engine: 'pypdfium2', 'pdftotext', 'PyPDF2' or 'pdfminer', None for the fastest installed
+pdf_split_pages = PDF_SPLIT_PAGES  # Pages of the ranges a long PDF is split into for several workers, None to read it whole
+pdf_max_pages = None  # Pages read at most from each PDF, None for all
+pdf_max_chars = None  # Characters after which the reading of a PDF stops at the end of the page, None for no limit
+text_cache_path = os.path.join(root_dir, 'text_cache.sqlite')  # Texts already extracted, reused on reruns and for identical PDFs
+pdf_buffer_size = ATTACHMENT_BUFFER_SIZE  # Bytes of PDFs held until their XML file is read; beyond, they are read again
 
 def clean_text(text):
     text = re.sub(r'[\uD800-\uDBFF](?![\uDC00-\uDFFF])|(?<![\uD800-\uDBFF])[\uDC00-\uDFFF]', '', text)
     return text
 
-
-def find_file_in_folder(folder_path, file_name):
-    for root, _, files in os.walk(folder_path):
-        if file_name in files:
-            return os.path.join(root, file_name)
-    return None
-
-def extract_text_from_pdf(pdf_path):
-    try:
-        text = ""
-        with open(pdf_path, 'rb') as f:
-            pdf = PdfReader(f)
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return clean_text(text), True
-    except Exception as e:
-        error_message = f"Error extracting text from PDF {pdf_path}: {e}\n"
-        log_error(error_message)
-        return "", False
-
-def parse_xml(xml_file):
+def fill_pdf_text(results):
+    """Yields the circulars of the extracted PDFs with their text; those whose PDF failed keep an empty text."""
+    for (pdf_path, entries), text, _, error in results:
+        if error is None:
+            text = clean_text(text)
+        else:
+            log_error(f"Error extracting text from PDF {pdf_path}: {error}\n")
+        for xml_data in entries:
+            if error is None:
+                xml_data['Text'] = text
+                xml_data['Word_count'] = len(text.split())
+            yield xml_data
+
+# Fields of a circular, filled in one walk of its XML file; nom_fichier_pdf is the name of its PDF
+fields = FieldSpec({
+    'Id_circulaire': './/ID_CIRCULAIRE',
+    'Etat': './/ETAT',
+    'Date_signature': './/DATE_SIGNATURE',
+    'Auteur': './/AUTEUR',
+    'Destinataire': './/DESTINATAIRE',
+    'nom_fichier_pdf': Field('.//NOM_FICHIER_PDF', transform=lambda path: path.split('/')[-1]),
+})
+
+def parse_xml(xml_file, xml_content):
     try:
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
-        return {
-            'Id_circulaire': root.find('.//ID_CIRCULAIRE').text or "",
-            'Etat': root.find('.//ETAT').text or "",
-            'Date_signature': root.find('.//DATE_SIGNATURE').text or "",
-            'Auteur': root.find('.//AUTEUR').text or "",
-            'Destinataire': root.find('.//DESTINATAIRE').text or "",
-            'nom_fichier_pdf': root.find('.//NOM_FICHIER_PDF').text.split('/')[-1] or ""
-        }
+        return fields.extract(ET.fromstring(xml_content))
     except ET.ParseError as e:
         error_message = f"XML parse error in file {xml_file}: {e}\n"
         log_error(error_message)
@@ -54,53 +65,78 @@ def log_error(error_message):
     with open(error_log_path, 'a') as log_file:
         log_file.write(error_message)
 
-data = []
-
-for year in range(2023, 2024):
-    year_folder = os.path.join(root_dir, str(year))
-    if not os.path.exists(year_folder):
-        continue
-
-    json_file_path = os.path.join(year_folder, f"{year}.json")
-
-    tar_files = glob.glob(f'{year_folder}/**/*.tar.gz', recursive=True)
-    tar_files = tar_files
-
-    print(f'Found {len(tar_files)} .tar.gz files')
-
-    for i, tar_file in enumerate(tar_files, 1):
-        print(f'Processing {i} of {len(tar_files)} in {year}')
-        with tarfile.open(tar_file, "r:gz") as tar:
-            extract_folder = tar_file[:-7]  # Remove .tar.gz extension
-            os.makedirs(extract_folder, exist_ok=True)
-            tar.extractall(path=extract_folder)
-            
-            xml_files = glob.glob(f'{extract_folder}/**/*.xml', recursive=True)
-            for xml_file in xml_files:
-                xml_data = parse_xml(xml_file)
-                if xml_data:
-                    xml_data['Text'] = ""
-                    xml_data['Word_count'] = 0
-                    pdf_file_path = ""
-                    if xml_data['nom_fichier_pdf']:
-                        search_path = os.path.join(extract_folder, '**', xml_data['nom_fichier_pdf'])
-                        pdf_file_paths = glob.glob(search_path, recursive=True)
-                        if pdf_file_paths:
-                            pdf_file_path = pdf_file_paths[0]
-                            text, success = extract_text_from_pdf(pdf_file_path)
-                            if success:
-                                xml_data['Text'] = clean_text(text)
-                                xml_data['Word_count'] = len(text.split())
-                    del xml_data['nom_fichier_pdf']  # Now safe to delete as xml_data is confirmed not None.
-                    data.append(xml_data)
-
-                # Additionally, make sure to only delete the key if it exists and xml_data is not None
-                if xml_data and 'nom_fichier_pdf' in xml_data:
-                    del xml_data['nom_fichier_pdf']
-
-            os.system(f'rm -rf {extract_folder}')
-
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
-    print(f"\u001b[42mCompleted processing for {year_folder}. Found and processed {len(data)} XML files.\u001b[0m")
+def process_tar_file(tar_file, writer, pdfs):
+    """Parses the circulars of one archive in a single sequential pass, and writes them once their PDF text is extracted.
+
+    Circulars are matched to their PDF by file name, ignoring case, whichever comes first in the archive:
+    PDFs read before their XML file are held until it is read, and each PDF is queued once for its circulars.
+    Beyond pdf_buffer_size bytes of held PDFs, those still referenced at the end are read in a second pass.
+    The circulars queued are written by the caller as their texts are extracted, from pdfs.results().
+    """
+    waiting = {}  # PDF file name -> circulars whose PDF is not read yet
+    unclaimed = AttachmentBuffer(pdf_buffer_size)  # PDFs read before their XML file
+    queued = {}  # PDF file name -> circulars of the PDFs queued, which more circulars may join until the archive is read
+
+    def queue(file_name, member_name, content):
+        queued[file_name] = waiting.pop(file_name)
+        pdfs.submit((member_name, queued[file_name]), content)
+
+    for member_name, content in iter_tar_members(tar_file):
+        file_name = os.path.basename(member_name).casefold()
+        if file_name.endswith('.pdf'):
+            if file_name in waiting:
+                queue(file_name, member_name, content)
+            elif file_name not in queued:
+                unclaimed.add(file_name, tar_file, member_name, content)
+            continue
+        if not file_name.endswith('.xml'):
+            continue
+
+        xml_data = parse_xml(member_name, content)
+        if not xml_data:
+            continue
+        xml_data['Text'] = ""
+        xml_data['Word_count'] = 0
+        pdf_name = (xml_data.pop('nom_fichier_pdf') or '').casefold()
+        if pdf_name in queued:
+            queued[pdf_name].append(xml_data)
+        elif pdf_name:
+            waiting.setdefault(pdf_name, []).append(xml_data)
+            if pdf_name in unclaimed:
+                queue(pdf_name, *unclaimed.pop(pdf_name))
+        else:
+            writer.write(xml_data)
+    unclaimed.clear()
+
+    # PDFs read before their XML file while the buffer was full are read again, in a pass that stops at the last one
+    for file_name, member_name, content in unclaimed.reread(list(waiting)):
+        queue(file_name, member_name, content)
+
+    # Circulars whose PDF is missing from the archive are saved without text
+    for entries in waiting.values():
+        writer.write_all(entries)
+
+if __name__ == "__main__":
+    for year in range(2023, 2024):
+        year_folder = os.path.join(root_dir, str(year))
+        if not os.path.exists(year_folder):
+            continue
+
+        tar_files = glob.glob(f'{year_folder}/**/*.tar.gz', recursive=True)
+        tar_files = tar_files
+
+        print(f'Found {len(tar_files)} .tar.gz files')
+
+        with open_output(os.path.join(year_folder, str(year)), compression, output_format, CIRCULAIRES) as writer, \
+                TextCache(text_cache_path) as cache, \
+                PdfPool(pdf_workers, pdf_timeout, pdf_memory_limit, cache=cache, split_pages=pdf_split_pages,
+                        max_pages=pdf_max_pages, max_chars=pdf_max_chars, backend=pdf_backend) as pdfs:
+            for i, tar_file in enumerate(tar_files, 1):
+                print(f'Processing {i} of {len(tar_files)} in {year}')
+                process_tar_file(tar_file, writer, pdfs)
+                # The texts already extracted are written while the PDFs of the next archives are
+                writer.write_all(fill_pdf_text(pdfs.results()))
+
+            writer.write_all(fill_pdf_text(pdfs.drain()))
+
+        print(f"\u001b[42mCompleted processing for {year_folder}. Found and processed {writer.count} XML files.\u001b[0m")
@@ -1,21 +1,52 @@
 import os
-import xml.etree.ElementTree as ET
-import json
+import sys
 
-def normalize_tag(element):
-    """Recursively convert all tags in the element tree to lowercase."""
-    element.tag = element.tag.lower()
-    for child in element:
-        normalize_tag(child)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers as ET
+from dila.output import open_output
+from dila.schemas import DEBATS_SENAT
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+use_lxml = False  # ElementTree walks these sittings faster than lxml (see benchmarks/xml_parsers.py), but does not recover from malformed markup
+
+# Output keys of the children of <metadonnees>, by lowercase tag
+METADATA_KEYS = {
+    "typepublication": "Type_Publication",
+    "dateparution": "Date",
+    "numparution": "Numero_Parution",
+    "numerogrebiche": "NumeroGrebiche",
+    "dateseance": "Date_Seance",
+    "numjoursession": "Num_Jour_Session",
+    "numseance": "Num_Seance",
+}
+
+# Lowercase form of each tag met so far, so that tags are matched case-insensitively without rewriting the tree
+folded_tags = {}
+
+def fold_tag(tag):
+    """Returns the lowercase form of a tag, computed once per distinct tag."""
+    folded = folded_tags.get(tag)
+    if folded is None:
+        folded = folded_tags[tag] = tag.lower()
+    return folded
+
+def find_folded(element, tag):
+    """Returns the first descendant of element whose tag is tag in any case, like element.find('.//' + tag)."""
+    descendants = element.iter()
+    next(descendants)
+    return next((descendant for descendant in descendants if fold_tag(descendant.tag) == tag), None)
+
+def findtext_folded(element, tag):
+    """Returns the text of the first child of element whose tag is tag in any case, like element.findtext(tag)."""
+    child = next((child for child in element if fold_tag(child.tag) == tag), None)
+    return None if child is None else child.text or ""
 
 def process_xml_file(xml_file):
     try:
-        tree = ET.parse(xml_file)
+        tree = ET.parse(xml_file, use_lxml=use_lxml)
         root = tree.getroot()
 
-        # Normalize all tags to lowercase
-        normalize_tag(root)
-
         # Define the structure of the JSON output without "Annex_Amendement"
         output = {
             "Type_Publication": None,
@@ -31,24 +62,25 @@ def process_xml_file(xml_file):
             "word_count": 0
         }
 
-        # Find the <metadonnees> element
-        metadonnees = root.find(".//metadonnees")
+        # One walk of the tree, in document order, finds the first <metadonnees> and all the <contenu> elements
+        metadonnees = None
+        contenu_texts = []
+        elements = root.iter()
+        next(elements)  # Like './/', the root itself is not matched
+        for element in elements:
+            tag = fold_tag(element.tag)
+            if tag == "contenu":
+                contenu_texts.append(''.join(element.itertext()))
+            elif tag == "metadonnees" and metadonnees is None:
+                metadonnees = element
+
         if metadonnees is not None:
-            output["Type_Publication"] = metadonnees.findtext("typepublication")
-            output["Date"] = metadonnees.findtext("dateparution")
-            output["Numero_Parution"] = metadonnees.findtext("numparution")
-            output["NumeroGrebiche"] = metadonnees.findtext("numerogrebiche")
-            output["Date_Seance"] = metadonnees.findtext("dateseance")
-            output["Num_Jour_Session"] = metadonnees.findtext("numjoursession")
-            output["Num_Seance"] = metadonnees.findtext("numseance")
-            session = metadonnees.find(".//session")
+            for tag, key in METADATA_KEYS.items():
+                output[key] = findtext_folded(metadonnees, tag)
+            session = find_folded(metadonnees, "session")
             if session is not None:
-                output["Session_Ord"] = session.findtext("sessionord")
+                output["Session_Ord"] = findtext_folded(session, "sessionord")
 
-        # Extract all <contenu> elements and concatenate their text
-        contenu_texts = []
-        for contenu in root.findall(".//contenu"):
-            contenu_texts.append(''.join(contenu.itertext()))
         full_text = ''.join(contenu_texts)
         output["Text"] = full_text
         output["word_count"] = len(full_text.split())
@@ -59,22 +91,18 @@ def process_xml_file(xml_file):
         return None
 
 def process_subfolder(subfolder, output_base_folder):
-    json_entries = []
-    for xml_file in os.listdir(subfolder):
-        if xml_file.endswith(".xml"):
-            xml_path = os.path.join(subfolder, xml_file)
-            json_entry = process_xml_file(xml_path)
-            if json_entry:
-                json_entries.append(json_entry)
-
-    if json_entries:
-        # Create output JSON file path
-        subfolder_name = os.path.basename(subfolder)
-        output_json_path = os.path.join(output_base_folder, f"{subfolder_name}.json")
-
-        # Write JSON entries to a file
-        with open(output_json_path, 'w', encoding='utf-8') as f:
-            json.dump(json_entries, f, ensure_ascii=False, indent=4)
+    # Write JSON entries to a JSON Lines file named after the subfolder as they are parsed
+    subfolder_name = os.path.basename(subfolder)
+    with open_output(os.path.join(output_base_folder, subfolder_name), compression, output_format, DEBATS_SENAT) as writer:
+        for xml_file in os.listdir(subfolder):
+            if xml_file.endswith(".xml"):
+                xml_path = os.path.join(subfolder, xml_file)
+                json_entry = process_xml_file(xml_path)
+                if json_entry:
+                    writer.write(json_entry)
+
+        if not writer.count:
+            writer.close(commit=False)  # No file for subfolders without entries
 
 def main(main_folder, output_base_folder):
     os.makedirs(output_base_folder, exist_ok=True)
@@ -1,9 +1,20 @@
-import tarfile
 import os
 import re
-import json
-import gc  # Import the garbage collection module
-from lxml import etree as ET
+from dila import parsers as ET
+from dila.archive import iter_tar_members
+from dila.output import open_output
+from dila.schemas import LEGI
+from dila.parallel import run_parallel, run_pipeline
+from dila.manifest import Manifest
+
+compression = None  # None, 'gzip' or 'zstd'
+output_format = 'jsonl'  # 'jsonl' or 'parquet'
+workers = None  # Number of parallel processes, defaults to the number of cores
+max_in_flight = None  # Archives submitted to the pool at once, defaults to twice the number of workers
+pipeline_min_size = 1 << 30  # Archives larger than this (e.g. the Freemium global dumps) are parsed one at a time on all workers
+pipeline_batch_size = 500  # XML files sent to a worker at once in pipeline mode
+manifest_path = 'manifest.sqlite'  # Records the archives already parsed, so that only new daily increments are parsed
+force = False  # Set this to True to reparse the archives that did not change since the last run
 
 # Regex for HTML tag removal
 html_tag_re = re.compile('<(?!br\\s*/?).*?>')
@@ -14,18 +25,14 @@ def clean_text(text):
     text_no_newlines = text_no_html.replace('\n', ' ')
     return text_no_newlines
 
-def is_empty_file(file_path):
-    return os.path.getsize(file_path) == 0
-
-# Function to process an XML file
-def process_xml(file_path, json_data):
-    if is_empty_file(file_path):
+# Function to process an XML file read from an archive
+def process_xml(file_path, content, json_data):
+    if not content:
         print(f"Skipping empty file: {file_path}")
         return
 
     try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
+        root = ET.fromstring(content)
 
 
         etat_tag = root.find(".//ETAT")
@@ -50,60 +57,62 @@ def process_xml(file_path, json_data):
                 "word_count": word_count  # Add word count to the JSON data
             })
     
-    except ET.XMLSyntaxError as e:
+    except ET.ParseError as e:
         print(f"Error parsing {file_path}: {e}")
 
-# Extracts tar.gz files and processes the directories within
-def extract_and_process_tar(tar_path, output_dir):
-    with tarfile.open(tar_path, 'r:gz') as tar:
-        tar.extractall(path=output_dir)
-        process_directory(output_dir)
-        cleanup_directory(output_dir)
-    gc.collect()  # Perform garbage collection after each tar file processing
-
-# Process all XML files in a directory
-def process_directory(directory):
+# Processes a batch of (file_path, content) pairs, in a worker process in pipeline mode, and returns their JSON entries
+def process_xml_batch(batch):
     json_data = []
-    file_count = 0
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.xml'):
-                file_path = os.path.join(root, file)
-                try:
-                    process_xml(file_path, json_data)
-                    if len(json_data) >= 10000:
-                        save_json(json_data, directory, file_count)
-                        json_data = []
-                        file_count += 1
-                        gc.collect()  # Clear memory after saving 10000 entries
-                except Exception as e:
-                    print(f"Failed to process file {file_path}: {e}")
-
-    if json_data:
-        save_json(json_data, directory, file_count)
-
-# Save JSON to a file
-def save_json(data, directory, file_count):
-    with open(f'{directory}_{file_count+1}.json', 'w', encoding='utf-8') as json_file:
-        json.dump(data, json_file, ensure_ascii=False, indent=4)
-
-import shutil  # Import shutil module for handling file operations
-
-# Cleanup directory using shutil
-def cleanup_directory(directory):
-    shutil.rmtree(directory, ignore_errors=True)  # Remove the directory and all its contents
-
+    for file_path, content in batch:
+        try:
+            process_xml(file_path, content, json_data)
+        except Exception as e:
+            print(f"Failed to process file {file_path}: {e}")
+    return json_data
+
+# Yields the JSON entries of the XML files of a tar.gz file, in archive order
+def iter_tar_entries(tar_path, pipeline_workers=1):
+    members = iter_tar_members(tar_path, '.xml')
+    if pipeline_workers == 1:
+        for member in members:
+            yield from process_xml_batch([member])
+    else:
+        # One reader thread streams the archive while the batches are parsed on several cores
+        for entries in run_pipeline(process_xml_batch, members, pipeline_workers, pipeline_batch_size):
+            yield from entries
+
+# Streams the XML files of a tar.gz file and writes their entries to a JSON Lines file as they are parsed, without
+# extracting to disk or holding the entries in memory; returns the saved file and its number of entries
+def process_tar(tar_path, directory=None, pipeline_workers=1):
+    directory = directory or tar_path.replace('.tar.gz', '')
+    with open_output(directory, compression, output_format, LEGI) as writer:
+        writer.write_all(iter_tar_entries(tar_path, pipeline_workers))
+    return writer.path, writer.count
 
 # Main function to process all tar.gz files in the current directory
 def process_all_tar_files_in_current_directory():
     current_directory = os.getcwd()  # Get the current working directory
-    for tar_file in os.listdir(current_directory):
-        if tar_file.endswith('.tar.gz'):
-            tar_path = os.path.join(current_directory, tar_file)
-            output_dir = tar_path.replace('.tar.gz', '')
-            extract_and_process_tar(tar_path, output_dir)
-            print(f'Processing {tar_path}')
+    tar_paths = [os.path.join(current_directory, tar_file) for tar_file in os.listdir(current_directory) if tar_file.endswith('.tar.gz')]
+
+    with Manifest(manifest_path) as manifest:
+        # Archives already parsed and unchanged since, such as the Freemium dumps on a nightly run, are skipped
+        if not force:
+            tar_paths = manifest.pending(tar_paths)
+        large_tar_paths = [tar_path for tar_path in tar_paths if os.path.getsize(tar_path) >= pipeline_min_size]
+
+        # Huge archives are spread over all cores one at a time, member batches being parsed in parallel
+        for tar_path in large_tar_paths:
+            json_path, count = process_tar(tar_path, pipeline_workers=workers or os.cpu_count() or 1)
+            manifest.record(tar_path, [json_path])
+            print(f'Processed {tar_path} into {json_path} ({count} entries)')
+
+        # The other archives are each parsed in their own process and save their own JSON Lines file
+        small_tar_paths = [tar_path for tar_path in tar_paths if tar_path not in large_tar_paths]
+        for tar_path, (json_path, count) in run_parallel(process_tar, small_tar_paths, workers, max_in_flight):
+            manifest.record(tar_path, [json_path])
+            print(f'Processed {tar_path} into {json_path} ({count} entries)')
 
 # Example: Process all tar.gz files in the current directory
-process_all_tar_files_in_current_directory()
+if __name__ == "__main__":
+    process_all_tar_files_in_current_directory()
 
@@ -0,0 +1,88 @@
+"""Compares the text reconstruction of BODACC notices: ET.tostring plus regexes against dila.text.flatten_text.
+
+Run from the repository root with the folder of a year of RCS-A bulletins, e.g.
+    python benchmarks/bodacc_text.py FluxHistorique/2023
+Without a folder, a synthetic RCS-A bulletin is used.
+"""
+import os
+import re
+import sys
+import time
+import html
+import xml.etree.ElementTree as ET
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.archive import iter_tar_members
+from dila.text import flatten_text
+
+prefix = 'RCS-A'
+anchor_tag = 'tribunal'
+repeat = 3
+
+def tostring_text(elements):
+    """The former reconstruction of the text of a notice, by serializing its elements."""
+    text = "\n".join(ET.tostring(element, encoding='unicode') for element in elements).strip()
+    text = re.sub(r'</[^>]+>', '\n', text)
+    return re.sub(r'</?[^>]+>', '', text)
+
+def synthetic_bulletin(notices=20000):
+    avis = (
+        '<avis><nojo>{0}</nojo><numeroAnnonce>{0}</numeroAnnonce><numeroDepartement>75</numeroDepartement>'
+        '<tribunal>GREFFE DU TRIBUNAL DE COMMERCE DE PARIS</tribunal>'
+        '<personnes><personne><personneMorale><denomination>SOCIETE {0} &amp; FILS</denomination>'
+        '<formeJuridique>Société par actions simplifiée</formeJuridique><capital><montantCapital>1000</montantCapital>'
+        '<devise>EUR</devise></capital></personneMorale><adresse><numeroVoie>12</numeroVoie><typeVoie>rue</typeVoie>'
+        '<nomVoie>de la Paix</nomVoie><codePostal>75002</codePostal><ville>Paris</ville></adresse></personne></personnes>'
+        '<acte><immatriculation><categorieImmatriculation>Immatriculation</categorieImmatriculation></immatriculation>'
+        '<dateImmatriculation>2023-01-02</dateImmatriculation><descriptif>Commerce de détail, vente en ligne.</descriptif>'
+        '<dateCommencementActivite>2022-12-01</dateCommencementActivite></acte></avis>\n'
+    )
+    body = ''.join(avis.format(number) for number in range(notices))
+    return f'<RCS-A><parution>1</parution><dateParution>2023-01-03</dateParution>{body}</RCS-A>'.encode('utf-8')
+
+def load_notices(folder):
+    """Returns the lists of text elements of the notices of the RCS-A bulletins of folder."""
+    contents = []
+    if folder:
+        for root, _, files in os.walk(folder):
+            for file_name in sorted(files):
+                if file_name.startswith(prefix) and file_name.endswith('.taz'):
+                    contents.extend(content for _, content in iter_tar_members(os.path.join(root, file_name), '.xml'))
+    else:
+        contents.append(synthetic_bulletin())
+
+    notices = []
+    for content in contents:
+        for avis in ET.fromstring(content).iter('avis'):
+            tags = [child.tag for child in avis]
+            if anchor_tag in tags:
+                notices.append(avis[tags.index(anchor_tag)+1:])
+    return notices
+
+def bench(function, notices):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for elements in notices:
+            function(elements)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else None
+    notices = load_notices(folder)
+    print(f"{len(notices)} notices from {folder or 'a synthetic bulletin'}")
+
+    # The serialized text keeps the entities escaped; flatten_text returns the text itself
+    mismatches = sum(html.unescape(tostring_text(elements)) != flatten_text(elements) for elements in notices)
+    print(f"Mismatching texts: {mismatches}")
+
+    old = bench(tostring_text, notices)
+    new = bench(flatten_text, notices)
+    print(f"ET.tostring + regex: {old:.3f} s")
+    print(f"flatten_text:        {new:.3f} s")
+    print(f"\033[92mSpeedup: {old / new:.1f}x\033[0m")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compares the paragraph assembly of the debates transcripts with the former one as the number of <Contenu> sections grows.
+
+The former extract_text_from_xml appended the join of all the previous text back to it after each section, so
+its output doubled with every section; it is only run up to former_max_sections. dila.text.iter_paragraphs
+reads each paragraph once, so its time per section stays flat.
+
+    python benchmarks/debats_paragraphs.py
+"""
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.text import iter_paragraphs, join_paragraphs
+
+section_counts = [2, 4, 8, 12, 100, 1000, 10000]
+former_max_sections = 12
+paragraphs_per_section = 20
+
+def former_extract_text(root, tag='Contenu'):
+    contents = root.findall('.//' + tag)
+    all_text = []
+    for content in contents:
+        paragraphs = content.findall('.//Para')
+        for para in paragraphs:
+            text_parts = [elem.strip() for elem in para.itertext() if elem.strip()]
+            clean_text = ' '.join(text_parts)
+            all_text.append(clean_text)
+        full_text = '\n'.join(all_text)
+        all_text.append(full_text)  # Reset for next 'Contenu' section
+    return '\n'.join(all_text)
+
+def synthetic_transcript(sections):
+    paragraph = '<Para>M. le président. <Italique>La parole est à</Italique> M. le rapporteur.</Para>'
+    contenu = f'<Contenu>{paragraph * paragraphs_per_section}</Contenu>'
+    return ET.fromstring(f'<CompteRendu><Metadonnees/>{contenu * sections}</CompteRendu>')
+
+def bench(function, root):
+    start = time.perf_counter()
+    text = function(root)
+    return time.perf_counter() - start, len(text)
+
+def main():
+    print(f"{'Sections':>8} {'Former (s)':>11} {'Former chars':>13} {'Paragraphs (s)':>15} {'Chars':>9} {'us/section':>11}")
+    for sections in section_counts:
+        root = synthetic_transcript(sections)
+        new, new_length = bench(lambda root: join_paragraphs(iter_paragraphs(root)), root)
+        if sections <= former_max_sections:
+            old, old_length = bench(former_extract_text, root)
+            print(f"{sections:>8} {old:>11.4f} {old_length:>13} {new:>15.4f} {new_length:>9} {new / sections * 1e6:>11.1f}")
+        else:
+            print(f"{sections:>8} {'-':>11} {'-':>13} {new:>15.4f} {new_length:>9} {new / sections * 1e6:>11.1f}")
+
+if __name__ == "__main__":
+    main()
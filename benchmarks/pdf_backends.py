@@ -0,0 +1,117 @@
+"""Times every installed PDF backend of dila.extractors on a sample of PDFs and compares the text they extract.
+
+Run from the repository root with PDF files, folders or archives of AMF, BOCC or CIRCULAIRES, e.g.
+    python benchmarks/pdf_backends.py AMF/ BOCC/ CIRCULAIRES/2024
+PDFs are looked for in folders and inside archives, and a sample of them is drawn at random. Without arguments,
+synthetic PDFs are used. For each backend, pages per second are reported, and the agreement of its text
+lengths, without whitespace, with the median of the backends on each PDF.
+"""
+import os
+import sys
+import time
+import random
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.archive import iter_archive, ARCHIVE_ERRORS
+from dila.extractors import EXTRACTORS, available_backends, get_backend
+from dila.pdf import iter_pdf_pages
+
+sample = 50
+seed = 0
+
+def synthetic_pdf(pages=20, lines=40):
+    """Returns a PDF of pages of text lines, written with the standard Helvetica font."""
+    line = "Article {0}. L'Autorit\\351 des march\\351s financiers publie la d\\351cision n\\260 {0} du coll\\350ge."
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>',
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>"]
+    font = 3 + 2 * pages
+    for page in range(pages):
+        stream = 'BT /F1 10 Tf 14 TL 50 760 Td ' + ' '.join(f'({line.format(page * lines + i)}) Tj T*' for i in range(lines)) + ' ET'
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * page} 0 R '
+                       f'/Resources << /Font << /F1 {font} 0 R >> >> >>')
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    objects.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    pdf = '%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f'{number} 0 obj\n{body}\nendobj\n'
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n' + ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    pdf += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    return pdf.encode('latin-1')
+
+def find_pdfs(paths):
+    """Returns the (name, bytes) of the PDFs of paths: PDF files, and PDFs in folders and archives."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(path)
+
+    pdfs = []
+    for file_path in files:
+        if file_path.lower().endswith('.pdf'):
+            with open(file_path, 'rb') as f:
+                pdfs.append((file_path, f.read()))
+            continue
+        try:
+            pdfs.extend((f"{file_path}/{name}", content) for name, content in iter_archive(file_path, '.pdf'))
+        except ARCHIVE_ERRORS:
+            pass  # Not an archive
+    return pdfs
+
+def extract(backend, pdfs):
+    """Returns the seconds spent, the pages read and the text length without whitespace of each PDF (None if failed)."""
+    pages = 0
+    lengths = []
+    start = time.perf_counter()
+    for _, content in pdfs:
+        try:
+            texts = list(iter_pdf_pages(content, backend=backend.name))
+        except Exception:
+            lengths.append(None)
+            continue
+        pages += len(texts)
+        lengths.append(sum(len(''.join(text.split())) for text in texts))
+    return time.perf_counter() - start, pages, lengths
+
+def agreement(lengths, medians):
+    """Returns the mean ratio of the smaller to the larger of each length and the median for the PDF."""
+    ratios = [min(length, median) / max(length, median) if max(length, median) else 1.0
+              for length, median in zip(lengths, medians) if length is not None and median is not None]
+    return statistics.mean(ratios) if ratios else 0.0
+
+def main():
+    pdfs = find_pdfs(sys.argv[1:])
+    if len(pdfs) > sample:
+        pdfs = random.Random(seed).sample(pdfs, sample)
+    if not pdfs:
+        pdfs = [(f"synthetic {number}", synthetic_pdf()) for number in range(sample)]
+    print(f"{len(pdfs)} PDFs from {' '.join(sys.argv[1:]) or 'synthetic documents'}")
+
+    backends = available_backends('.pdf')
+    missing = [backend.name for backend in EXTRACTORS['.pdf'] if backend not in backends]
+    if missing:
+        print(f"\033[93mNot installed: {', '.join(missing)}\033[0m")
+    results = {backend.name: extract(backend, pdfs) for backend in backends}
+
+    medians = []
+    for number in range(len(pdfs)):
+        lengths = [results[name][2][number] for name in results if results[name][2][number] is not None]
+        medians.append(statistics.median(lengths) if lengths else None)
+
+    for name, (elapsed, pages, lengths) in results.items():
+        failures = sum(length is None for length in lengths)
+        print(f"{name:<10} {pages / elapsed if elapsed else 0:>8.1f} pages/s  {pages:>6} pages  {failures:>3} failures  "
+              f"{agreement(lengths, medians):>6.1%} length agreement")
+
+    if results:
+        fastest = max(results, key=lambda name: results[name][1] / results[name][0] if results[name][0] else 0)
+        print(f"\033[92mFastest: {fastest}, selected by default: {get_backend('.pdf').name}\033[0m")
+
+if __name__ == "__main__":
+    main()
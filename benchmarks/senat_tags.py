@@ -0,0 +1,98 @@
+"""Compares the Sénat debates parser with the former one, which lowercased every tag of the tree before its lookups.
+
+Run from the repository root with the folder of a year of Sénat sittings, e.g.
+    python benchmarks/senat_tags.py /mnt/jupiter/DILA/Debats/SENAT/2019
+Without a folder, synthetic sittings with mixed-case tags are written to a temporary folder.
+"""
+import os
+import sys
+import time
+import tempfile
+import importlib.util
+import xml.etree.ElementTree as ET
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Debats/parsing_senat.py is a script, loaded from its path
+spec = importlib.util.spec_from_file_location(
+    'parsing_senat', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Debats', 'parsing_senat.py'))
+parsing_senat = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(parsing_senat)
+
+repeat = 5
+
+def normalize_tag(element):
+    """Recursively convert all tags in the element tree to lowercase."""
+    element.tag = element.tag.lower()
+    for child in element:
+        normalize_tag(child)
+
+def normalized_process_xml_file(xml_file):
+    """The former parser: lowercase the whole tree, then look the fields up."""
+    try:
+        root = ET.parse(xml_file).getroot()
+        normalize_tag(root)
+        output = dict.fromkeys(["Type_Publication", "Date", "Numero_Parution", "NumeroGrebiche", "Date_Seance",
+                                "Num_Jour_Session", "Num_Seance", "Session_Ord", "Text"])
+        output["filename"] = os.path.basename(xml_file)
+        output["word_count"] = 0
+        metadonnees = root.find(".//metadonnees")
+        if metadonnees is not None:
+            for tag, key in parsing_senat.METADATA_KEYS.items():
+                output[key] = metadonnees.findtext(tag)
+            session = metadonnees.find(".//session")
+            if session is not None:
+                output["Session_Ord"] = session.findtext("sessionord")
+        full_text = ''.join(''.join(contenu.itertext()) for contenu in root.findall(".//contenu"))
+        output["Text"] = full_text
+        output["word_count"] = len(full_text.split())
+        return output
+    except ET.ParseError as e:
+        print(f"Error parsing {xml_file}: {e}")
+        return None
+
+def write_synthetic_sittings(folder, sittings=20, paragraphs=3000):
+    paragraph = '<Para>Monsieur le président, <Italique>mes chers collègues</Italique>, la séance est ouverte.</Para>'
+    for number in range(sittings):
+        with open(os.path.join(folder, f'sitting_{number}.xml'), 'w', encoding='utf-8') as f:
+            f.write(
+                '<Compte_Rendu><MetaDonnees><TypePublication>CRI</TypePublication><DateParution>2019-01-15</DateParution>'
+                f'<NumParution>{number}</NumParution><numeroGrebiche>{number}</numeroGrebiche>'
+                '<DateSeance>2019-01-14</DateSeance><NumJourSession>45</NumJourSession><NumSeance>52</NumSeance>'
+                '<Session><SessionOrd>2018-2019</SessionOrd></Session></MetaDonnees>'
+                f'<Contenu><Point>{paragraph * (paragraphs // 2)}</Point></Contenu>'
+                f'<CONTENU>{paragraph * (paragraphs // 2)}</CONTENU></Compte_Rendu>'
+            )
+
+def bench(function, xml_files):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for xml_file in xml_files:
+            function(xml_file)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        folder = sys.argv[1] if len(sys.argv) > 1 else temporary_folder
+        if folder == temporary_folder:
+            write_synthetic_sittings(folder)
+        xml_files = [os.path.join(root, name) for root, _, files in os.walk(folder) for name in sorted(files) if name.endswith('.xml')]
+        print(f"{len(xml_files)} sittings from {folder}")
+
+        mismatches = sum(normalized_process_xml_file(xml_file) != parsing_senat.process_xml_file(xml_file) for xml_file in xml_files)
+        print(f"Mismatching entries: {mismatches}")
+
+        # Both parse the files with ET.parse: the cost of the lookups is what remains once parsing is subtracted
+        parse = bench(ET.parse, xml_files)
+        old = bench(normalized_process_xml_file, xml_files)
+        new = bench(parsing_senat.process_xml_file, xml_files)
+        print(f"ET.parse alone:         {parse:.3f} s")
+        print(f"Lowercased tree + find: {old:.3f} s ({old - parse:.3f} s of lookups)")
+        print(f"Case-folded walk:       {new:.3f} s ({new - parse:.3f} s of lookups)")
+        print(f"\033[92mLookup speedup: {(old - parse) / max(new - parse, 1e-9):.1f}x\033[0m")
+
+if __name__ == "__main__":
+    main()
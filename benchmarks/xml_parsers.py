@@ -0,0 +1,129 @@
+"""Times the XML parsing of each corpus with ElementTree and with lxml through dila.parsers.
+
+For each corpus, a synthetic document shaped like its files is parsed and its entry extracted the way its
+script does, once with ElementTree (the former path) and once with lxml, whatever the script's own use_lxml.
+
+    python benchmarks/xml_parsers.py
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import importlib.util
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers
+from dila.encoding import parse_xml_bytes
+from dila.fields import FieldSpec
+from dila.jurisprudence import compile_fields, parse_decision
+from dila.records import iter_records
+
+repeat = 5
+documents = 200
+
+def load_script(*path):
+    """Loads a corpus script that only runs its main code under __main__."""
+    spec = importlib.util.spec_from_file_location(path[-1][:-3], os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), *path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+bodacc = load_script('BODACC', 'parsing.py')
+parsing_senat = load_script('Debats', 'parsing_senat.py')
+
+decision_fields = compile_fields({
+    "ID": ".//META_COMMUN/ID",
+    "Nature": ".//META_COMMUN/NATURE",
+    "Titre": ".//META_JURI/TITRE",
+    "Date": ".//META_JURI/DATE_DEC",
+    "Juridiction": ".//META_JURI/JURIDICTION",
+    "Solution": ".//META_JURI/SOLUTION",
+    "Num_Affaire": ".//NUMERO_AFFAIRE",
+})
+
+notice_fields = FieldSpec({
+    "ID": ".//IDWEB",
+    "Acheteur": ".//ORGANISME/DENOMINATION",
+    "Object": ".//OBJET/OBJET_COMPLET",
+    "Date": ".//DATE_PUBLICATION",
+})
+
+decision = (
+    '<?xml version="1.0" encoding="UTF-8"?><TEXTE_JURI_JUDI><META><META_COMMUN><ID>JURITEXT000001</ID>'
+    '<NATURE>ARRET</NATURE></META_COMMUN><META_SPEC><META_JURI><TITRE>Cour de cassation, chambre civile 1</TITRE>'
+    '<DATE_DEC>2020-01-15</DATE_DEC><JURIDICTION>Cour de cassation</JURIDICTION><SOLUTION>Rejet</SOLUTION>'
+    '</META_JURI><META_JURI_JUDI><NUMEROS_AFFAIRES><NUMERO_AFFAIRE>18-12.345</NUMERO_AFFAIRE></NUMEROS_AFFAIRES>'
+    '</META_JURI_JUDI></META_SPEC></META><TEXTE><BLOC_TEXTUEL><CONTENU>'
+    + 'Attendu que, selon l\'arrêt attaqué, la société a formé un pourvoi.<br/>' * 200 +
+    '</CONTENU></BLOC_TEXTUEL></TEXTE></TEXTE_JURI_JUDI>'
+).encode('utf-8')
+
+notice = (
+    '<?xml version="1.0" encoding="ISO-8859-1"?><AVIS><GESTION><IDWEB>19-12345</IDWEB></GESTION>'
+    '<DONNEES><IDENTITE><ORGANISME><DENOMINATION>Commune de Paris</DENOMINATION></ORGANISME></IDENTITE>'
+    '<OBJET><OBJET_COMPLET>Travaux de voirie, n&deg; 12</OBJET_COMPLET></OBJET>'
+    '<DATE_PUBLICATION>2019-01-15</DATE_PUBLICATION></DONNEES></AVIS>'
+).encode('iso-8859-1')
+
+avis = (
+    '<avis><nojo>{0}</nojo><numeroAnnonce>{0}</numeroAnnonce><numeroDepartement>75</numeroDepartement>'
+    '<tribunal>GREFFE DU TRIBUNAL DE COMMERCE DE PARIS</tribunal><personnes><personne><personneMorale>'
+    '<denomination>SOCIETE {0}</denomination></personneMorale><adresse><ville>Paris</ville></adresse>'
+    '</personne></personnes><acte><descriptif>Commerce de détail.</descriptif></acte></avis>'
+)
+bulletin = ('<RCS-A><dateParution>2023-01-03</dateParution>' + ''.join(avis.format(number) for number in range(2000)) + '</RCS-A>').encode('utf-8')
+
+paragraph = '<Para>Monsieur le président, <Italique>mes chers collègues</Italique>, la séance est ouverte.</Para>'
+sitting = (
+    '<Compte_Rendu><MetaDonnees><TypePublication>CRI</TypePublication><DateParution>2019-01-15</DateParution>'
+    '<Session><SessionOrd>2018-2019</SessionOrd></Session></MetaDonnees>'
+    f'<Contenu>{paragraph * 2000}</Contenu></Compte_Rendu>'
+).encode('utf-8')
+
+def parse_bulletin():
+    for root, notice_element in iter_records(io.BytesIO(bulletin), 'avis'):
+        bodacc.notice_entry(root, notice_element, 'tribunal', False, 'bench')
+
+def corpora(folder):
+    sitting_path = os.path.join(folder, 'sitting.xml')
+    with open(sitting_path, 'wb') as f:
+        f.write(sitting)
+    return {
+        'Jurisprudence (decision)': lambda: [parse_decision(decision, decision_fields) for _ in range(documents)],
+        'BOAMP (notice)': lambda: [notice_fields.extract(parse_xml_bytes(notice, {'deg': '°'})) for _ in range(documents)],
+        'BODACC (RCS-A bulletin)': parse_bulletin,
+        'Sénat (sitting)': lambda: parsing_senat.process_xml_file(sitting_path),
+    }
+
+def bench(function):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def use_lxml(enabled):
+    """Parses with lxml or ElementTree, both by default and in the Sénat script, which chooses its library."""
+    parsers.USE_LXML = enabled
+    parsing_senat.use_lxml = enabled
+
+def main():
+    if not parsers.HAS_LXML:
+        print("lxml is not installed: only the ElementTree path can be timed")
+    print(f"{'Corpus':<26} {'ElementTree (s)':>16} {'lxml (s)':>10} {'Speedup':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for corpus, function in corpora(folder).items():
+            use_lxml(False)
+            old = bench(function)
+            if parsers.HAS_LXML:
+                use_lxml(True)
+                new = bench(function)
+                print(f"{corpus:<26} {old:>16.4f} {new:>10.4f} {old / new:>7.1f}x")
+            else:
+                print(f"{corpus:<26} {old:>16.4f} {'-':>10} {'-':>8}")
+
+if __name__ == "__main__":
+    main()
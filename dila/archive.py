@@ -0,0 +1,230 @@
+import os
+import io
+import bz2
+import gzip
+import lzma
+import tarfile
+import zipfile
+from dila.lzw import LZW_MAGIC, LZWError, open_lzw
+
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZIP_MAGICS = (b'PK\x03\x04', b'PK\x05\x06')
+SEVEN_ZIP_MAGIC = b'7z\xbc\xaf\x27\x1c'
+
+# Members with these extensions are opened as nested archives; their real format is still sniffed
+ARCHIVE_EXTENSIONS = ('.taz', '.tar', '.tgz', '.gz', '.z', '.zip', '.7z')
+
+
+class ArchiveFormatError(ValueError):
+    """Raised when a file is not an archive of a supported format."""
+
+
+# Errors raised on unknown formats and by the readers of the supported formats on corrupted or truncated data
+ARCHIVE_ERRORS = (ArchiveFormatError, tarfile.TarError, zipfile.BadZipFile, LZWError, EOFError, OSError, lzma.LZMAError)
+
+_COMPRESSED_SUFFIXES = ('.gz', '.z', '.bz2', '.xz')
+
+# Bytes of attachments held while waiting for the record that references them, see AttachmentBuffer
+ATTACHMENT_BUFFER_SIZE = 256 * 1024 ** 2
+
+
+def sniff_format(header):
+    """Returns the format of data starting with header: 'lzw', 'gzip', 'bzip2', 'xz', 'zip', '7z', 'tar' or None."""
+    if header.startswith(LZW_MAGIC):
+        return 'lzw'
+    if header.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if header.startswith(BZIP2_MAGIC):
+        return 'bzip2'
+    if header.startswith(XZ_MAGIC):
+        return 'xz'
+    if header.startswith(ZIP_MAGICS):
+        return 'zip'
+    if header.startswith(SEVEN_ZIP_MAGIC):
+        return '7z'
+    if header[257:262] == b'ustar':
+        return 'tar'
+    if len(header) >= tarfile.BLOCKSIZE:
+        # Pre-POSIX tar headers have no magic string, but carry a checksum
+        try:
+            tarfile.TarInfo.frombuf(header[:tarfile.BLOCKSIZE], 'utf-8', 'surrogateescape')
+            return 'tar'
+        except tarfile.HeaderError:
+            pass
+    return None
+
+
+def _peek(fileobj, size=512):
+    """Returns the first bytes of a binary stream without consuming them."""
+    if hasattr(fileobj, 'peek'):
+        return fileobj.peek(size)[:size]
+    header = fileobj.read(size)
+    fileobj.seek(-len(header), 1)
+    return header
+
+
+def _decompress(fileobj, archive_format):
+    """Wraps a compressed stream into a buffered stream of its decompressed content."""
+    if archive_format == 'lzw':
+        return open_lzw(fileobj=fileobj)
+    if archive_format == 'gzip':
+        return io.BufferedReader(gzip.GzipFile(fileobj=fileobj, mode='rb'))
+    if archive_format == 'bzip2':
+        return io.BufferedReader(bz2.BZ2File(fileobj, mode='rb'))
+    return io.BufferedReader(lzma.LZMAFile(fileobj, mode='rb'))
+
+
+def open_tar_stream(fileobj):
+    """Opens a tar stream from a binary file object, decoding Unix compress (.Z) data in-process."""
+    magic = fileobj.read(2)
+    fileobj.seek(-len(magic), 1)
+    if magic == LZW_MAGIC:
+        return tarfile.open(fileobj=open_lzw(fileobj=fileobj), mode='r|')
+    return tarfile.open(fileobj=fileobj, mode='r|*')
+
+
+def iter_tar_members(tar_path=None, extension=None, fileobj=None, stream=False, names=None):
+    """Yields (member_name, bytes) pairs from a tar archive, read sequentially without extracting to disk.
+
+    With stream=True, a file object reading the member is yielded instead of its bytes, so a large member
+    can be parsed incrementally; it is only valid until the next member is requested. With names, only
+    the members of these names are read, the others being skipped in the stream.
+    """
+    with (fileobj or open(tar_path, 'rb')) as f, open_tar_stream(f) as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            if extension and not member.name.endswith(extension):
+                continue
+            if names is not None and member.name not in names:
+                continue
+            member_file = tar.extractfile(member)
+            yield member.name, member_file if stream else member_file.read()
+
+
+class AttachmentBuffer:
+    """Attachments read before the record that references them, held by name until it is read.
+
+    Their bytes are held up to max_size in total; beyond, only where they are is noted, and reread reads
+    them again from their archives once the records are.
+    """
+
+    def __init__(self, max_size=ATTACHMENT_BUFFER_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._held = {}  # Name -> (member name, bytes)
+        self.skipped = {}  # Name -> (archive path, member name) of the attachments not held
+
+    def add(self, name, tar_path, member_name, content):
+        """Holds an attachment under name, or notes where it is if the buffer is full; the first one of a name is kept."""
+        if name in self._held or name in self.skipped:
+            return
+        if self.size + len(content) > self.max_size:
+            self.skipped[name] = (tar_path, member_name)
+        else:
+            self._held[name] = (member_name, content)
+            self.size += len(content)
+
+    def __contains__(self, name):
+        return name in self._held
+
+    def pop(self, name):
+        """Returns the (member name, bytes) of a held attachment and releases them."""
+        member_name, content = self._held.pop(name)
+        self.size -= len(content)
+        return member_name, content
+
+    def clear(self):
+        """Releases the attachments held, once no record can reference them any more."""
+        self._held.clear()
+        self.size = 0
+
+    def reread(self, names):
+        """Yields (name, member name, bytes) of the skipped attachments among names, in a second pass over their
+        archives that stops once the last of them is read."""
+        wanted = {}  # Archive path -> member name -> name
+        for name in names:
+            if name in self.skipped:
+                tar_path, member_name = self.skipped.pop(name)
+                wanted.setdefault(tar_path, {})[member_name] = name
+        for tar_path, members in wanted.items():
+            # Members are removed once read, so a name repeated in the archive is only yielded once
+            for member_name, content in iter_tar_members(tar_path, names=members):
+                yield members.pop(member_name), member_name, content
+                if not members:
+                    break
+
+
+def _iter_raw_members(fileobj, archive_format, name):
+    """Yields (member_name, bytes) pairs of one archive level, whose format has already been sniffed."""
+    if archive_format == 'tar':
+        with tarfile.open(fileobj=fileobj, mode='r|') as tar:
+            for member in tar:
+                if member.isfile():
+                    yield member.name, tar.extractfile(member).read()
+    elif archive_format == 'zip':
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, archive.read(info)
+    elif archive_format == '7z':
+        try:
+            import py7zr
+        except ImportError:
+            raise ImportError("Reading .7z archives requires the 'py7zr' package")
+        with py7zr.SevenZipFile(fileobj, mode='r') as archive:
+            for member_name, content in archive.readall().items():
+                yield member_name, content.read()
+    else:
+        stream = _decompress(fileobj, archive_format)
+        if sniff_format(_peek(stream)) == 'tar':
+            yield from _iter_raw_members(stream, 'tar', name)
+        else:
+            # A single compressed file, e.g. file.xml.gz
+            base_name = os.path.basename(name)
+            if base_name.lower().endswith(_COMPRESSED_SUFFIXES):
+                base_name = os.path.splitext(base_name)[0]
+            yield base_name, stream.read()
+
+
+def iter_archive(path=None, extension=None, fileobj=None, name=None, nested=True):
+    """Yields (member_name, bytes) pairs from an archive of any supported format, detected from its magic bytes.
+
+    Members that are themselves archives (.taz, .tar, .zip, .7z, ...) are opened in memory and their
+    files are yielded as 'outer_member/inner_member', unless nested is False.
+    """
+    name = name or path or ''
+    with (fileobj or open(path, 'rb')) as f:
+        archive_format = sniff_format(_peek(f))
+        if archive_format is None:
+            raise ArchiveFormatError(f"Unknown archive format: {name}")
+
+        for member_name, content in _iter_raw_members(f, archive_format, name):
+            if nested and member_name.lower().endswith(ARCHIVE_EXTENSIONS) and sniff_format(content[:512]):
+                try:
+                    for inner_name, inner_content in iter_archive(extension=extension, fileobj=io.BytesIO(content), name=member_name):
+                        yield f"{member_name}/{inner_name}", inner_content
+                except ARCHIVE_ERRORS as e:
+                    print(f"Failed to read nested archive {member_name} in {name}: {e}")
+                continue
+            if extension and not member_name.endswith(extension):
+                continue
+            yield member_name, content
+
+
+def extract_archive(path, extract_path, extension=None):
+    """Writes the files of an archive, including those of nested archives, under extract_path and returns their paths."""
+    extracted = []
+    root = os.path.abspath(extract_path)
+    for member_name, content in iter_archive(path, extension):
+        target = os.path.abspath(os.path.join(root, member_name.lstrip('/')))
+        if not target.startswith(root + os.sep):
+            print(f"Skipping member outside of the extraction folder: {member_name}")
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        extracted.append(target)
+    return extracted
@@ -0,0 +1,112 @@
+"""SQLite cache of the text extracted from attachments, keyed by the SHA-256 of their bytes and by the extractor."""
+import time
+import zlib
+import sqlite3
+import hashlib
+from importlib import metadata
+
+TEXT_CACHE_SIZE = 10 * 1024 ** 3  # Bytes of compressed text kept before the least recently used entries are evicted
+
+
+def content_digest(content):
+    """Returns the SHA-256 hex digest of the bytes of an attachment."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def extractor_key(name, *distributions):
+    """Returns the name of an extractor followed by the installed versions of the distributions it relies on.
+
+    Upgrading one of them changes the key, so texts extracted by the former version are not reused.
+    """
+    versions = []
+    for distribution in distributions:
+        try:
+            versions.append(f"{distribution}=={metadata.version(distribution)}")
+        except metadata.PackageNotFoundError:
+            versions.append(distribution)
+    return ' '.join([name, *versions])
+
+
+class TextCache:
+    """Stores zlib-compressed texts by (content digest, extractor key), evicting the least recently used beyond max_bytes.
+
+    The same attachment found in several archives, or on a rerun, is extracted once. Several processes may
+    share the cache file: each opens its own TextCache, and SQLite serializes their writes.
+    """
+
+    def __init__(self, path, max_bytes=TEXT_CACHE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._added = 0  # Bytes stored since the size was last checked
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS texts ("
+                "digest TEXT, extractor TEXT, text BLOB, size INTEGER, last_used REAL, PRIMARY KEY (digest, extractor))"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS texts_last_used ON texts (last_used)")
+
+    def get(self, digest, extractor):
+        """Returns the text stored for this digest and extractor, or None."""
+        row = self._connection.execute(
+            "SELECT text FROM texts WHERE digest = ? AND extractor = ?", (digest, extractor)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._connection:
+            self._connection.execute(
+                "UPDATE texts SET last_used = ? WHERE digest = ? AND extractor = ?", (time.time(), digest, extractor)
+            )
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, digest, extractor, text):
+        """Stores a text; committed at once so an interrupted run keeps it."""
+        compressed = zlib.compress(text.encode('utf-8'))
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO texts (digest, extractor, text, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (digest, extractor, compressed, len(compressed), time.time()),
+            )
+        self._added += len(compressed)
+        if self._added > self.max_bytes // 16:
+            self.evict()
+
+    def extract(self, content, extractor, function):
+        """Returns function(content), or the text it returned for the same bytes before; failures are not stored."""
+        digest = content_digest(content)
+        text = self.get(digest, extractor)
+        if text is None:
+            text = function(content)
+            self.put(digest, extractor, text)
+        return text
+
+    def evict(self):
+        """Deletes the least recently used texts until the cache holds at most max_bytes."""
+        self._added = 0
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM texts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        evicted = []
+        for digest, extractor, size in self._connection.execute("SELECT digest, extractor, size FROM texts ORDER BY last_used"):
+            evicted.append((digest, extractor))
+            excess -= size
+            if excess <= 0:
+                break
+        with self._connection:
+            self._connection.executemany("DELETE FROM texts WHERE digest = ? AND extractor = ?", evicted)
+
+    def close(self):
+        self.evict()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,84 @@
+"""Encoding detection from the bytes of XML and HTML files, so that each file is read and decoded once."""
+import re
+import codecs
+from dila import parsers as ET
+
+# Longest BOMs first, as the UTF-32 LE BOM starts with the UTF-16 LE one
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Declarations are looked for in the first bytes only, as browsers do for the HTML <meta> charset
+SNIFF_SIZE = 1024
+XML_DECLARATION = re.compile(rb'^<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._:-]+)["\']')
+META_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?([A-Za-z0-9._:-]+)', re.IGNORECASE)
+
+
+def _codec_name(name):
+    try:
+        return codecs.lookup(name.decode('ascii')).name
+    except LookupError:
+        return None
+
+
+def sniff_encoding(data, fallback='iso-8859-1'):
+    """Returns the encoding of an XML or HTML document given as bytes.
+
+    The encoding is taken from a BOM, then from the XML declaration or an HTML <meta> charset. Without
+    them, the document is UTF-8 if it is ASCII or valid UTF-8, else fallback.
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+
+    head = data[:SNIFF_SIZE]
+    match = XML_DECLARATION.match(head.lstrip()) or META_CHARSET.search(head)
+    if match:
+        encoding = _codec_name(match.group(1))
+        if encoding:
+            return encoding
+
+    if data.isascii():
+        return 'utf-8'
+    try:
+        data.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return fallback
+
+
+def decode(data, fallback='iso-8859-1'):
+    """Decodes the bytes of an XML or HTML document with the encoding found by sniff_encoding.
+
+    A document that does not match its declared encoding is decoded with fallback instead.
+    """
+    try:
+        return data.decode(sniff_encoding(data, fallback))
+    except UnicodeDecodeError:
+        return data.decode(fallback)
+
+
+def read_text(path, fallback='iso-8859-1'):
+    """Reads a text file in binary and decodes it once, see decode."""
+    with open(path, 'rb') as f:
+        return decode(f.read(), fallback)
+
+
+def parse_xml_bytes(data, entities=None, fallback='iso-8859-1'):
+    """Parses an XML document from its bytes and returns its root element, decoding it within the parser.
+
+    entities maps the names of entities the document uses without declaring them (e.g. the HTML 'deg')
+    to their text; they are declared in the DOCTYPE (see ET.declare_entities) rather than replaced in the text. A document
+    that is not valid in its declared encoding is parsed as fallback. Raises ET.ParseError.
+    """
+    encoding = sniff_encoding(data, fallback)
+    # Checked before parsing, as lxml in recover mode replaces the invalid bytes instead of raising
+    try:
+        data.decode(encoding)
+    except UnicodeDecodeError:
+        encoding = fallback
+    return ET.feed([data], encoding, entities)
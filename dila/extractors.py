@@ -0,0 +1,205 @@
+"""Text extraction backends, registered by file extension and MIME type and chosen at runtime among those installed.
+
+A backend opens a document from a path or from its bytes; the document gives its page count and yields the
+text of a range of pages. Backends are listed fastest first (see benchmarks/pdf_backends.py), so
+get_backend picks the fastest one installed unless one is named.
+"""
+import io
+import re
+import os
+import shutil
+import tempfile
+import subprocess
+from importlib import util
+
+from dila.cache import extractor_key
+
+EXTRACTORS = {}  # Extension or MIME type -> backends, fastest first
+
+
+def _open(source):
+    return io.BytesIO(source) if isinstance(source, bytes) else open(source, 'rb')
+
+
+class Document:
+    """Base of the documents opened by the backends, closed on leaving a with block."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PdfiumDocument(Document):
+    """PDF read by PDFium, Chrome's C++ engine, through pypdfium2."""
+
+    def __init__(self, source):
+        import pypdfium2
+        self._pdf = pypdfium2.PdfDocument(source)
+
+    def __len__(self):
+        return len(self._pdf)
+
+    def iter_pages(self, start, stop):
+        for number in range(start, stop):
+            page = self._pdf[number]
+            text_page = page.get_textpage()
+            try:
+                yield text_page.get_text_range()
+            finally:
+                text_page.close()
+                page.close()
+
+    def close(self):
+        self._pdf.close()
+
+
+class PdftotextDocument(Document):
+    """PDF read by poppler's pdftotext command, once per range of pages; bytes go through a temporary file."""
+
+    def __init__(self, source):
+        self._temporary = isinstance(source, bytes)
+        if self._temporary:
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+                f.write(source)
+            source = f.name
+        self._path = source
+        try:
+            info = subprocess.run(['pdfinfo', self._path], capture_output=True, check=True).stdout.decode('utf-8', 'replace')
+        except subprocess.CalledProcessError as e:
+            self.close()
+            raise ValueError(f"pdfinfo failed: {e.stderr.decode('utf-8', 'replace').strip()}")
+        match = re.search(r'^Pages:\s+(\d+)', info, re.M)
+        self._page_count = int(match.group(1)) if match else 0
+
+    def __len__(self):
+        return self._page_count
+
+    def iter_pages(self, start, stop):
+        if start >= stop:
+            return
+        command = ['pdftotext', '-q', '-enc', 'UTF-8', '-f', str(start + 1), '-l', str(stop), self._path, '-']
+        output = subprocess.run(command, capture_output=True, check=True).stdout.decode('utf-8', 'replace')
+        # pdftotext ends each page with a form feed
+        yield from output.split('\f')[:stop - start]
+
+    def close(self):
+        if self._temporary and os.path.exists(self._path):
+            os.remove(self._path)
+
+
+class PyPDF2Document(Document):
+    """PDF read by PyPDF2, in pure Python."""
+
+    def __init__(self, source):
+        from PyPDF2 import PdfReader
+        self._file = _open(source)
+        self._pages = PdfReader(self._file).pages
+
+    def __len__(self):
+        return len(self._pages)
+
+    def iter_pages(self, start, stop):
+        for number in range(start, stop):
+            yield self._pages[number].extract_text() or ''
+
+    def close(self):
+        self._file.close()
+
+
+class PdfminerDocument(Document):
+    """PDF read by pdfminer.six, in pure Python, with its layout analysis."""
+
+    def __init__(self, source):
+        from pdfminer.pdfpage import PDFPage
+        self._file = _open(source)
+        self._pages = list(PDFPage.get_pages(self._file))
+
+    def __len__(self):
+        return len(self._pages)
+
+    def iter_pages(self, start, stop):
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        manager = PDFResourceManager()
+        for number in range(start, stop):
+            output = io.StringIO()
+            device = TextConverter(manager, output, laparams=LAParams())
+            PDFPageInterpreter(manager, device).process_page(self._pages[number])
+            device.close()
+            yield output.getvalue().rstrip('\f')  # Form feed ending each page
+
+    def close(self):
+        self._file.close()
+
+
+class Backend:
+    """An extraction engine: how to open a document, and the modules or commands it needs."""
+
+    def __init__(self, name, document, modules=(), commands=(), distributions=()):
+        self.name = name
+        self.document = document
+        self.modules = modules
+        self.commands = commands
+        self.distributions = distributions
+
+    def available(self):
+        """Returns True if the modules and commands of the backend are installed."""
+        return all(util.find_spec(module) for module in self.modules) and all(shutil.which(command) for command in self.commands)
+
+    def open(self, source):
+        """Opens a document from a path or from its bytes."""
+        return self.document(source)
+
+    def key(self):
+        """Returns the name of the backend with the versions of what it relies on, for the text cache."""
+        key = extractor_key(self.name, *self.distributions)
+        for command in self.commands:
+            result = subprocess.run([command, '-v'], capture_output=True)
+            version = (result.stderr or result.stdout).decode('utf-8', 'replace').splitlines()
+            key += f" {version[0] if version else command}"
+        return key
+
+    def __repr__(self):
+        return f"Backend({self.name!r})"
+
+
+def register(backend, *file_types):
+    """Adds a backend, after those already registered, for extensions (e.g. '.pdf') or MIME types."""
+    for file_type in file_types:
+        EXTRACTORS.setdefault(file_type.lower(), []).append(backend)
+
+
+def available_backends(file_type):
+    """Returns the installed backends for an extension or MIME type, fastest first."""
+    if file_type.lower() not in EXTRACTORS:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    return [backend for backend in EXTRACTORS[file_type.lower()] if backend.available()]
+
+
+def get_backend(file_type, name=None):
+    """Returns the backend called name for an extension or MIME type, or the fastest one installed if name is None."""
+    backends = available_backends(file_type)
+    if name is None:
+        if not backends:
+            names = ', '.join(backend.name for backend in EXTRACTORS[file_type.lower()])
+            raise ImportError(f"No backend installed for {file_type} files, install one of: {names}")
+        return backends[0]
+    for backend in EXTRACTORS[file_type.lower()]:
+        if backend.name == name:
+            if backend not in backends:
+                raise ImportError(f"The {name} backend is not installed")
+            return backend
+    raise ValueError(f"Unknown backend for {file_type} files: {name}")
+
+
+PDF_TYPES = ('.pdf', 'application/pdf')
+register(Backend('pypdfium2', PdfiumDocument, modules=('pypdfium2',), distributions=('pypdfium2',)), *PDF_TYPES)
+register(Backend('pdftotext', PdftotextDocument, commands=('pdftotext', 'pdfinfo')), *PDF_TYPES)
+register(Backend('PyPDF2', PyPDF2Document, modules=('PyPDF2',), distributions=('PyPDF2',)), *PDF_TYPES)
+register(Backend('pdfminer', PdfminerDocument, modules=('pdfminer',), distributions=('pdfminer.six',)), *PDF_TYPES)
@@ -0,0 +1,119 @@
+"""Declarative field specs, filled from a single walk of an XML tree instead of one descendant search per field."""
+import re
+
+ANY_TAG = '*'
+
+
+class Field:
+    """Describes how to fill one output field from the first element matching path.
+
+    path is an ElementPath subset: tag steps separated by '/' (child) or '//' (descendant), optionally
+    starting with './/' (any descendant of the walked element) or './', '*' matching any tag, and '.'
+    meaning the walked element itself. The value is the attribute of the element if attribute is set,
+    else its text ('' for an empty element, as with findtext), or the element itself if element is
+    True. default is used when no element matches, or the element lacks the attribute: '' unless set,
+    where findtext(path) returns None. transform, if set, is applied to the value. With many=True the
+    field is the list of the values of all the matching elements, in the order of findall.
+    """
+
+    def __init__(self, path, attribute=None, default="", transform=None, many=False, element=False):
+        self.path = path
+        self.attribute = attribute
+        self.default = default
+        self.transform = transform
+        self.many = many
+        self.element = element
+        self.tag = path.rsplit('/', 1)[-1]
+        self.pattern = compile_path(path)
+        # ElementPath orders the matches of a child step after a descendant step by their ancestor first, and
+        # findall repeats the matches of any step after it once per nested ancestor
+        separators = re.findall(r'//|/', path[1:] if path.startswith('.//') else path)
+        after = separators[separators.index('//') + 1:] if '//' in separators else []
+        self.ancestor_ordered = bool(after) if many else '/' in after
+
+    def value(self, element):
+        if self.element:
+            value = element
+        elif self.attribute:
+            value = element.get(self.attribute, self.default)
+        else:
+            value = element.text or ''
+        return self.transform(value) if self.transform else value
+
+
+def compile_path(path):
+    """Compiles an ElementPath subset to a regex matching the tag paths ('\\n' + tag for each level below the
+    walked element) of the elements it selects."""
+    if path == '.':
+        return re.compile('^$')
+    if path.startswith('.//'):
+        regex, path = '(?:\n[^\n]+)*', path[3:]
+    else:
+        regex, path = '', path[2:] if path.startswith('./') else path
+
+    for index, step in enumerate(re.split(r'(//|/)', path)):
+        if index % 2:
+            regex += '(?:\n[^\n]+)*' if step == '//' else ''
+        elif not step or step in ('.', '..') or '[' in step or '@' in step:
+            raise ValueError(f"Unsupported path: {path}")
+        else:
+            regex += '\n' + ('[^\n]+' if step == ANY_TAG else re.escape(step))
+    return re.compile('^' + regex + '$')
+
+
+class FieldSpec:
+    """Fills a dict of fields from one depth-first walk of an element, stopping once every field is found.
+
+    fields maps output names to Field objects, or to bare paths for the text of the first match. The
+    paths are compiled once, so a spec should be built at module level and reused for every document.
+    The walk meets the matches in document order, while ElementPath orders those of a child step after a
+    descendant step (e.g. './/A/B') by their ancestor first; when a match lies below nested elements of
+    the same tag, such a field is read again with find or findall, so that it is the value they give.
+    """
+
+    def __init__(self, fields):
+        self.fields = {name: field if isinstance(field, Field) else Field(field) for name, field in fields.items()}
+        self._by_tag = {}
+        for name, field in self.fields.items():
+            self._by_tag.setdefault(field.tag, []).append((name, field))
+        self._any_tag = self._by_tag.pop(ANY_TAG, [])
+        self._single_count = sum(not field.many for field in self.fields.values())
+        self._has_many = self._single_count < len(self.fields)
+
+    def extract(self, root):
+        """Returns the fields of the tree under root, in the order of the spec."""
+        found = {name: [] for name, field in self.fields.items() if field.many}
+        remaining = self._single_count
+
+        if '.' in self._by_tag:
+            for name, field in self._by_tag['.']:
+                remaining = self._match(name, field, root, found, remaining)
+
+        reread = set()  # Fields matched below nested elements of the same tag, read again with ElementPath
+        stack = [(child, '\n' + child.tag) for child in reversed(root) if isinstance(child.tag, str)]
+        while stack and (remaining or self._has_many):
+            element, tag_path = stack.pop()
+            for name, field in self._by_tag.get(element.tag, []) + self._any_tag:
+                if (field.many or name not in found) and field.pattern.match(tag_path):
+                    remaining = self._match(name, field, element, found, remaining)
+                    if field.ancestor_ordered and name not in reread:
+                        tags = tag_path.split('\n')
+                        if ANY_TAG in field.path or len(set(tags)) < len(tags):
+                            reread.add(name)
+            stack.extend((child, tag_path + '\n' + child.tag) for child in reversed(element) if isinstance(child.tag, str))
+
+        for name in reread:
+            field = self.fields[name]
+            if field.many:
+                found[name] = [field.value(element) for element in root.findall(field.path)]
+            else:
+                found[name] = field.value(root.find(field.path))
+        return {name: found[name] if name in found else field.default for name, field in self.fields.items()}
+
+    @staticmethod
+    def _match(name, field, element, found, remaining):
+        if field.many:
+            found[name].append(field.value(element))
+            return remaining
+        found[name] = field.value(element)
+        return remaining - 1
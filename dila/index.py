@@ -0,0 +1,33 @@
+"""Basename index of extracted files or archive members, replacing a directory walk per record."""
+import os
+
+
+class FileIndex:
+    """Maps file basenames to their paths, with a case-insensitive fallback."""
+
+    def __init__(self, paths=()):
+        self._exact = {}
+        self._folded = {}
+        for path in paths:
+            self.add(path)
+
+    def add(self, path):
+        """Indexes a path under its basename; the first path seen for a name wins, as with a top-down walk."""
+        name = os.path.basename(path)
+        self._exact.setdefault(name, path)
+        self._folded.setdefault(name.casefold(), path)
+
+    def find(self, file_name):
+        """Returns the path of the file with this basename, matched exactly or else ignoring case, or None."""
+        if not file_name:
+            return None
+        name = os.path.basename(file_name)
+        return self._exact.get(name) or self._folded.get(name.casefold())
+
+    def __len__(self):
+        return len(self._exact)
+
+
+def build_file_index(directory):
+    """Walks directory once and returns a FileIndex of all the files it contains."""
+    return FileIndex(os.path.join(subdir, file) for subdir, _, files in os.walk(directory) for file in files)
@@ -0,0 +1,33 @@
+"""Single-parse extraction of the decisions of the jurisprudence corpora (CASS, CAPP, CONSTIT, INCA, JADE, CNIL, DOLE)."""
+from xml.sax.saxutils import escape
+from dila import parsers as ET
+from dila.fields import Field, FieldSpec
+
+CONTENTS = '_contents'
+
+
+def inner_xml(element):
+    """Returns the markup inside an element, i.e. its text and serialized children."""
+    return escape(element.text or '') + ''.join(ET.tostring(child) for child in element)
+
+
+def compile_fields(fields, text_tag='CONTENU'):
+    """Compiles the metadata fields of a corpus, mapping output keys to element paths, into a FieldSpec that
+    also collects the text_tag elements."""
+    return FieldSpec({**fields, CONTENTS: Field(f'.//{text_tag}', many=True, element=True)})
+
+
+def parse_decision(xml_content, spec, keep_markup=True):
+    """Parses one decision and returns its entry: the fields of spec (see compile_fields), then Text and Word_count.
+
+    The fields and the <CONTENU> elements are found in a single walk of the tree. Text joins the <CONTENU>
+    elements, with their inner markup unless keep_markup is False, and Word_count counts the words of their
+    text without markup, so the document is never rescanned as text. Raises ET.ParseError on malformed XML.
+    """
+    entry = spec.extract(ET.fromstring(xml_content))
+    contents = entry.pop(CONTENTS)
+
+    texts = [''.join(content.itertext()) for content in contents]
+    entry["Text"] = ' '.join(inner_xml(content) for content in contents) if keep_markup else ' '.join(texts)
+    entry["Word_count"] = sum(len(text.split()) for text in texts)
+    return entry
@@ -0,0 +1,132 @@
+"""Streaming decoder for Unix compress (.Z / LZW) data, used by many DILA .taz archives."""
+import io
+
+LZW_MAGIC = b'\x1f\x9d'
+CLEAR_CODE = 256
+INIT_BITS = 9
+
+
+class LZWError(IOError):
+    """Raised when a stream is not valid Unix compress data."""
+
+
+def iter_lzw_chunks(fileobj, chunk_size=64 * 1024):
+    """Decompresses a Unix compress stream read from fileobj, yielding blocks of decompressed bytes."""
+    header = fileobj.read(3)
+    if len(header) < 3 or header[:2] != LZW_MAGIC:
+        raise LZWError("Not a Unix compress (.Z) stream")
+    max_bits = header[2] & 0x1f
+    block_mode = header[2] & 0x80
+    if not INIT_BITS <= max_bits <= 16:
+        raise LZWError(f"Unsupported maximum code size: {max_bits} bits")
+    max_max_code = 1 << max_bits
+
+    # The table length is the next free code; code 256 is reserved for CLEAR in block mode
+    table = [bytes([i]) for i in range(256)]
+    if block_mode:
+        table.append(b'')
+    n_bits = INIT_BITS
+    max_code = (1 << n_bits) - 1
+    previous = None
+
+    buffer = b''
+    pos = 0
+    eof = False
+    output = []
+    output_size = 0
+
+    while True:
+        if len(table) > max_code:
+            n_bits += 1
+            max_code = max_max_code if n_bits == max_bits else (1 << n_bits) - 1
+
+        # Codes come in groups of 8, i.e. n_bits bytes; a width change or CLEAR skips the rest of the group
+        while len(buffer) - pos < n_bits and not eof:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+        group = buffer[pos:pos + n_bits]
+        if not group:
+            break
+        # The last group ends within a byte of its last code, so a whole byte left over means the stream was cut
+        if len(group) < n_bits and len(group) * 8 % n_bits >= 8:
+            raise LZWError("Truncated input: the stream ends within a code")
+        pos += len(group)
+        bits = int.from_bytes(group, 'little')
+        mask = (1 << n_bits) - 1
+
+        for i in range(len(group) * 8 // n_bits):
+            if i and len(table) > max_code:
+                break
+            code = (bits >> (i * n_bits)) & mask
+
+            if previous is None:
+                if code >= 256:
+                    raise LZWError(f"Invalid first code: {code}")
+                previous = table[code]
+                output.append(previous)
+                output_size += 1
+                continue
+
+            if code == CLEAR_CODE and block_mode:
+                del table[256:]
+                n_bits = INIT_BITS
+                max_code = (1 << n_bits) - 1
+                break
+
+            if code < len(table):
+                entry = table[code]
+            elif code == len(table):
+                entry = previous + previous[:1]
+            else:
+                raise LZWError(f"Corrupt input: code {code} with table size {len(table)}")
+
+            output.append(entry)
+            output_size += len(entry)
+            if len(table) < max_max_code:
+                table.append(previous + entry[:1])
+            previous = entry
+
+        if output_size >= chunk_size:
+            yield b''.join(output)
+            output = []
+            output_size = 0
+
+    if output:
+        yield b''.join(output)
+
+
+class LZWFile(io.RawIOBase):
+    """Read-only file object decompressing a Unix compress stream on the fly."""
+
+    def __init__(self, filename=None, fileobj=None):
+        self._owns_fileobj = fileobj is None
+        self._fileobj = open(filename, 'rb') if fileobj is None else fileobj
+        self._chunks = iter_lzw_chunks(self._fileobj)
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(b), len(self._pending))
+        b[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed and self._owns_fileobj:
+            self._fileobj.close()
+        super().close()
+
+
+def open_lzw(filename=None, fileobj=None):
+    """Opens a Unix compress (.Z) file as a buffered binary stream of its decompressed content."""
+    return io.BufferedReader(LZWFile(filename, fileobj))
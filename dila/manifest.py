@@ -0,0 +1,79 @@
+"""SQLite manifest of the archives already parsed, so that reruns only process new or changed archives."""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Records, for each archive path, its size, mtime and SHA-256 along with the outputs produced from it.
+
+    An archive is current when its size and mtime are unchanged and all its outputs still exist. When only
+    the mtime changed (e.g. the file was downloaded again), the content hash decides, so identical archives
+    are not parsed twice. Only the parent process should write to the manifest.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS archives ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, sha256 TEXT, outputs TEXT, processed_at REAL)"
+        )
+        self._connection.commit()
+
+    def is_current(self, archive_path):
+        """Returns True if archive_path was already processed and neither it nor its outputs changed since."""
+        row = self._connection.execute(
+            "SELECT size, mtime, sha256, outputs FROM archives WHERE path = ?", (os.path.abspath(archive_path),)
+        ).fetchone()
+        if row is None:
+            return False
+        size, mtime, sha256, outputs = row
+        if not all(os.path.exists(output) for output in json.loads(outputs)):
+            return False
+
+        stat = os.stat(archive_path)
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime == mtime:
+            return True
+        if file_sha256(archive_path) != sha256:
+            return False
+        # Same content under a new mtime: remember it so the next run does not hash it again
+        with self._connection:
+            self._connection.execute("UPDATE archives SET mtime = ? WHERE path = ?", (stat.st_mtime, os.path.abspath(archive_path)))
+        return True
+
+    def pending(self, archive_paths):
+        """Returns the archive paths that are new or changed since they were last processed."""
+        return [archive_path for archive_path in archive_paths if not self.is_current(archive_path)]
+
+    def record(self, archive_path, outputs):
+        """Saves archive_path as processed into the outputs paths; committed at once so an interrupted run keeps it."""
+        stat = os.stat(archive_path)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO archives (path, size, mtime, sha256, outputs, processed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(archive_path), stat.st_size, stat.st_mtime, file_sha256(archive_path),
+                 json.dumps([os.path.abspath(output) for output in outputs]), time.time()),
+            )
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
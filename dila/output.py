@@ -0,0 +1,275 @@
+"""Streaming record writers: each record is written as soon as it is parsed, and the file is published by atomic rename."""
+import os
+import gzip
+import json
+from datetime import date, datetime
+
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+# Row groups are closed at whichever limit is reached first; 128 MB is the usual target for analytics scans
+ROW_GROUP_SIZE = 122880
+ROW_GROUP_BYTES = 128 * 1024 * 1024
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%Y%m%d')
+
+
+class JsonLinesWriter:
+    """Writes records as compact JSON, one per line, optionally gzip or zstd compressed.
+
+    Records go to a temporary file next to path, which is renamed to path when the writer is closed
+    without error, so readers never see a partial file. Used as a context manager, an exception
+    discards the temporary file instead.
+    """
+
+    def __init__(self, path, compression=None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp-{os.getpid()}"
+        self._raw = open(self._tmp_path, 'wb')
+        if compression == 'gzip':
+            self._file = gzip.GzipFile(filename='', mode='wb', fileobj=self._raw)
+        elif compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                self._raw.close()
+                os.remove(self._tmp_path)
+                raise ImportError("zstd compression requires the 'zstandard' package")
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._file = self._raw
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self._file.write(b'\n')
+        self.count += 1
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self, commit=True):
+        """Closes the file and publishes it under its final path, or deletes it if commit is False."""
+        if self._raw.closed:
+            return
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.close()
+        if commit:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
+
+
+def to_date(value):
+    """Converts a date string in one of DATE_FORMATS (an ISO timestamp is cut to its date) to a date, or None."""
+    if value is None or isinstance(value, date):
+        return value
+    value = str(value).strip()[:10]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    return None
+
+
+def to_int(value):
+    """Converts a number or a numeric string to an int, or None."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_string_list(value):
+    """Converts a list of values to a list of strings; a single string becomes a one-item list."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value if item is not None]
+
+
+def to_json(value):
+    """Serializes a nested value as a compact JSON string."""
+    return None if value is None else json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def to_float(value):
+    """Converts a number or a numeric string to a float, or None."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_string(value):
+    """Converts a value to a string, keeping None as a null."""
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+# Converters from parsed values to the Python values of each column type, None being a null
+CONVERTERS = {
+    'string': to_string,
+    'dictionary': to_string,
+    'date': to_date,
+    'int32': to_int,
+    'int64': to_int,
+    'float64': to_float,
+    'bool': lambda value: None if value is None else bool(value),
+    'list<string>': to_string_list,
+    'json': to_json,
+}
+
+
+def infer_column_type(values):
+    """Returns the column type of a column missing from the schema, from its first non-null value."""
+    value = next((value for value in values if value is not None), None)
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int64'
+    if isinstance(value, float):
+        return 'float64'
+    if isinstance(value, (list, tuple)):
+        return 'list<string>' if all(isinstance(item, str) for item in value) else 'json'
+    if isinstance(value, dict):
+        return 'json'
+    return 'string'
+
+
+def _arrow_type(pa, column_type):
+    return {
+        'string': pa.string(),
+        'dictionary': pa.dictionary(pa.int32(), pa.string()),
+        'date': pa.date32(),
+        'int32': pa.int32(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'bool': pa.bool_(),
+        'list<string>': pa.list_(pa.string()),
+        'json': pa.string(),
+    }[column_type]
+
+
+class ParquetWriter:
+    """Writes records as rows of a Parquet file, converting their values to the column types of schema.
+
+    schema maps column names to type names: 'string', 'dictionary' (dictionary-encoded strings, for
+    low-cardinality fields), 'date' (date32), 'int32', 'int64', 'float64', 'bool', 'list<string>'
+    or 'json' (nested values serialized as JSON strings). Keys missing from schema are typed from the
+    first row group, and keys first seen after it are dropped with a warning. Records are buffered
+    until a row group is full, then written as one Arrow record batch. Like JsonLinesWriter, the file
+    is written under a temporary name and renamed when closed without error.
+    """
+
+    def __init__(self, path, schema=None, compression=None, row_group_size=ROW_GROUP_SIZE, row_group_bytes=ROW_GROUP_BYTES):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression}")
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires the 'pyarrow' package")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp-{os.getpid()}"
+        self._compression = compression or 'snappy'
+        self._columns = dict(schema or {})
+        self._row_group_size = row_group_size
+        self._row_group_bytes = row_group_bytes
+        self._rows = []
+        self._rows_bytes = 0
+        self._writer = None  # Opened with the first row group, once the columns missing from schema are typed
+        self._dropped = set()
+        self._closed = False
+
+    def write(self, record):
+        self._rows.append(record)
+        self._rows_bytes += sum(len(value) for value in record.values() if isinstance(value, str))
+        self.count += 1
+        if len(self._rows) >= self._row_group_size or self._rows_bytes >= self._row_group_bytes:
+            self._write_row_group()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def _open(self):
+        for row in self._rows:
+            for key in row:
+                if key not in self._columns:
+                    self._columns[key] = infer_column_type(row.get(key) for row in self._rows)
+        self._schema = self._pa.schema([(name, _arrow_type(self._pa, column_type)) for name, column_type in self._columns.items()])
+        self._writer = self._pq.ParquetWriter(self._tmp_path, self._schema, compression=self._compression)
+
+    def _write_row_group(self):
+        if self._writer is None:
+            self._open()
+        for row in self._rows:
+            for key in row.keys() - self._columns.keys() - self._dropped:
+                print(f"\033[93mDropping column {key} missing from the schema of {self.path}\033[0m")
+                self._dropped.add(key)
+
+        arrays = []
+        for name, column_type in self._columns.items():
+            convert = CONVERTERS[column_type]
+            values = [convert(row.get(name)) for row in self._rows]
+            if column_type == 'dictionary':
+                arrays.append(self._pa.array(values, type=self._pa.string()).dictionary_encode())
+            else:
+                arrays.append(self._pa.array(values, type=_arrow_type(self._pa, column_type)))
+        batch = self._pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        self._writer.write_table(self._pa.Table.from_batches([batch]), row_group_size=max(len(self._rows), 1))
+        self._rows = []
+        self._rows_bytes = 0
+
+    def close(self, commit=True):
+        """Writes the last row group and publishes the file under its final path, or deletes it if commit is False."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if commit and (self._rows or self._writer is None):
+                self._write_row_group()
+        except Exception:
+            commit = False
+            raise
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            if not commit and os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+        if commit:
+            os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(commit=exc_type is None)
+
+
+def open_output(base_path, compression=None, output_format='jsonl', schema=None):
+    """Opens a writer for base_path plus the extension of the output format and the suffix of the compression.
+
+    For Parquet files the compression is the codec of the column chunks (snappy when None), and schema
+    gives the column types.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if output_format == 'parquet':
+        return ParquetWriter(base_path + '.parquet', schema, compression)
+    return JsonLinesWriter(base_path + '.jsonl' + COMPRESSION_SUFFIXES.get(compression, ''), compression)
@@ -0,0 +1,91 @@
+"""Process-pool drivers fanning the archives of a corpus, or the members of one archive, out to several cores."""
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+
+def run_parallel(func, items, workers=None, max_in_flight=None):
+    """Calls func(item) for each item in a pool of worker processes and yields (item, result) pairs as they complete.
+
+    Workers are expected to save their own output shard and return something small (e.g. its path), so the
+    parent only merges. At most max_in_flight items (twice the worker count by default) are submitted at once,
+    which bounds the memory held by pending tasks and results. With workers=1 items run in the current process.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or 2 * workers, workers)
+
+    if workers == 1:
+        for item in items:
+            try:
+                yield item, func(item)
+            except Exception as e:
+                print(f"\033[91mFailed to process {item}: {e}\033[0m")
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        items = iter(items)
+        while True:
+            for item in items:
+                pending[executor.submit(func, item)] = item
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result()
+                except Exception as e:
+                    print(f"\033[91mFailed to process {item}: {e}\033[0m")
+
+
+def _read_batches(items, batch_size, batches, errors):
+    """Groups items into lists of batch_size and puts them on the batches queue, followed by None."""
+    try:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                batches.put(batch)
+                batch = []
+        if batch:
+            batches.put(batch)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        batches.put(None)
+
+
+def run_pipeline(func, items, workers=None, batch_size=1000, max_in_flight=None):
+    """Calls func(batch) on batches of items in a pool of worker processes and yields the results in input order.
+
+    A reader thread consumes items (e.g. the members streamed out of one large tar archive) and groups them
+    into batches while the pool parses earlier ones. At most max_in_flight batches (twice the worker count
+    by default) are queued and as many are being parsed, which bounds memory. func must be a module-level
+    function so that it can be sent to the workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+
+    batches = queue.Queue(maxsize=max_in_flight)
+    errors = []
+    reader = threading.Thread(target=_read_batches, args=(items, batch_size, batches, errors), daemon=True)
+    reader.start()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for batch in iter(batches.get, None):
+            in_flight.append(executor.submit(func, batch))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    reader.join()
+    if errors:
+        raise errors[0]
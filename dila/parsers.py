@@ -0,0 +1,144 @@
+"""XML parsing through lxml when it is installed, with reusable recovering parsers, else through ElementTree.
+
+Scripts import this module as ET, like JORF_KALI_LEGI_parsing.py imports lxml.etree, and call fromstring,
+parse, iterparse and tostring as before. With lxml, parsers recover from malformed markup instead of dropping
+the whole file, accept huge text nodes and deep trees, and drop comments and processing instructions as
+ElementTree does. ParseError catches the errors of both libraries.
+
+The parsing functions take use_lxml to choose the library for one call, e.g. for a corpus that ElementTree
+parses faster; None follows USE_LXML.
+"""
+import re
+import codecs
+import threading
+import xml.etree.ElementTree as ElementTree
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+HAS_LXML = etree is not None
+USE_LXML = HAS_LXML  # Set to False to parse with ElementTree even when lxml is installed
+
+ParseError = (ElementTree.ParseError, etree.XMLSyntaxError) if HAS_LXML else ElementTree.ParseError
+
+# Options of the lxml parsers; remove_blank_text is off, as it also drops the spaces between inline elements
+# such as <b>M.</b> <i>Dupont</i> in mixed content
+PARSER_OPTIONS = dict(recover=True, huge_tree=True, remove_blank_text=False, remove_comments=True, remove_pis=True)
+
+# lxml parsers are reused for every document, but must not be shared between threads
+_local = threading.local()
+
+# The DOCTYPE is looked for in the first bytes only, up to its internal subset or its end
+HEAD_SIZE = 1024
+DOCTYPE = re.compile(rb'<!DOCTYPE\s+[^\s\[>]+(?:\s+(?:SYSTEM|PUBLIC)(?:\s+(?:"[^"]*"|\'[^\']*\'))+)?\s*([\[>])')
+
+
+def _checked_root(root):
+    if root is None:
+        # In recover mode, lxml returns no root when nothing could be recovered, e.g. from a binary file
+        raise ElementTree.ParseError("no element found")
+    return root
+
+
+def lxml_enabled(use_lxml=None):
+    """Returns whether a call parses with lxml: use_lxml if set, else USE_LXML."""
+    if use_lxml is None:
+        return USE_LXML
+    if use_lxml and not HAS_LXML:
+        raise ImportError("use_lxml=True requires the 'lxml' package")
+    return use_lxml
+
+
+def get_parser(encoding=None, use_lxml=None, **options):
+    """Returns the parser of this thread for an encoding (None to use the declared one) and PARSER_OPTIONS overrides.
+
+    Without lxml, a new ElementTree XMLParser is returned, as those cannot be reused.
+    """
+    if not lxml_enabled(use_lxml):
+        return ElementTree.XMLParser(encoding=encoding)
+    key = (encoding, tuple(sorted(options.items())))
+    parsers = _local.__dict__.setdefault('parsers', {})
+    if key not in parsers:
+        parsers[key] = etree.XMLParser(encoding=encoding, **{**PARSER_OPTIONS, **options})
+    return parsers[key]
+
+
+def fromstring(text, encoding=None, use_lxml=None):
+    """Parses a document from bytes or a string and returns its root element."""
+    use_lxml = lxml_enabled(use_lxml)
+    if use_lxml and isinstance(text, str):
+        # lxml refuses strings that carry an encoding declaration: parse their UTF-8 bytes instead
+        text, encoding = text.encode('utf-8'), 'utf-8'
+    if not use_lxml:
+        return ElementTree.fromstring(text, parser=get_parser(encoding, use_lxml))
+    return _checked_root(etree.fromstring(text, parser=get_parser(encoding, use_lxml)))
+
+
+def parse(source, encoding=None, use_lxml=None):
+    """Parses a document from a file name or a binary file object and returns its ElementTree."""
+    use_lxml = lxml_enabled(use_lxml)
+    if not use_lxml:
+        return ElementTree.parse(source, parser=get_parser(encoding, use_lxml))
+    tree = etree.parse(source, parser=get_parser(encoding, use_lxml))
+    _checked_root(tree.getroot())
+    return tree
+
+
+def declare_entities(data, entities):
+    """Returns the bytes of an ASCII-compatible document with entities declared in the internal subset of its DOCTYPE.
+
+    entities maps names to their text. A document without DOCTYPE gets one after its XML declaration, or
+    after its BOM, if any.
+    """
+    declarations = ''.join(
+        f'<!ENTITY {name} "{"".join(f"&#{ord(char)};" for char in value)}">' for name, value in entities.items()
+    ).encode('ascii')
+    head = data[:HEAD_SIZE]
+    match = DOCTYPE.search(head)
+    if match and match.group(1) == b'[':
+        return data[:match.end()] + declarations + data[match.end():]
+    if match:
+        return data[:match.start(1)] + b' [' + declarations + b']' + data[match.start(1):]
+    if head.lstrip(codecs.BOM_UTF8).startswith(b'<?xml'):
+        position = data.find(b'?>') + 2
+    else:
+        position = len(codecs.BOM_UTF8) if data.startswith(codecs.BOM_UTF8) else 0
+    return data[:position] + b'<!DOCTYPE document [' + declarations + b']>' + data[position:]
+
+
+def feed(chunks, encoding=None, entities=None, use_lxml=None):
+    """Parses a document given as a sequence of bytes chunks and returns its root element.
+
+    entities maps the names of entities the document uses without declaring them (e.g. the HTML 'deg') to
+    their text. They are declared in its internal subset, see declare_entities, as lxml does not read
+    external DTDs; ElementTree also resolves them in UTF-16 and UTF-32 documents, which are left as is.
+    """
+    use_lxml = lxml_enabled(use_lxml)
+    parser = get_parser(encoding, use_lxml)
+    if entities:
+        if not (encoding or '').lower().startswith(('utf-16', 'utf-32')):
+            chunks = [declare_entities(b''.join(chunks), entities)]
+        if not use_lxml:
+            parser.entity.update(entities)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return _checked_root(parser.close())
+
+
+def iterparse(source, events=('end',), encoding=None, tag=None, use_lxml=None):
+    """Yields (event, element) pairs while parsing a file name or a binary file object.
+
+    With lxml, tag (a tag or a sequence of tags) restricts the events to those elements without leaving C;
+    ElementTree ignores it.
+    """
+    if not lxml_enabled(use_lxml):
+        return ElementTree.iterparse(source, events=events, parser=get_parser(encoding, False))
+    # lxml iterparse builds its own parser from the options
+    return etree.iterparse(source, events=events, encoding=encoding, tag=tag, **PARSER_OPTIONS)
+
+
+def tostring(element, encoding='unicode'):
+    """Serializes an element and its tail, as a string by default, with the library that parsed it."""
+    return (etree if HAS_LXML and etree.iselement(element) else ElementTree).tostring(element, encoding=encoding)
@@ -0,0 +1,274 @@
+"""PDF text extraction in a pool of worker processes, with a hard timeout and memory cap per document."""
+import os
+import json
+import time
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+from dila.cache import content_digest
+from dila.extractors import get_backend
+
+try:
+    import resource
+except ImportError:
+    resource = None  # No address space limit outside Unix
+
+PDF_TIMEOUT = 120  # Seconds a worker may spend on one document, or one page range, before it is killed
+PDF_MEMORY_LIMIT = 2 * 1024 ** 3  # Bytes of address space of each worker
+PDF_SPLIT_PAGES = 200  # Pages of the ranges a large PDF is split into
+
+
+def _iter_pages(document, start, stop, max_chars):
+    chars = 0
+    for text in document.iter_pages(start, len(document) if stop is None else min(stop, len(document))):
+        yield text
+        chars += len(text)
+        if max_chars is not None and chars >= max_chars:
+            return
+
+
+def iter_pdf_pages(source, start=0, stop=None, max_chars=None, backend=None):
+    """Yields the text of the pages of a PDF given as a path or as its bytes, reading the pages one at a time.
+
+    Only the pages from start to stop (excluded) are read, all by default. With max_chars, reading stops after
+    the page that brings the text read to max_chars. Pages can be written straight to an output file, e.g.
+    with writelines, without building the whole text. backend names the engine (see dila.extractors), the
+    fastest one installed by default.
+    """
+    with get_backend('.pdf', backend).open(source) as document:
+        yield from _iter_pages(document, start, stop, max_chars)
+
+
+def join_pages(pages, page_end=''):
+    """Joins page texts, each followed by page_end, and returns the text with the [start, end] offsets of each page."""
+    parts = []
+    offsets = []
+    position = 0
+    for page in pages:
+        offsets.append([position, position + len(page)])
+        parts.append(page)
+        parts.append(page_end)
+        position += len(page) + len(page_end)
+    return ''.join(parts), offsets
+
+
+def extract_pdf_text(source, page_end='', backend=None):
+    """Returns the text of a PDF given as a path or as its bytes, each page followed by page_end, joined once."""
+    return join_pages(iter_pdf_pages(source, backend=backend), page_end)[0]
+
+
+def _work(connection, memory_limit, max_chars, backend):
+    """Worker loop: receives (task_id, source, start, stop) page ranges and sends back (task_id, pages, page count,
+    error) until None."""
+    if resource is not None and memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    backend = get_backend('.pdf', backend)
+    for task_id, source, start, stop in iter(connection.recv, None):
+        try:
+            with backend.open(source) as document:
+                pages = list(_iter_pages(document, start, stop, max_chars))
+                connection.send((task_id, pages, len(document), None))
+        except MemoryError:
+            connection.send((task_id, [], 0, f"memory limit of {memory_limit // 1024 ** 2} MB exceeded"))
+        except Exception as e:
+            connection.send((task_id, [], 0, f"{type(e).__name__}: {e}"))
+
+
+class PdfPool:
+    """Extracts the text of PDFs in worker processes while the caller keeps parsing the XML metadata.
+
+    submit queues a document under a key (any object, it stays in this process) and returns at once unless
+    max_pending page ranges are already waiting. results yields the (key, text, pages, error) tuples of the
+    documents finished so far and drain waits for all of them: text joins the pages, each followed by
+    page_end, pages holds the [start, end] offsets of each page in text, and error is None on success.
+
+    With split_pages and several workers, a document is first read up to that page; when it has more, its
+    next ranges of split_pages pages are queued ahead of the other documents, so that idle workers share it,
+    and the ranges are reassembled in order. Each range reads the page tree again, which is worth it for
+    long documents only. max_pages and max_chars stop the extraction of a document after that many pages,
+    or after the page reaching that many characters. backend names the engine of the workers (see
+    dila.extractors), the fastest one installed by default.
+
+    A worker running past timeout seconds on a document, or on one of its ranges, is killed, as is one
+    exceeding memory_limit bytes that the PDF library cannot recover from, and replaced by a fresh one: the
+    document gets an error and the others go on. With a TextCache, documents whose bytes were already
+    extracted are answered from it without reaching a worker, and the page texts extracted are stored into it.
+    """
+
+    def __init__(self, workers=None, timeout=PDF_TIMEOUT, memory_limit=PDF_MEMORY_LIMIT, max_pending=None, page_end='',
+                 cache=None, split_pages=None, max_pages=None, max_chars=None, backend=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_pending = max_pending or 4 * self.workers
+        self.page_end = page_end
+        self.cache = cache
+        self.split_pages = split_pages if self.workers > 1 else None  # A single worker would only read the page tree again
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.backend = get_backend('.pdf', backend)
+        # Texts cut by a budget are cached apart from the complete ones
+        budget = f" max_pages={max_pages} max_chars={max_chars}" if max_pages or max_chars else ''
+        self.extractor = f"pdf pages{budget} {self.backend.key()}"
+        self._queue = deque()  # (task_id, source, start, stop) page ranges not yet sent to a worker
+        self._tasks = {}  # task_id -> (document, start, stop) of the page ranges not yet finished
+        self._done = deque()  # (key, text, pages, error) tuples not yet yielded
+        self._next_id = 0
+        self._slots = [self._start() for _ in range(self.workers)]
+
+    def _start(self):
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_work, args=(child, self.memory_limit, self.max_chars, self.backend.name), daemon=True)
+        process.start()
+        child.close()
+        # The page range being extracted by the worker and its deadline
+        return {'process': process, 'connection': parent, 'task': None, 'deadline': None}
+
+    def _queue_range(self, document, start, stop, first=False):
+        self._tasks[self._next_id] = (document, start, stop)
+        task = (self._next_id, document['source'], start, stop)
+        if first:
+            self._queue.appendleft(task)
+        else:
+            self._queue.append(task)
+        document['pending'] += 1
+        self._next_id += 1
+
+    def _finish_range(self, task_id, pages, page_count, error):
+        """Stores the pages of a range, queues the next ranges once the first one gave the page count, and
+        completes the document after its last range."""
+        document, start, stop = self._tasks.pop(task_id)
+        document['pending'] -= 1
+        if error is not None:
+            if document['error'] is None:
+                document['error'] = error
+                # The other ranges of the document are not worth extracting any more
+                for task in [task for task in self._queue if self._tasks[task[0]][0] is document]:
+                    self._queue.remove(task)
+                    del self._tasks[task[0]]
+                    document['pending'] -= 1
+        elif document['error'] is None:
+            document['parts'][start] = pages
+            limit = page_count if self.max_pages is None else min(page_count, self.max_pages)
+            budget_left = self.max_chars is None or sum(map(len, pages)) < self.max_chars
+            if start == 0 and stop is not None and stop < limit and budget_left:
+                for range_start in reversed(range(stop, limit, self.split_pages)):
+                    self._queue_range(document, range_start, min(range_start + self.split_pages, limit), first=True)
+        if document['pending'] == 0:
+            self._complete(document)
+
+    def _complete(self, document):
+        if document['error'] is not None:
+            self._done.append((document['key'], '', [], document['error']))
+            return
+        pages = []
+        chars = 0
+        for start in sorted(document['parts']):
+            for page in document['parts'][start]:
+                if self.max_chars is not None and chars >= self.max_chars:
+                    break
+                pages.append(page)
+                chars += len(page)
+        if document['digest'] is not None:
+            # Pages are cached on their own, whatever the page_end of the scripts reading them
+            self.cache.put(document['digest'], self.extractor, json.dumps(pages, ensure_ascii=False))
+        self._done.append((document['key'], *join_pages(pages, self.page_end), None))
+
+    def _replace(self, slot, error):
+        document, start, stop = self._tasks[slot['task']]
+        if stop is not None and self.split_pages:
+            error += f" on pages {start + 1}-{stop}"
+        slot['process'].kill()
+        slot['process'].join()
+        slot['connection'].close()
+        self._finish_range(slot['task'], [], 0, error)
+        self._slots[self._slots.index(slot)] = self._start()
+
+    def _dispatch(self):
+        for slot in self._slots:
+            if not self._queue:
+                return
+            if slot['task'] is None:
+                task = self._queue.popleft()
+                slot['task'], slot['deadline'] = task[0], time.monotonic() + self.timeout
+                try:
+                    slot['connection'].send(task)
+                except OSError:
+                    # The worker died while receiving the document, e.g. out of memory
+                    slot['process'].join()
+                    self._replace(slot, f"worker killed (exit code {slot['process'].exitcode})")
+
+    def _poll(self, block):
+        """Sends queued ranges to idle workers and collects the finished ones, waiting for one if block."""
+        self._dispatch()
+        busy = [slot for slot in self._slots if slot['task'] is not None]
+        if not busy:
+            return
+        wait_time = max(min(slot['deadline'] for slot in busy) - time.monotonic(), 0) if block else 0
+        ready = wait([slot['connection'] for slot in busy], wait_time)
+        for slot in busy:
+            if slot['connection'] in ready:
+                try:
+                    task_id, pages, page_count, error = slot['connection'].recv()
+                except (EOFError, OSError):
+                    # The worker died, e.g. killed by the kernel when out of memory or crashed in native code
+                    slot['process'].join()
+                    self._replace(slot, f"worker killed (exit code {slot['process'].exitcode})")
+                    continue
+                slot['task'] = slot['deadline'] = None
+                self._finish_range(task_id, pages, page_count, error)
+            elif time.monotonic() >= slot['deadline']:
+                self._replace(slot, f"timed out after {self.timeout} s")
+        self._dispatch()
+
+    def submit(self, key, source):
+        """Queues the PDF at path source, or with bytes source as content, for extraction under key."""
+        digest = None
+        if self.cache is not None:
+            if not isinstance(source, bytes):
+                with open(source, 'rb') as f:
+                    source = f.read()
+            digest = content_digest(source)
+            pages = self.cache.get(digest, self.extractor)
+            if pages is not None:
+                self._done.append((key, *join_pages(json.loads(pages), self.page_end), None))
+                return
+        document = {'key': key, 'source': source, 'digest': digest, 'parts': {}, 'pending': 0, 'error': None}
+        first_stop = self.split_pages if self.max_pages is None else min(self.split_pages or self.max_pages, self.max_pages)
+        self._queue_range(document, 0, first_stop)
+        self._poll(block=False)
+        while len(self._queue) > self.max_pending:
+            self._poll(block=True)
+
+    def results(self):
+        """Yields the (key, text, pages, error) tuples of the documents finished so far, without waiting."""
+        self._poll(block=False)
+        while self._done:
+            yield self._done.popleft()
+
+    def drain(self):
+        """Yields the (key, text, pages, error) tuples of all the submitted documents, waiting for them to finish."""
+        while self._tasks or self._done:
+            while self._done:
+                yield self._done.popleft()
+            if self._tasks:
+                self._poll(block=True)
+
+    def close(self):
+        for slot in self._slots:
+            if slot['task'] is None:
+                try:
+                    slot['connection'].send(None)
+                except OSError:
+                    pass
+            else:
+                slot['process'].kill()
+            slot['process'].join()
+            slot['connection'].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
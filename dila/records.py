@@ -0,0 +1,42 @@
+"""Streaming of the records of multi-record XML files (bulletins of announcements), one record at a time."""
+from dila import parsers as ET
+
+
+def iter_records(source, tags, encoding=None, use_lxml=None):
+    """Yields (root, record) pairs for each element of source whose tag is in tags, as soon as its end tag is parsed.
+
+    source is a file name or a binary file object, decoded with encoding if set, else with its declared one.
+    Each record is complete when yielded, and is detached from its parent once the consumer moves on, so
+    memory stays flat whatever the number of records in the file. root is the document element: its
+    attributes, and its children preceding the current record (e.g. a <dateParution> header), are available.
+    use_lxml chooses the library, see ET.lxml_enabled. Raises ET.ParseError on malformed XML.
+    """
+    if isinstance(tags, str):
+        tags = (tags,)
+    tags = frozenset(tags)
+
+    if ET.lxml_enabled(use_lxml):
+        # lxml only reports the end of the records, and knows their parent and root
+        for _, element in ET.iterparse(source, events=('end',), encoding=encoding, tag=tags, use_lxml=True):
+            yield element.getroottree().getroot(), element
+            parent = element.getparent()
+            if parent is not None:
+                parent.remove(element)
+            element.clear()
+        return
+
+    root = None
+    parents = []
+    for event, element in ET.iterparse(source, events=('start', 'end'), encoding=encoding, use_lxml=False):
+        if event == 'start':
+            if root is None:
+                root = element
+            parents.append(element)
+            continue
+
+        parents.pop()
+        if element.tag in tags:
+            yield root, element
+            if parents:
+                parents[-1].remove(element)
+            element.clear()
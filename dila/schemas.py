@@ -0,0 +1,199 @@
+"""Column types of the Parquet output of each corpus, see dila.output.ParquetWriter for the type names."""
+
+JURISPRUDENCE = {
+    "ID": "string",
+    "Nature": "dictionary",
+    "Titre": "string",
+    "Date": "date",
+    "Juridiction": "dictionary",
+    "Solution": "dictionary",
+    "Num_Affaire": "string",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+INCA = {
+    **JURISPRUDENCE,
+    "Cour": "dictionary",
+    "President": "string",
+    "Avocats": "string",
+}
+
+JADE = {
+    **JURISPRUDENCE,
+    "Formation": "dictionary",
+    "Type_Rec": "dictionary",
+    "Publi_Recueil": "dictionary",
+    "President": "string",
+    "Avocats": "string",
+    "Rapporteur": "string",
+    "Commissaire_Gvt": "string",
+}
+
+CNIL = {
+    "ID": "string",
+    "Nature": "dictionary",
+    "Titre": "string",
+    "Numero": "string",
+    "Date_Text": "date",
+    "Date_Publi": "date",
+    "Etat_Juridique": "dictionary",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+DOLE = {
+    "ID": "string",
+    "Titre": "string",
+    "Date_creation": "date",
+    "Date_derniere_modification": "date",
+    "Date_debut": "date",
+    "Date_fin": "date",
+    "Libelle": "string",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+ACCO = {
+    "ID": "string",
+    "Date_effet": "date",
+    "Date_fin": "date",
+    "SIRET": "string",
+    "Raison_sociale": "string",
+    "Themes": "json",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+AMF = {
+    "ID_Diffuseur": "string",
+    "ID_Societe_country": "dictionary",
+    "ID_Societe_name": "string",
+    "ID_societe": "string",
+    "InformationDeposee": "string",
+    "Title": "string",
+    "Text": "string",
+    "Word_count": "int32",
+    "Pages": "json",
+    "PDF_file_name": "string",
+    "PDF_folder_path": "string",
+    "XML_file_name": "string",
+}
+
+BOCC = {
+    "ID": "string",
+    "Texte_Nature": "dictionary",
+    "Date": "date",
+    "Titre": "string",
+    "Text": "string",
+    "Word_Count": "int32",
+}
+
+LEGI = {
+    "etat_value": "dictionary",
+    "date_debut_value": "date",
+    "titre": "string",
+    "article": "string",
+    "text": "string",
+    "word_count": "int32",
+}
+
+ASSOCIATIONS = {
+    "ID": "string",
+    "Date": "date",
+    "Type": "dictionary",
+    "Themes": "list<string>",
+    "Titre": "string",
+    "SiegeSocial": "string",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+BALO = {
+    "Date": "date",
+    "Societe_nom": "string",
+    "Societe_siege": "string",
+    "Numero_affaire": "string",
+    "Categorie": "dictionary",
+    "Categorie_1": "dictionary",
+    "Categorie_2": "dictionary",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+BOAMP = {
+    "ID": "string",
+    "Acheteur": "string",
+    "Acheteur_detail": "string",
+    "Acheteur_adresse": "string",
+    "Acheteur_CP": "dictionary",
+    "Acheteur_Ville": "dictionary",
+    "Object": "string",
+    "Date": "date",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+BODACC = {
+    "id": "string",
+    "tribunal": "dictionary",
+    "date": "date",
+    "text": "string",
+    "word_count": "int32",
+    "original_file": "string",
+}
+
+CIRCULAIRES = {
+    "Id_circulaire": "string",
+    "Etat": "dictionary",
+    "Date_signature": "date",
+    "Auteur": "dictionary",
+    "Destinataire": "string",
+    "nom_fichier_pdf": "string",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+DEBATS_AN = {
+    "Type_Publication": "dictionary",
+    "Date": "date",
+    "Numero_Parution": "string",
+    "Numero": "string",
+    "Date_Seance": "date",
+    "Num_Jour_Session": "string",
+    "Num_Seance": "string",
+    "Session_Ord": "dictionary",
+    "Annex_Amendement": "bool",
+    "Text": "string",
+    "Word_count": "int32",
+    "Chunks": "json",
+}
+
+DEBATS_AN2016 = {
+    "Type_Publication": "dictionary",
+    "Date": "date",
+    "Session_Parlementaire": "dictionary",
+    "Numero_Parution": "string",
+    "Numero": "string",
+    "Date_Seance": "date",
+    "Num_Jour_Session": "string",
+    "Num_Seance": "string",
+    "Validite": "dictionary",
+    "Annex_Amendement": "bool",
+    "Text": "string",
+    "Word_count": "int32",
+}
+
+DEBATS_SENAT = {
+    "Type_Publication": "dictionary",
+    "Date": "date",
+    "Numero_Parution": "string",
+    "NumeroGrebiche": "string",
+    "Date_Seance": "date",
+    "Num_Jour_Session": "string",
+    "Num_Seance": "string",
+    "Session_Ord": "dictionary",
+    "Text": "string",
+    "filename": "string",
+    "word_count": "int32",
+}
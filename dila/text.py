@@ -0,0 +1,150 @@
+"""Text of XML elements read directly from the tree, and the paragraphs of transcripts with their chunking."""
+import re
+
+
+def _append_text(element, parts):
+    if not isinstance(element.tag, str):
+        # Comments and processing instructions only contribute their tail
+        return
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        _append_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+    if element.text or len(element):
+        # The closing tag of an element with content ends a line; empty elements do not
+        parts.append('\n')
+
+
+def flatten_text(elements):
+    """Returns the text of a sequence of sibling elements, one newline after the end of each element with content.
+
+    This is the text of their markup joined with newlines, with closing tags turned into newlines and the
+    other tags removed, without serializing anything. The tails of the elements are kept, except the
+    trailing whitespace of the last one.
+    """
+    parts = []
+    for index, element in enumerate(elements):
+        if index:
+            parts.append('\n')
+        _append_text(element, parts)
+        if element.tail:
+            parts.append(element.tail if index < len(elements) - 1 else element.tail.rstrip())
+    return ''.join(parts)
+
+
+def iter_paragraphs(root, section_tag='Contenu', paragraph_tag='Para'):
+    """Yields (section_number, text) pairs for the paragraphs of the sections of a transcript, in document order.
+
+    The text of a paragraph joins its stripped text fragments with spaces; empty paragraphs are skipped.
+    Elements are visited with iter, so each paragraph is read once whatever the number of sections.
+    """
+    for section_number, section in enumerate(root.iter(section_tag)):
+        for paragraph in section.iter(paragraph_tag):
+            text = ' '.join(part.strip() for part in paragraph.itertext() if part.strip())
+            if text:
+                yield section_number, text
+
+
+def join_paragraphs(paragraphs):
+    """Joins (section_number, text) pairs into one text: a line per paragraph and a blank line between sections."""
+    parts = []
+    previous_section = None
+    for section_number, text in paragraphs:
+        if parts:
+            parts.append('\n\n' if section_number != previous_section else '\n')
+        parts.append(text)
+        previous_section = section_number
+    return ''.join(parts)
+
+
+# A sentence ends with its punctuation, when the next word does not start in lowercase (as after "M. le président")
+SENTENCE_END = re.compile(r'[.!?…]+(?=\s+[^\sa-zà-ÿ])')
+WORD = re.compile(r'\S+')
+CHUNK_UNITS = ('chars', 'tokens')
+
+
+def _split_paragraph(text, size, unit):
+    """Returns (start, end, tokens) spans of a paragraph: the paragraph itself if it fits in size, else its
+    sentences, and the sentences that do not fit cut between words (or within a word longer than size chars)."""
+    tokens = len(text.split())
+    if (tokens if unit == 'tokens' else len(text)) <= size:
+        return [(0, len(text), tokens)]
+
+    sentences = []
+    sentence_start = 0
+    for match in SENTENCE_END.finditer(text):
+        sentences.append((sentence_start, match.end()))
+        sentence_start = match.end()
+    sentences.append((sentence_start, len(text)))
+
+    spans = []
+    for sentence_start, sentence_end in sentences:
+        words = [(match.start(), match.end()) for match in WORD.finditer(text, sentence_start, sentence_end)]
+        if not words:
+            continue
+        if (len(words) if unit == 'tokens' else words[-1][1] - words[0][0]) <= size:
+            spans.append((words[0][0], words[-1][1], len(words)))
+            continue
+        span_start = span_end = None
+        span_tokens = 0
+        for word_start, word_end in words:
+            if span_start is not None and (span_tokens + 1 if unit == 'tokens' else word_end - span_start) > size:
+                spans.append((span_start, span_end, span_tokens))
+                span_start = None
+            if span_start is None:
+                if unit == 'chars' and word_end - word_start > size:
+                    # A word longer than a chunk is cut into slices of size chars
+                    spans.extend((start, min(start + size, word_end), 1) for start in range(word_start, word_end, size))
+                    continue
+                span_start, span_tokens = word_start, 0
+            span_end = word_end
+            span_tokens += 1
+        if span_start is not None:
+            spans.append((span_start, span_end, span_tokens))
+    return spans
+
+
+def iter_chunks(paragraphs, size=5000, unit='chars', overlap=0):
+    """Yields the (start, end) offsets of the chunks of join_paragraphs(paragraphs), from the same (section, text) pairs.
+
+    Chunks hold whole paragraphs as long as they fit in size, counted in characters or in whitespace-separated
+    tokens depending on unit. A paragraph larger than size is cut at sentence ends, and a sentence larger than
+    size between words. With overlap, each chunk starts with the last paragraphs or sentences of the previous one
+    that fit in overlap, in the same unit. Paragraphs are consumed one at a time, as they come.
+    """
+    if unit not in CHUNK_UNITS:
+        raise ValueError(f"Unsupported chunk unit: {unit}")
+    if not 0 <= overlap < size:
+        raise ValueError("The overlap must be smaller than the chunk size")
+
+    def measure(units):
+        return sum(tokens for _, _, tokens in units) if unit == 'tokens' else units[-1][1] - units[0][0]
+
+    chunk = []  # (start, end, tokens) spans of the current chunk
+    new_spans = 0  # Spans of the current chunk not already in the previous one
+    position = 0
+    previous_section = None
+    for section_number, text in paragraphs:
+        if previous_section is not None:
+            position += 2 if section_number != previous_section else 1
+        previous_section = section_number
+
+        for start, end, tokens in _split_paragraph(text, size, unit):
+            span = (position + start, position + end, tokens)
+            if new_spans and measure(chunk + [span]) > size:
+                yield chunk[0][0], chunk[-1][1]
+                # The overlap is taken from the end of the chunk, as long as the next span still fits after it
+                tail = []
+                for previous_span in reversed(chunk):
+                    if measure([previous_span] + tail + [span]) > size or measure([previous_span] + tail) > overlap:
+                        break
+                    tail.insert(0, previous_span)
+                chunk, new_spans = tail, 0
+            chunk.append(span)
+            new_spans += 1
+        position += len(text)
+
+    if new_spans:
+        yield chunk[0][0], chunk[-1][1]
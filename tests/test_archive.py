@@ -0,0 +1,132 @@
+"""Tests of dila.archive."""
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.archive import AttachmentBuffer, ArchiveFormatError, iter_archive, iter_tar_members, sniff_format
+from test_lzw import lzw_compress
+
+MEMBERS = [('d/a.xml', b'<a/>'), ('d/b.pdf', b'%PDF-1.4')]
+
+
+def make_tar(path, members, mode='w:gz'):
+    with tarfile.open(path, mode) as tar:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return str(path)
+
+
+def tar_bytes(members, format=tarfile.USTAR_FORMAT):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w', format=format) as tar:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def v7_tar_bytes(members):
+    """Tar data whose first header has no magic string, as written before POSIX, with its checksum recomputed."""
+    data = bytearray(tar_bytes(members))
+    data[257:265] = bytes(8)
+    data[148:156] = b' ' * 8
+    data[148:156] = b'%06o\x00 ' % sum(data[:512])
+    return bytes(data)
+
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('data, archive_format', [
+    (lzw_compress(b'data'), 'lzw'),
+    (gzip.compress(b'data'), 'gzip'),
+    (bz2.compress(b'data'), 'bzip2'),
+    (lzma.compress(b'data'), 'xz'),
+    (zip_bytes(MEMBERS), 'zip'),
+    (b'7z\xbc\xaf\x27\x1c' + bytes(26), '7z'),
+    (tar_bytes(MEMBERS), 'tar'),
+    (tar_bytes(MEMBERS, tarfile.GNU_FORMAT), 'tar'),
+    (v7_tar_bytes(MEMBERS), 'tar'),
+    (b'<?xml version="1.0"?><a/>', None),
+    (bytes(512), None),
+], ids=['lzw', 'gzip', 'bzip2', 'xz', 'zip', '7z', 'ustar', 'gnu', 'v7', 'xml', 'zeros'])
+def test_sniff_format(data, archive_format):
+    assert sniff_format(data[:512]) == archive_format
+
+
+@pytest.mark.parametrize('compress', [gzip.compress, bz2.compress, lzma.compress, lzw_compress], ids=['gzip', 'bzip2', 'xz', 'lzw'])
+def test_iter_archive_compressed_tar(tmp_path, compress):
+    path = tmp_path / 'archive.bin'  # The format is sniffed, whatever the extension
+    path.write_bytes(compress(tar_bytes(MEMBERS)))
+    assert list(iter_archive(str(path))) == MEMBERS
+    assert list(iter_archive(str(path), '.xml')) == MEMBERS[:1]
+
+
+def test_iter_archive_nested(tmp_path):
+    inner_taz = lzw_compress(tar_bytes([('c.xml', b'<c/>')]))
+    middle_tgz = gzip.compress(tar_bytes([('b.xml', b'<b/>'), ('inner.taz', inner_taz)]))
+    path = tmp_path / 'outer.zip'
+    path.write_bytes(zip_bytes([
+        ('a.xml', b'<a/>'),
+        ('middle.tgz', middle_tgz),
+        ('misnamed.gz', zip_bytes([('d.xml', b'<d/>')])),  # A zip archive behind a .gz extension
+        ('e.xml.gz', gzip.compress(b'<e/>')),  # A single compressed file
+        ('broken.zip', b'PK\x03\x04' + bytes(40)),
+        ('notes.tar', b'not an archive'),  # Archive extension, but no archive magic: yielded as is
+    ]))
+    assert list(iter_archive(str(path), '.xml')) == [
+        ('a.xml', b'<a/>'),
+        ('middle.tgz/b.xml', b'<b/>'),
+        ('middle.tgz/inner.taz/c.xml', b'<c/>'),
+        ('misnamed.gz/d.xml', b'<d/>'),
+        ('e.xml.gz/e.xml', b'<e/>'),
+    ]
+    assert ('notes.tar', b'not an archive') in list(iter_archive(str(path)))
+    assert ('middle.tgz', middle_tgz) in list(iter_archive(str(path), nested=False))
+
+
+def test_iter_archive_unknown_format(tmp_path):
+    path = tmp_path / 'a.xml'
+    path.write_bytes(b'<a/>')
+    with pytest.raises(ArchiveFormatError):
+        list(iter_archive(str(path)))
+
+
+def test_iter_tar_members_lzw(tmp_path):
+    path = tmp_path / 'a.taz'
+    path.write_bytes(lzw_compress(tar_bytes(MEMBERS)))
+    assert list(iter_tar_members(str(path), '.pdf')) == MEMBERS[1:]
+
+
+def test_iter_tar_members_names(tmp_path):
+    tar_path = make_tar(tmp_path / 'a.tar.gz', [('a.xml', b'<a/>'), ('b.pdf', b'b'), ('c.pdf', b'c')])
+    assert list(iter_tar_members(tar_path, names={'c.pdf', 'a.xml'})) == [('a.xml', b'<a/>'), ('c.pdf', b'c')]
+
+
+def test_attachment_buffer_rereads_beyond_max_size(tmp_path):
+    tar_path = make_tar(tmp_path / 'a.tar.gz', [('d/a.pdf', b'aaaa'), ('d/b.pdf', b'bbbb'), ('d/c.pdf', b'cccc')])
+    buffer = AttachmentBuffer(max_size=6)
+    for member_name, content in iter_tar_members(tar_path):
+        buffer.add(os.path.basename(member_name), tar_path, member_name, content)
+    assert 'a.pdf' in buffer and 'b.pdf' not in buffer
+    assert buffer.pop('a.pdf') == ('d/a.pdf', b'aaaa') and buffer.size == 0
+
+    buffer.clear()
+    assert list(buffer.reread(['c.pdf', 'b.pdf', 'x.pdf'])) == [('b.pdf', 'd/b.pdf', b'bbbb'), ('c.pdf', 'd/c.pdf', b'cccc')]
+    assert not buffer.skipped
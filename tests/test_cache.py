@@ -0,0 +1,52 @@
+"""Tests of dila.cache."""
+import itertools
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import cache as cache_module
+from dila.cache import TextCache, content_digest
+
+TEXTS = {name: os.urandom(300).hex() for name in 'abc'}  # Random, so that their compressed sizes are close to 600 bytes
+
+
+def size(text):
+    return len(zlib.compress(text.encode('utf-8')))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Ticks one second per call, so that the order of use does not depend on the resolution of time.time."""
+    ticks = itertools.count()
+    monkeypatch.setattr(cache_module.time, 'time', lambda: float(next(ticks)))
+
+
+def test_get_put(tmp_path, clock):
+    with TextCache(str(tmp_path / 'cache.sqlite')) as cache:
+        assert cache.get(content_digest(b'pdf'), 'pdf pages') is None
+        assert cache.extract(b'pdf', 'pdf pages', lambda content: 'texte extrait') == 'texte extrait'
+        assert cache.extract(b'pdf', 'pdf pages', lambda content: pytest.fail("extracted twice")) == 'texte extrait'
+        assert cache.get(content_digest(b'pdf'), 'pdf pages v2') is None  # Another extractor version
+        assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_lru_eviction(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite')
+    with TextCache(path) as cache:
+        for name, text in TEXTS.items():
+            cache.put(name, 'x', text)
+        assert cache.get('a', 'x') == TEXTS['a']  # a is now more recently used than b and c
+
+        cache.max_bytes = size(TEXTS['a']) + size(TEXTS['c'])
+        cache.evict()
+        assert cache.get('b', 'x') is None
+        assert cache.get('a', 'x') == TEXTS['a'] and cache.get('c', 'x') == TEXTS['c']
+
+    # Texts are evicted while they are put, once a sixteenth of max_bytes was added
+    with TextCache(path, max_bytes=size(TEXTS['c']) + size(TEXTS['b'])) as cache:
+        cache.put('d', 'x', TEXTS['b'])
+        assert cache.get('a', 'x') is None  # Read before c above
+        assert cache.get('c', 'x') == TEXTS['c'] and cache.get('d', 'x') == TEXTS['b']
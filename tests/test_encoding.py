@@ -0,0 +1,46 @@
+"""Tests of dila.encoding, run with both XML backends of dila.parsers."""
+import codecs
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers
+from dila.encoding import parse_xml_bytes
+
+ENTITIES = {'deg': '°'}
+
+
+@pytest.fixture(params=[True, False], ids=['lxml', 'ElementTree'])
+def use_lxml(request, monkeypatch):
+    if request.param and not parsers.HAS_LXML:
+        pytest.skip("lxml is not installed")
+    monkeypatch.setattr(parsers, 'USE_LXML', request.param)
+    return request.param
+
+
+def test_bom_without_declaration(use_lxml):
+    data = codecs.BOM_UTF8 + '<avis><texte>Température 10 &deg;</texte></avis>'.encode('utf-8')
+    assert parse_xml_bytes(data, ENTITIES).findtext('texte') == 'Température 10 °'
+
+
+def test_latin1_declared_utf8(use_lxml):
+    data = '<?xml version="1.0" encoding="UTF-8"?><avis><texte>Température 10°</texte></avis>'.encode('iso-8859-1')
+    assert parse_xml_bytes(data).findtext('texte') == 'Température 10°'
+
+
+@pytest.mark.parametrize('doctype', [
+    '<!DOCTYPE avis SYSTEM "boamp.dtd">',
+    '<!DOCTYPE avis PUBLIC "-//BOAMP//DTD" \'boamp.dtd\'>',
+    '<!DOCTYPE avis SYSTEM "boamp.dtd" [<!ENTITY nbsp "&#160;">]>',
+])
+def test_entities_with_own_doctype(use_lxml, doctype):
+    data = f'<?xml version="1.0" encoding="UTF-8"?>{doctype}<avis><texte>10&nbsp;&deg;</texte></avis>'
+    root = parse_xml_bytes(data.encode('utf-8'), {**ENTITIES, 'nbsp': '\xa0'})
+    assert root.findtext('texte') == '10\xa0°'
+
+
+def test_feed_entities(use_lxml):
+    root = parsers.feed([b'<!DOCTYPE avis SYSTEM "boamp.dtd">', b'<avis>&deg;</avis>'], 'utf-8', ENTITIES)
+    assert root.text == '°'
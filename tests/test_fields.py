@@ -0,0 +1,46 @@
+"""Tests of dila.fields against ElementPath, with both XML backends of dila.parsers."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers
+from dila.fields import Field, FieldSpec
+
+# A and B are nested in themselves, so ElementPath and document order disagree on './/A/B'
+NESTED = b'''<root>
+  <A><X><A><B>inner</B><C>c1</C></A></X><B>outer</B><B></B></A>
+  <D><A><B>last</B></A><E><F>f1</F></E><E><F>f2</F></E></D>
+  <B><B>self</B></B>
+</root>'''
+
+PATHS = ['.//A/B', './/A//B', './/B', './/X/A/B', 'A/B', 'A//B', './/D/A/B', './/E/F', 'D/E/F', './/*/B', './/B/B',
+         './/A/C', 'D//F', './/A/Z', 'Z']
+
+BACKENDS = [False, pytest.param(True, marks=pytest.mark.skipif(not parsers.HAS_LXML, reason="lxml is not installed"))]
+
+
+@pytest.mark.parametrize('use_lxml', BACKENDS, ids=['ElementTree', 'lxml'])
+def test_extract_matches_findtext(use_lxml):
+    root = parsers.fromstring(NESTED, use_lxml=use_lxml)
+    spec = FieldSpec({path: Field(path, default=None) for path in PATHS})
+    assert spec.extract(root) == {path: root.findtext(path) for path in PATHS}
+
+
+@pytest.mark.parametrize('use_lxml', BACKENDS, ids=['ElementTree', 'lxml'])
+def test_extract_many_matches_findall(use_lxml):
+    root = parsers.fromstring(NESTED, use_lxml=use_lxml)
+    spec = FieldSpec({path: Field(path, many=True) for path in PATHS})
+    assert spec.extract(root) == {path: [element.text or '' for element in root.findall(path)] for path in PATHS}
+
+
+def test_missing_defaults():
+    root = parsers.fromstring(b'<ANNONCE_REF><NOMS_SOCIETE><NOM_SOCIETE>S</NOM_SOCIETE></NOMS_SOCIETE><NUMERO_AFFAIRE/></ANNONCE_REF>')
+    spec = FieldSpec({
+        'Societe_siege': Field('NOMS_SOCIETE/NOM_SOCIETE', attribute='siege'),
+        'Numero_affaire': 'NUMERO_AFFAIRE',
+        'Categorie': Field('CATEGORIE', attribute='name'),
+        'Fichier_html': Field('FICHIERS_JOINTS/FICHIER_HTML', default=None),
+    })
+    assert spec.extract(root) == {'Societe_siege': '', 'Numero_affaire': '', 'Categorie': '', 'Fichier_html': None}
@@ -0,0 +1,141 @@
+"""Tests of dila.lzw on streams written by a reference compress encoder, checked against gzip -dc when available."""
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.lzw import LZW_MAGIC, CLEAR_CODE, LZWError, open_lzw, iter_lzw_chunks
+
+
+def lzw_compress(data, max_bits=16, block_mode=True):
+    """Encodes data as Unix compress does: codes in groups of 8, a group padded to n_bits bytes when the code
+    width changes or a CLEAR is written, and a CLEAR (block mode) each time the table is full."""
+    out = bytearray(LZW_MAGIC + bytes([max_bits | (0x80 if block_mode else 0)]))
+    max_max_code = 1 << max_bits
+    first = CLEAR_CODE + 1 if block_mode else 256
+    state = {'n_bits': 9, 'max_code': 511, 'free': first}
+    codes = []
+
+    def flush(pad):
+        n_bits = state['n_bits']
+        bits = sum(code << (i * n_bits) for i, code in enumerate(codes))
+        size = n_bits if pad else (len(codes) * n_bits + 7) // 8
+        out.extend(bits.to_bytes(size, 'little'))
+        codes.clear()
+
+    def output(code, clear=False):
+        codes.append(code)
+        if len(codes) == 8:
+            flush(pad=False)
+        # Checked before the entry of this code is added, as the decoder adds it one code later
+        if clear or state['free'] > state['max_code']:
+            if codes:
+                flush(pad=True)
+            if clear:
+                state['n_bits'], state['max_code'] = 9, 511
+            else:
+                state['n_bits'] += 1
+                state['max_code'] = max_max_code if state['n_bits'] == max_bits else (1 << state['n_bits']) - 1
+
+    table = {bytes([i]): i for i in range(256)}
+    current = data[:1]
+    for byte in data[1:]:
+        extended = current + bytes([byte])
+        if extended in table:
+            current = extended
+            continue
+        output(table[current])
+        current = bytes([byte])
+        if state['free'] < max_max_code:
+            table[extended] = state['free']
+            state['free'] += 1
+        elif block_mode:
+            output(CLEAR_CODE, clear=True)
+            table = {bytes([i]): i for i in range(256)}
+            state['free'] = first
+    if current:
+        output(table[current])
+    if codes:
+        flush(pad=False)
+    return bytes(out)
+
+
+def sample(size, seed=0):
+    """Text with repeated words and some noise, so that the table fills up and the code width grows."""
+    rng = random.Random(seed)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyzéè') for _ in range(rng.randint(2, 9))) for _ in range(3000)]
+    text = ' '.join(rng.choice(words) for _ in range(size // 6)).encode('utf-8')
+    return text[:size]
+
+
+def decompress(data):
+    return b''.join(iter_lzw_chunks(io.BytesIO(data), chunk_size=4096))
+
+
+def gzip_decompress(data):
+    return subprocess.run(['gzip', '-dc'], input=data, capture_output=True, check=True).stdout
+
+
+CASES = [
+    ('empty', b'', 16, True),
+    ('one byte', b'a', 16, True),
+    ('repeated byte', b'a' * 5000, 16, True),  # Exercises the code not yet in the table (KwKwK)
+    ('widths 9 to 16', sample(400_000), 16, True),
+    ('CLEAR at 9 bits', sample(20_000), 9, True),
+    ('CLEAR at 12 bits', sample(150_000, seed=1), 12, True),
+    ('no block mode', sample(60_000, seed=2), 10, False),
+]
+
+
+@pytest.mark.parametrize('data, max_bits, block_mode', [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_decompress(data, max_bits, block_mode):
+    compressed = lzw_compress(data, max_bits, block_mode)
+    if shutil.which('gzip'):
+        assert gzip_decompress(compressed) == data
+    assert decompress(compressed) == data
+    with open_lzw(fileobj=io.BytesIO(compressed)) as f:
+        assert f.read() == data
+
+
+def test_clear_mid_group():
+    # 'a' 'b' CLEAR, the rest of the group padded, then 'c' and 257: the entry after a CLEAR takes code 256, so 257
+    # is the code being defined ('c' + 'c')
+    stream = LZW_MAGIC + bytes([0x80 | 16]) + (97 | 98 << 9 | 256 << 18).to_bytes(9, 'little') + (99 | 257 << 9).to_bytes(3, 'little')
+    if shutil.which('gzip'):
+        assert gzip_decompress(stream) == b'abccc'
+    assert decompress(stream) == b'abccc'
+
+
+def test_bad_header():
+    with pytest.raises(LZWError):
+        decompress(b'\x1f\x8b\x08')
+    with pytest.raises(LZWError):
+        decompress(LZW_MAGIC)
+    with pytest.raises(LZWError):
+        decompress(LZW_MAGIC + bytes([0x80 | 17]) + b'\x00' * 8)
+
+
+def test_truncated_within_a_code():
+    data = sample(200)
+    compressed = lzw_compress(data, 16)
+    # With fewer than 255 new entries, all codes are 9 bits, in groups of 9 bytes after the 3 of the header: a
+    # cut 1 byte into a group leaves 8 bits, less than a code, which a complete stream never ends with
+    cuts = [size for size in range(4, len(compressed)) if (size - 3) % 9 == 1]
+    assert cuts and len(compressed) < 3 + 9 * 32
+    for size in cuts:
+        with pytest.raises(LZWError):
+            decompress(compressed[:size])
+    # Cuts between codes cannot be told from a shorter stream, as the format has no length
+    assert data.startswith(decompress(compressed[:3 + 9 * 4]))
+
+
+def test_corrupt_code():
+    compressed = bytearray(lzw_compress(sample(5000), 16))
+    compressed[3:12] = b'\xff' * 9  # First group: codes beyond the table
+    with pytest.raises(LZWError):
+        decompress(bytes(compressed))
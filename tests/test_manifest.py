@@ -0,0 +1,62 @@
+"""Tests of the resumption of runs through dila.manifest."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.manifest import Manifest
+
+
+def make_files(tmp_path):
+    archives = []
+    for name in ('a.tar.gz', 'b.tar.gz'):
+        path = tmp_path / name
+        path.write_bytes(name.encode() * 100)
+        archives.append(str(path))
+    output = tmp_path / 'a.jsonl'
+    output.write_text('{}\n')
+    return archives, str(output)
+
+
+def test_resume(tmp_path):
+    archives, output = make_files(tmp_path)
+    manifest_path = str(tmp_path / 'manifest.sqlite')
+    with Manifest(manifest_path) as manifest:
+        assert manifest.pending(archives) == archives
+        manifest.record(archives[0], [output])
+
+    # A new run, e.g. after an interruption, only parses what was not recorded
+    with Manifest(manifest_path) as manifest:
+        assert manifest.pending(archives) == archives[1:]
+
+
+def test_touched_archive_is_hashed(tmp_path):
+    archives, output = make_files(tmp_path)
+    with Manifest(str(tmp_path / 'manifest.sqlite')) as manifest:
+        manifest.record(archives[0], [output])
+        stat = os.stat(archives[0])
+
+        # Downloaded again with the same content: current, and its new mtime is remembered
+        os.utime(archives[0], (stat.st_atime, stat.st_mtime + 10))
+        assert manifest.is_current(archives[0])
+        row = manifest._connection.execute("SELECT mtime FROM archives").fetchone()
+        assert row[0] == stat.st_mtime + 10
+
+        # Same size, other content
+        with open(archives[0], 'r+b') as f:
+            f.write(b'x')
+        os.utime(archives[0], (stat.st_atime, stat.st_mtime + 20))
+        assert not manifest.is_current(archives[0])
+
+
+def test_changed_size_or_missing_output(tmp_path):
+    archives, output = make_files(tmp_path)
+    with Manifest(str(tmp_path / 'manifest.sqlite')) as manifest:
+        manifest.record(archives[0], [output])
+        manifest.record(archives[1], [output])
+
+        with open(archives[0], 'ab') as f:
+            f.write(b'more')
+        assert manifest.pending(archives) == archives[:1]
+
+        os.remove(output)
+        assert manifest.pending(archives) == archives
@@ -0,0 +1,63 @@
+"""Tests of the publication and rollback of the writers of dila.output."""
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila.output import open_output
+
+RECORDS = [{'id': 1, 'text': 'Température 10°'}, {'id': 2, 'text': ''}]
+
+
+def read_jsonl(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_commit(tmp_path, compression):
+    with open_output(str(tmp_path / 'out'), compression) as writer:
+        writer.write_all(RECORDS)
+        assert not os.path.exists(writer.path)  # Written under a temporary name until closed
+    assert writer.count == 2
+    assert read_jsonl(writer.path) == RECORDS
+    assert os.listdir(tmp_path) == [os.path.basename(writer.path)]
+
+
+def test_close_without_commit(tmp_path):
+    writer = open_output(str(tmp_path / 'out'))
+    writer.write_all(RECORDS)
+    writer.close(commit=False)
+    assert os.listdir(tmp_path) == []
+    writer.close()  # Closing again does nothing
+
+
+def test_exception_keeps_previous_file(tmp_path):
+    with open_output(str(tmp_path / 'out')) as writer:
+        writer.write(RECORDS[0])
+    with pytest.raises(RuntimeError):
+        with open_output(str(tmp_path / 'out')) as writer:
+            writer.write_all(RECORDS)
+            raise RuntimeError("interrupted")
+    assert read_jsonl(writer.path) == RECORDS[:1]
+    assert os.listdir(tmp_path) == ['out.jsonl']
+
+
+def test_parquet_rollback(tmp_path):
+    pytest.importorskip('pyarrow')
+    with pytest.raises(RuntimeError):
+        with open_output(str(tmp_path / 'out'), output_format='parquet') as writer:
+            writer.write_all(RECORDS)
+            raise RuntimeError("interrupted")
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsupported(tmp_path):
+    with pytest.raises(ValueError):
+        open_output(str(tmp_path / 'out'), 'lz4')
+    with pytest.raises(ValueError):
+        open_output(str(tmp_path / 'out'), output_format='csv')
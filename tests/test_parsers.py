@@ -0,0 +1,32 @@
+"""Tests of the choice of XML library per call in dila.parsers and dila.records."""
+import io
+import os
+import sys
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import parsers
+from dila.records import iter_records
+
+BULLETIN = b'<RCS-A><dateParution>2023-01-03</dateParution><avis><n>1</n></avis><avis><n>2</n></avis></RCS-A>'
+
+
+@pytest.mark.skipif(not parsers.HAS_LXML, reason="lxml is not installed")
+def test_use_lxml_overrides_default(monkeypatch):
+    monkeypatch.setattr(parsers, 'USE_LXML', True)
+    assert type(parsers.fromstring(BULLETIN, use_lxml=False)) is ElementTree.Element
+    assert type(parsers.parse(io.BytesIO(BULLETIN), use_lxml=False).getroot()) is ElementTree.Element
+    monkeypatch.setattr(parsers, 'USE_LXML', False)
+    assert parsers.etree.iselement(parsers.fromstring(BULLETIN, use_lxml=True))
+
+
+@pytest.mark.parametrize('use_lxml', [False, pytest.param(True, marks=pytest.mark.skipif(not parsers.HAS_LXML, reason="lxml is not installed"))])
+def test_iter_records_use_lxml(use_lxml):
+    records = [(root.findtext('dateParution'), record.findtext('n')) for root, record in iter_records(io.BytesIO(BULLETIN), 'avis', use_lxml=use_lxml)]
+    assert records == [('2023-01-03', '1'), ('2023-01-03', '2')]
+
+
+def test_tostring_matches_library():
+    assert parsers.tostring(parsers.fromstring(b'<a><b/></a>', use_lxml=False)) == '<a><b /></a>'
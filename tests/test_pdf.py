@@ -0,0 +1,85 @@
+"""Tests of the page ranges and timeouts of dila.pdf.PdfPool, with a text backend standing in for a PDF library."""
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dila import extractors
+from dila.extractors import Backend, Document
+from dila.pdf import PdfPool, join_pages
+
+# The workers find the backend registered by the test in the memory they inherit from the parent
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs workers started by fork")
+
+
+class TextDocument(Document):
+    """Pages separated by form feeds; a page reading 'hang' blocks, as a PDF library can on a broken file."""
+
+    def __init__(self, source):
+        self._pages = source.decode('utf-8').split('\f')
+
+    def __len__(self):
+        return len(self._pages)
+
+    def iter_pages(self, start, stop):
+        for number in range(start, stop):
+            if self._pages[number] == 'hang':
+                time.sleep(60)
+            yield self._pages[number]
+
+
+@pytest.fixture(autouse=True)
+def text_backend(monkeypatch):
+    monkeypatch.setitem(extractors.EXTRACTORS, '.pdf', [Backend('text', TextDocument)])
+
+
+def document(pages):
+    return '\f'.join(pages).encode('utf-8')
+
+
+def results(pool):
+    return {key: (text, pages, error) for key, text, pages, error in pool.drain()}
+
+
+def test_page_ranges_reassembled():
+    pages = [f"page {number}" for number in range(11)]
+    with PdfPool(workers=3, split_pages=2, page_end='\n') as pool:
+        pool.submit('long', document(pages))
+        pool.submit('short', document(pages[:1]))
+        done = results(pool)
+    assert done['long'] == (*join_pages(pages, '\n'), None)
+    assert done['short'] == (*join_pages(pages[:1], '\n'), None)
+
+
+def test_page_budget():
+    pages = [f"page {number}" for number in range(11)]
+    with PdfPool(workers=3, split_pages=2, max_pages=5) as pool:
+        pool.submit('long', document(pages))
+        assert results(pool)['long'][0] == ''.join(pages[:5])
+    with PdfPool(workers=3, split_pages=2, max_chars=13) as pool:
+        pool.submit('long', document(pages))
+        assert results(pool)['long'][0] == ''.join(pages[:3])  # Stops after the page bringing the text to 13 characters
+
+
+def test_timeout():
+    with PdfPool(workers=2, timeout=0.5) as pool:
+        pool.submit('hanging', document(['page 0', 'hang']))
+        pool.submit('fine', document(['page 0', 'page 1']))
+        start = time.monotonic()
+        done = results(pool)
+    assert time.monotonic() - start < 30
+    assert done['hanging'] == ('', [], "timed out after 0.5 s")
+    assert done['fine'] == ('page 0page 1', [[0, 6], [6, 12]], None)
+
+
+def test_timeout_of_a_page_range():
+    pages = [f"page {number}" for number in range(6)]
+    with PdfPool(workers=2, timeout=0.5, split_pages=2) as pool:
+        pool.submit('hanging', document(pages[:3] + ['hang'] + pages[4:]))
+        pool.submit('fine', document(pages))
+        done = results(pool)
+    assert done['hanging'] == ('', [], "timed out after 0.5 s on pages 3-4")
+    assert done['fine'][0] == ''.join(pages)